@@ -0,0 +1,163 @@
+"""
+Batch Analyze - run archived ATC transcripts through the parser and the pilots advisor
+
+Input is JSON Lines: one transcript string or {"id", "transcript",
+"aircraft_callsign"} object per line. Results are appended to the output
+file as NDJSON as they complete; rerunning the same command skips ids that
+are already in the output, so an interrupted run resumes where it stopped.
+
+Run from backend/:
+    python batch_analyze.py flights.jsonl -o results.jsonl
+    python batch_analyze.py flights.jsonl -o results.jsonl --no-analyze --workers 8
+    python batch_analyze.py flights.jsonl -o results.jsonl --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import List, Set
+
+
+def read_items(path: str) -> List:
+    """Items from a JSON Lines file ("-" reads stdin)"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    items = []
+    with stream:
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                raise SystemExit(f"❌ {path}:{number}: invalid JSON ({e})")
+    return items
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already written to `path`; a torn last line from an interrupted run is cut off"""
+    if not os.path.exists(path):
+        return set()
+
+    done = set()
+    with open(path, "rb+") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            f.truncate(complete)
+        for line in data[:complete].splitlines():
+            try:
+                done.add(str(json.loads(line)["id"]))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return done
+
+
+async def run_local(items, args, skip_ids, write):
+    """Analyze in this process with the backend's own services"""
+    # Imported here so parser processes (spawned from this script) stay light
+    from services.batch_analysis import BatchAnalyzer
+    from services.voice_service import voice_service
+
+    analyzer = BatchAnalyzer(
+        voice_service,
+        parse_workers=args.workers,
+        concurrency=args.concurrency,
+        retries=args.retries,
+    )
+    try:
+        async for result in analyzer.run(items, analyze=not args.no_analyze, skip_ids=skip_ids):
+            write(result)
+    finally:
+        analyzer.shutdown()
+        voice_service.llm.shutdown()
+
+
+async def run_remote(items, args, skip_ids, write):
+    """Stream results from a running backend's /api/voice/batch/analyze"""
+    import httpx
+
+    pending = [item for item in items if str(item.get("id")) not in skip_ids]
+    url = args.url.rstrip("/") + "/api/voice/batch/analyze"
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None)) as client:
+        for start in range(0, len(pending), args.chunk):
+            payload = {"items": pending[start:start + args.chunk], "analyze": not args.no_analyze}
+            async with client.stream("POST", url, json=payload) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise SystemExit(f"❌ {url}: HTTP {response.status_code} {response.text}")
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        write(json.loads(line))
+
+
+def main():
+    # Imported here so parser processes (spawned from this script) stay light
+    from dotenv import load_dotenv
+
+    # Before any services.* import - their module-level settings read the environment
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Batch-analyze archived cockpit transcripts (JSON Lines in, NDJSON out)")
+    parser.add_argument("input", help="JSON Lines file with transcripts ('-' for stdin)")
+    parser.add_argument("-o", "--output", required=True, help="NDJSON results file (appended; completed ids are skipped)")
+    parser.add_argument("--restart", action="store_true", help="Discard existing results instead of resuming")
+    parser.add_argument("--no-analyze", action="store_true", help="Parse only, no Gemini calls")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (0 = in-process)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Model analyses in flight")
+    parser.add_argument("--retries", type=int, default=None, help="Extra attempts for failed analyses")
+    parser.add_argument("--url", help="Send the batch to a running backend instead of analyzing locally")
+    parser.add_argument("--chunk", type=int, default=500, help="Items per request with --url")
+    args = parser.parse_args()
+
+    from services.batch_analysis import (
+        BATCH_LLM_CONCURRENCY, BATCH_PARSE_WORKERS, BATCH_RETRIES, normalize_items,
+    )
+    args.workers = BATCH_PARSE_WORKERS if args.workers is None else args.workers
+    args.concurrency = BATCH_LLM_CONCURRENCY if args.concurrency is None else args.concurrency
+    args.retries = BATCH_RETRIES if args.retries is None else args.retries
+
+    try:
+        items = normalize_items(read_items(args.input))
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    skip_ids = completed_ids(args.output)
+    remaining = sum(1 for item in items if item["id"] not in skip_ids)
+    print(f"📦 {len(items)} transcripts, {len(items) - remaining} already done, {remaining} to go", file=sys.stderr)
+
+    counts = {"done": 0, "failed": 0, "interventions": 0}
+    started_at = time.perf_counter()
+
+    with open(args.output, "a", encoding="utf-8") as out:
+        def write(result: dict):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            # Flush per result so an interrupted run keeps its progress
+            out.flush()
+            counts["done"] += 1
+            counts["failed"] += not result.get("success")
+            counts["interventions"] += bool(result.get("needs_intervention"))
+            if counts["done"] % 100 == 0:
+                print(f"   {counts['done']}/{remaining}", file=sys.stderr)
+
+        runner = run_remote if args.url else run_local
+        try:
+            asyncio.run(runner(items, args, skip_ids, write))
+        except KeyboardInterrupt:
+            print(f"\n⏸️ Interrupted after {counts['done']} results - rerun to resume", file=sys.stderr)
+            sys.exit(130)
+
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"✅ {counts['done']} results in {elapsed:.1f}s ({counts['done'] / elapsed if elapsed else 0:.1f}/s), "
+        f"{counts['interventions']} interventions, {counts['failed']} failed -> {args.output}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Fake Upstreams - local stand-ins for Gemini and ElevenLabs
+
+Emulates Gemini `generateContent` / `streamGenerateContent` /
+`countTokens` (REST transport) and the ElevenLabs
+single-use token endpoint with configurable latency and error
+distributions, so the backend can be load-tested without paid APIs.
+
+Run:
+    python -m benchmarks.fake_upstreams --port 9100 --gemini-latency-ms 800
+
+Point the backend at it:
+    GEMINI_API_KEY=fake GEMINI_TRANSPORT=rest GEMINI_API_ENDPOINT=http://127.0.0.1:9100
+    ELEVENLABS_API_KEY=fake ELEVENLABS_API_BASE=http://127.0.0.1:9100
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Characters per streamed chunk (roughly a few tokens)
+STREAM_CHUNK_CHARS = 16
+
+
+class UpstreamProfile:
+    """
+    Latency / error distribution of one fake upstream
+
+    Latency is log-normal around `median_ms` (sigma=0 gives a fixed delay).
+    """
+
+    def __init__(self, median_ms: float, sigma: float = 0.0, error_rate: float = 0.0, error_status: int = 503):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self.warmups = 0
+
+    def sample_delay(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return self.median_ms * math.exp(random.gauss(0.0, self.sigma)) / 1000.0
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors, "warmups": self.warmups}
+
+
+app = FastAPI(title="Fake Gemini / ElevenLabs")
+app.state.gemini = UpstreamProfile(median_ms=600, sigma=0.3)
+app.state.elevenlabs = UpstreamProfile(median_ms=150, sigma=0.2)
+app.state.yes_rate = 0.1
+
+
+def _prompt_text(body: dict) -> str:
+    return "\n".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def _fake_completion(prompt: str) -> str:
+    """Answer in the shape each VoiceService prompt asks for"""
+    needs_intervention = random.random() < app.state.yes_rate
+    # Gemini emits response_schema properties in alphabetical order
+    instructions = {
+        "agent_message": "Alert: Conflicting runway clearance detected. Hold position and confirm with tower.",
+        "summary": "Two aircraft appear to be cleared onto the same runway.",
+    }
+
+    if '"needs_intervention"' in prompt:
+        if not needs_intervention:
+            return json.dumps({"needs_intervention": False, "summary": "", "agent_message": ""})
+        return json.dumps({"needs_intervention": True, **instructions})
+    if '"agent_message"' in prompt:
+        return json.dumps(instructions)
+    if '"language"' in prompt:
+        return json.dumps({"language": "English", "confidence": "high"})
+    return "yes" if needs_intervention else "no"
+
+
+def _gemini_response(text: str) -> dict:
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }]
+    }
+
+
+@app.post("/v1beta/models/{model_action}")
+async def generate_content(model_action: str, request: Request):
+    profile = app.state.gemini
+    if model_action.endswith(":countTokens"):
+        # Backend startup warm-up - no generation latency, not counted as a request
+        profile.warmups += 1
+        body = await request.json()
+        return {"totalTokens": max(1, len(_prompt_text(body)) // 4)}
+
+    profile.requests += 1
+    body = await request.json()
+    delay = profile.sample_delay()
+    streaming = model_action.endswith(":streamGenerateContent")
+    # A stream delivers its first chunk after a fraction of the full latency
+    await asyncio.sleep(delay * 0.3 if streaming else delay)
+
+    if profile.should_fail():
+        profile.errors += 1
+        return JSONResponse(
+            status_code=profile.error_status,
+            content={"error": {"code": profile.error_status, "message": "Injected failure", "status": "UNAVAILABLE"}},
+        )
+
+    text = _fake_completion(_prompt_text(body))
+    if not streaming:
+        return _gemini_response(text)
+
+    chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+    interval = delay * 0.7 / max(1, len(chunks) - 1)
+
+    async def stream():
+        # REST streaming without ?alt=sse is one JSON array, element by element
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(interval)
+            yield ("[" if i == 0 else ",\r\n") + json.dumps(_gemini_response(chunk))
+        yield "]"
+
+    return StreamingResponse(stream(), media_type="application/json")
+
+
+@app.post("/v1/single-use-token/{token_type}")
+async def single_use_token(token_type: str, request: Request):
+    profile = app.state.elevenlabs
+    profile.requests += 1
+    if not request.headers.get("xi-api-key"):
+        return JSONResponse(status_code=401, content={"detail": "Missing xi-api-key"})
+
+    await asyncio.sleep(profile.sample_delay())
+    if profile.should_fail():
+        profile.errors += 1
+        return JSONResponse(status_code=profile.error_status, content={"detail": "Injected failure"})
+
+    return {"token": f"sutkn_{uuid.uuid4().hex}"}
+
+
+@app.get("/stub/stats")
+async def stub_stats():
+    return {"gemini": app.state.gemini.stats(), "elevenlabs": app.state.elevenlabs.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini / ElevenLabs upstreams")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--gemini-latency-ms", type=float, default=600)
+    parser.add_argument("--gemini-sigma", type=float, default=0.3)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-error-status", type=int, default=503)
+    parser.add_argument("--elevenlabs-latency-ms", type=float, default=150)
+    parser.add_argument("--elevenlabs-sigma", type=float, default=0.2)
+    parser.add_argument("--elevenlabs-error-rate", type=float, default=0.0)
+    parser.add_argument("--yes-rate", type=float, default=0.1, help="Share of verdicts answered 'yes'")
+    args = parser.parse_args()
+
+    app.state.gemini = UpstreamProfile(
+        args.gemini_latency_ms, args.gemini_sigma, args.gemini_error_rate, args.gemini_error_status
+    )
+    app.state.elevenlabs = UpstreamProfile(
+        args.elevenlabs_latency_ms, args.elevenlabs_sigma, args.elevenlabs_error_rate
+    )
+    app.state.yes_rate = args.yes_rate
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+"""
+Load Test - replays multi-client cockpit sessions against the backend
+
+Spawns the fake upstreams and a backend instance wired to them (unless
+--target is given), then drives each endpoint at the frontend's cadences:
+/token once per recording, /check-cockpit every 2 s, /parse-transcript
+every 500 ms. Reports RPS, p50/p95/p99 latency, errors and event-loop lag
+(from the backend's /metrics) per phase.
+
+Run from backend/:
+    python -m benchmarks.loadtest --clients 20 --duration 20
+    python -m benchmarks.loadtest --phases mixed --workers 2 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.scenarios import scenario_segments
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK_INTERVAL_SECONDS = 2.0
+PARSE_INTERVAL_SECONDS = 0.5
+PHASES = ("token", "parse-transcript", "check-cockpit", "mixed")
+
+LOOP_LAG_BUCKET_RE = re.compile(
+    r'^event_loop_lag_seconds_bucket\{pid="(?P<pid>[^"]+)",le="(?P<le>[^"]+)"\} (?P<count>[0-9.e+]+)$'
+)
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class EndpointStats:
+    """Latency samples and outcomes of one endpoint within a phase"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.statuses = Counter()
+
+    def record(self, latency: float, status, ok: bool):
+        self.latencies.append(latency)
+        self.statuses[str(status)] += 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self, duration: float) -> dict:
+        ordered = sorted(self.latencies)
+        return {
+            "requests": len(ordered),
+            "rps": round(len(ordered) / duration, 2) if duration else 0.0,
+            "errors": self.errors,
+            "p50_ms": round(1000 * _percentile(ordered, 0.50), 1),
+            "p95_ms": round(1000 * _percentile(ordered, 0.95), 1),
+            "p99_ms": round(1000 * _percentile(ordered, 0.99), 1),
+            "max_ms": round(1000 * ordered[-1], 1) if ordered else 0.0,
+            "statuses": dict(self.statuses),
+        }
+
+
+async def _timed_request(client: httpx.AsyncClient, stats: EndpointStats, method: str, url: str, **kwargs):
+    started_at = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        stats.record(time.perf_counter() - started_at, type(e).__name__, ok=False)
+        return None
+
+    latency = time.perf_counter() - started_at
+    body = None
+    try:
+        body = response.json()
+    except ValueError:
+        pass
+    # Endpoints report upstream failures as 200 + "success": false
+    ok = response.status_code < 400 and not (isinstance(body, dict) and body.get("success") is False)
+    stats.record(latency, response.status_code, ok)
+    return body
+
+
+class ClientSession:
+    """
+    One simulated cockpit: a transcript that grows as a scripted scenario is
+    "spoken", polled by the same timers the frontend uses
+    """
+
+    def __init__(self, client_id: int, speech_interval: float, rng: random.Random):
+        self.client_id = client_id
+        self.speech_interval = speech_interval
+        self.rng = rng
+        self.segments: List[str] = []
+        self.spoken: List[str] = []
+        # Incremental parse state, mirrors App.jsx parseStateRef
+        self.parse_prefix = ""
+        self.parse_offset = 0
+        self.callsign = None
+
+    def start_recording(self):
+        self.segments = scenario_segments(rng=self.rng)
+        self.spoken = []
+        self.parse_prefix = ""
+        self.parse_offset = 0
+
+    @property
+    def transcript(self) -> str:
+        return " ".join(self.spoken)
+
+    def speak(self) -> bool:
+        """Commit the next scripted segment; False once the scenario is over"""
+        if len(self.spoken) >= len(self.segments):
+            return False
+        self.spoken.append(self.segments[len(self.spoken)])
+        return True
+
+    def parse_request(self) -> dict:
+        transcript = self.transcript
+        if not transcript.startswith(self.parse_prefix):
+            self.parse_offset = 0
+        self.parse_prefix = transcript
+        return {"transcript": transcript[self.parse_offset:], "offset": self.parse_offset}
+
+    def parse_response(self, body: Optional[dict]):
+        if body and body.get("success") and body.get("next_offset") is not None:
+            self.parse_offset = body["next_offset"]
+
+
+async def _every(interval: float, deadline: float, fire, tasks: set):
+    """setInterval-style ticker: requests may overlap like in the browser"""
+    next_at = time.perf_counter()
+    while True:
+        next_at += interval
+        delay = next_at - time.perf_counter()
+        if next_at >= deadline:
+            return
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(fire())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+
+async def run_client(
+    session: ClientSession,
+    client: httpx.AsyncClient,
+    phase: str,
+    deadline: float,
+    stats: Dict[str, EndpointStats],
+):
+    """Drive one simulated cockpit until the phase deadline"""
+    tasks: set = set()
+
+    if phase == "token":
+        # Closed loop - stresses token minting without the other endpoints
+        while time.perf_counter() < deadline:
+            await _timed_request(client, stats["token"], "GET", "/api/voice/token")
+        return
+
+    async def check():
+        if session.transcript:
+            await _timed_request(
+                client, stats["check-cockpit"], "POST", "/api/voice/check-cockpit",
+                json={"transcript": session.transcript, "aircraft_callsign": session.callsign},
+            )
+
+    async def parse():
+        if session.transcript:
+            body = await _timed_request(
+                client, stats["parse-transcript"], "POST", "/api/voice/parse-transcript",
+                json=session.parse_request(),
+            )
+            session.parse_response(body)
+
+    async def record():
+        while time.perf_counter() < deadline:
+            session.start_recording()
+            if phase == "mixed":
+                await _timed_request(client, stats["token"], "GET", "/api/voice/token")
+            while session.speak():
+                await asyncio.sleep(session.speech_interval * session.rng.uniform(0.7, 1.3))
+                if time.perf_counter() >= deadline:
+                    return
+
+    # Stagger clients so their timers are not phase-locked
+    await asyncio.sleep(session.rng.uniform(0, CHECK_INTERVAL_SECONDS))
+    runners = [record()]
+    if phase in ("check-cockpit", "mixed"):
+        runners.append(_every(CHECK_INTERVAL_SECONDS, deadline, check, tasks))
+    if phase in ("parse-transcript", "mixed"):
+        runners.append(_every(PARSE_INTERVAL_SECONDS, deadline, parse, tasks))
+    await asyncio.gather(*runners)
+
+    if tasks:
+        await asyncio.wait(tasks, timeout=30)
+
+
+async def scrape_loop_lag(client: httpx.AsyncClient, scrapes: int = 1) -> Dict[str, Dict[str, float]]:
+    """Cumulative event_loop_lag bucket counts per worker pid"""
+    buckets: Dict[str, Dict[str, float]] = {}
+    for _ in range(scrapes):
+        try:
+            response = await client.get("/metrics")
+        except httpx.HTTPError:
+            continue
+        for line in response.text.splitlines():
+            match = LOOP_LAG_BUCKET_RE.match(line)
+            if match:
+                buckets.setdefault(match["pid"], {})[match["le"]] = float(match["count"])
+    return buckets
+
+
+def loop_lag_summary(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]) -> dict:
+    """
+    Quantile upper bounds of event-loop lag observed between two scrapes,
+    summed over the workers seen in both
+    """
+    deltas: Dict[str, float] = {}
+    for pid, counts in after.items():
+        previous = before.get(pid, {})
+        for le, count in counts.items():
+            deltas[le] = deltas.get(le, 0.0) + count - previous.get(le, 0.0)
+
+    total = deltas.get("+Inf", 0.0)
+    if not total:
+        return {"samples": 0}
+
+    bounds = sorted(deltas, key=lambda le: float("inf") if le == "+Inf" else float(le))
+
+    def bound_for(q: float) -> str:
+        for le in bounds:
+            if deltas[le] >= q * total:
+                return le
+        return "+Inf"
+
+    def as_ms(le: str):
+        return le if le == "+Inf" else round(1000 * float(le), 1)
+
+    return {
+        "samples": int(total),
+        "workers": len(after),
+        "p50_le_ms": as_ms(bound_for(0.50)),
+        "p99_le_ms": as_ms(bound_for(0.99)),
+        "max_le_ms": as_ms(next(le for le in bounds if deltas[le] >= total)),
+    }
+
+
+async def run_phase(base_url: str, phase: str, clients: int, duration: float, speech_interval: float, seed: int, workers: int) -> dict:
+    limits = httpx.Limits(max_connections=clients * 4, max_keepalive_connections=clients * 4)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        lag_before = await scrape_loop_lag(client, scrapes=workers * 3)
+        stats = {name: EndpointStats() for name in ("token", "check-cockpit", "parse-transcript")}
+
+        started_at = time.perf_counter()
+        deadline = started_at + duration
+        await asyncio.gather(*(
+            run_client(ClientSession(i, speech_interval, random.Random(seed + i)), client, phase, deadline, stats)
+            for i in range(clients)
+        ))
+        elapsed = time.perf_counter() - started_at
+
+        lag_after = await scrape_loop_lag(client, scrapes=workers * 3)
+
+    return {
+        "phase": phase,
+        "clients": clients,
+        "duration_seconds": round(elapsed, 2),
+        "endpoints": {
+            name: endpoint.summary(elapsed)
+            for name, endpoint in stats.items()
+            if endpoint.latencies
+        },
+        "event_loop_lag": loop_lag_summary(lag_before, lag_after),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def start_stack(args) -> Tuple[str, str, List[subprocess.Popen]]:
+    """Start fake upstreams + backend; returns both URLs and the processes"""
+    upstream_port = args.upstream_port or _free_port()
+    backend_port = args.port or _free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    backend_url = f"http://127.0.0.1:{backend_port}"
+
+    upstreams = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_upstreams",
+            "--port", str(upstream_port),
+            "--gemini-latency-ms", str(args.gemini_latency_ms),
+            "--gemini-sigma", str(args.gemini_sigma),
+            "--gemini-error-rate", str(args.gemini_error_rate),
+            "--elevenlabs-latency-ms", str(args.elevenlabs_latency_ms),
+            "--elevenlabs-error-rate", str(args.elevenlabs_error_rate),
+            "--yes-rate", str(args.yes_rate),
+        ],
+        cwd=BACKEND_DIR,
+    )
+    processes = [upstreams]
+    _wait_for(f"{upstream_url}/stub/stats")
+
+    env = {
+        **os.environ,
+        "GEMINI_API_KEY": "fake-gemini-key",
+        "GEMINI_TRANSPORT": "rest",
+        "GEMINI_API_ENDPOINT": upstream_url,
+        "ELEVENLABS_API_KEY": "fake-elevenlabs-key",
+        "ELEVENLABS_API_BASE": upstream_url,
+    }
+    if args.no_cache:
+        env["VERDICT_CACHE_ENABLED"] = "0"
+
+    backend = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(backend_port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    processes.append(backend)
+    _wait_for(f"{backend_url}/api/voice/health")
+
+    return backend_url, upstream_url, processes
+
+
+def print_report(results: List[dict]):
+    header = f"{'phase':<17}{'endpoint':<18}{'req':>7}{'rps':>9}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        for name, summary in result["endpoints"].items():
+            print(
+                f"{result['phase']:<17}{name:<18}{summary['requests']:>7}{summary['rps']:>9.1f}{summary['errors']:>6}"
+                f"{summary['p50_ms']:>9.1f}{summary['p95_ms']:>9.1f}{summary['p99_ms']:>9.1f}{summary['max_ms']:>9.1f}"
+            )
+        lag = result["event_loop_lag"]
+        if lag.get("samples"):
+            print(
+                f"{'':<17}{'event loop lag':<18}{lag['samples']:>7} samples, "
+                f"p50 <= {lag['p50_le_ms']} ms, p99 <= {lag['p99_le_ms']} ms, max <= {lag['max_le_ms']} ms"
+            )
+    print("(latencies in ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the voice backend against fake upstreams")
+    parser.add_argument("--target", help="Existing backend URL (skips starting the stack)")
+    parser.add_argument("--phases", default=",".join(PHASES), help=f"Comma-separated subset of {', '.join(PHASES)}")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per phase")
+    parser.add_argument("--speech-interval", type=float, default=3.0, help="Mean seconds between committed segments")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned backend")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--upstream-port", type=int, default=0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=600)
+    parser.add_argument("--gemini-sigma", type=float, default=0.3)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--elevenlabs-latency-ms", type=float, default=150)
+    parser.add_argument("--elevenlabs-error-rate", type=float, default=0.0)
+    parser.add_argument("--yes-rate", type=float, default=0.1)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the verdict cache in the spawned backend")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    phases = [phase.strip() for phase in args.phases.split(",") if phase.strip()]
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        parser.error(f"unknown phases: {', '.join(sorted(unknown))}")
+
+    processes = []
+    upstream_url = None
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+        else:
+            base_url, upstream_url, processes = start_stack(args)
+            print(f"🚀 Backend on {base_url}, fake upstreams on {upstream_url}")
+
+        results = []
+        for phase in phases:
+            print(f"⏱️  Phase {phase}: {args.clients} clients for {args.duration:.0f}s")
+            results.append(asyncio.run(run_phase(
+                base_url, phase, args.clients, args.duration, args.speech_interval, args.seed, args.workers
+            )))
+
+        report = {"config": vars(args), "results": results}
+        if upstream_url:
+            report["upstream_calls"] = httpx.get(f"{upstream_url}/stub/stats").json()
+
+        print()
+        print_report(results)
+        if "upstream_calls" in report:
+            print(f"Upstream calls: {json.dumps(report['upstream_calls'])}")
+
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"✅ Results written to {args.json_path}")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
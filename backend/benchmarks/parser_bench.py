@@ -0,0 +1,226 @@
+"""
+Parser Benchmark - per-call time, allocations and scaling of the transcript parser
+
+Runs each case over synthetic transcripts of increasing size (default
+1k / 10k / 100k characters) and reports pytest-benchmark style statistics
+(min / median / mean / stddev / ops), tracemalloc peak and retained bytes,
+and the log-log scaling exponent across sizes (1.0 = linear).
+
+Run from backend/:
+    python -m benchmarks.parser_bench
+    python -m benchmarks.parser_bench --save .benchmarks/parser.json
+    python -m benchmarks.parser_bench --compare .benchmarks/parser.json --stat min --threshold 1.2
+"""
+import argparse
+import gc
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.transcript_corpus import generate_transcript
+from services.transcript_parser import extract_callsigns, parse_incremental, parse_transcript
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+# Text appended between two frontend parses (a sentence or two)
+INCREMENTAL_DELTA_CHARS = 200
+MIN_ROUND_SECONDS = 0.005
+
+
+def _incremental_tail(text: str) -> Callable[[], dict]:
+    """Steady-state incremental call: only the text after the last parse"""
+    offset = parse_incremental(text[:-INCREMENTAL_DELTA_CHARS])["next_offset"]
+    tail = text[offset:]
+    return lambda: parse_incremental(tail, offset)
+
+
+CASES: Dict[str, Callable[[str], Callable[[], object]]] = {
+    "parse_transcript": lambda text: lambda: parse_transcript(text),
+    "parse_incremental_tail": _incremental_tail,
+    "extract_callsigns": lambda text: lambda: extract_callsigns(text),
+}
+
+
+def _calibrate(func: Callable[[], object]) -> int:
+    """Calls per round so that one round takes at least MIN_ROUND_SECONDS"""
+    number = 1
+    while True:
+        started_at = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - started_at >= MIN_ROUND_SECONDS:
+            return number
+        number *= 2
+
+
+def measure_time(func: Callable[[], object], rounds: int, max_seconds: float) -> dict:
+    """Per-call timing statistics over `rounds` rounds (GC disabled while timing)"""
+    func()  # warm-up
+    number = _calibrate(func)
+    samples: List[float] = []
+
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        deadline = time.perf_counter() + max_seconds
+        while len(samples) < rounds and (len(samples) < 3 or time.perf_counter() < deadline):
+            started_at = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - started_at) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    median = statistics.median(samples)
+    return {
+        "rounds": len(samples),
+        "calls_per_round": number,
+        "min_us": round(1e6 * min(samples), 2),
+        "median_us": round(1e6 * median, 2),
+        "mean_us": round(1e6 * statistics.fmean(samples), 2),
+        "stddev_us": round(1e6 * statistics.stdev(samples), 2) if len(samples) > 1 else 0.0,
+        "ops": round(1 / median, 1) if median else 0.0,
+    }
+
+
+def measure_allocations(func: Callable[[], object]) -> dict:
+    """Peak and retained bytes of a single call under tracemalloc"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = func()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"peak_bytes": peak - before, "retained_bytes": after - before}
+
+
+def scaling_exponent(points: List[tuple]) -> float:
+    """Least-squares slope of log(time) over log(size)"""
+    if len(points) < 2:
+        return 0.0
+    xs = [math.log(size) for size, _ in points]
+    ys = [math.log(max(value, 1e-9)) for _, value in points]
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    denominator = sum((x - mean_x) ** 2 for x in xs)
+    if not denominator:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / denominator
+
+
+def run(sizes, cases, rounds: int, max_seconds: float, seed: int) -> dict:
+    results = []
+    for size in sizes:
+        text = generate_transcript(size, seed=seed)
+        messages = len(parse_transcript(text))
+        for name in cases:
+            func = CASES[name](text)
+            results.append({
+                "case": name,
+                "chars": size,
+                "messages": messages,
+                **measure_time(func, rounds, max_seconds),
+                **measure_allocations(func),
+            })
+
+    scaling = {
+        name: round(scaling_exponent([(r["chars"], r["median_us"]) for r in results if r["case"] == name]), 2)
+        for name in cases
+    }
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": seed,
+        "results": results,
+        "scaling_exponent": scaling,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float, stat: str = "median_us") -> List[str]:
+    """Cases whose `stat` time grew by more than `threshold` x the baseline"""
+    previous = {(r["case"], r["chars"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get((result["case"], result["chars"]))
+        if not old or not old[stat]:
+            continue
+        ratio = result[stat] / old[stat]
+        result["vs_baseline"] = round(ratio, 2)
+        if ratio > threshold:
+            regressions.append(
+                f"{result['case']} @ {result['chars']} chars: "
+                f"{stat} {old[stat]}us -> {result[stat]}us ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def print_report(report: dict):
+    header = (
+        f"{'case':<24}{'chars':>9}{'msgs':>7}{'min us':>11}{'median us':>11}{'mean us':>11}"
+        f"{'stddev':>9}{'ops/s':>11}{'peak KiB':>10}{'kept KiB':>10}{'vs base':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        vs_baseline = f"{r['vs_baseline']:.2f}x" if "vs_baseline" in r else "-"
+        print(
+            f"{r['case']:<24}{r['chars']:>9}{r['messages']:>7}{r['min_us']:>11.1f}{r['median_us']:>11.1f}"
+            f"{r['mean_us']:>11.1f}{r['stddev_us']:>9.1f}{r['ops']:>11.0f}"
+            f"{r['peak_bytes'] / 1024:>10.1f}{r['retained_bytes'] / 1024:>10.1f}{vs_baseline:>9}"
+        )
+    print()
+    for name, exponent in report["scaling_exponent"].items():
+        print(f"📈 {name}: time ~ n^{exponent}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transcript parser across transcript sizes")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated transcript sizes in characters")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"Comma-separated subset of {', '.join(CASES)}")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--max-seconds", type=float, default=2.0, help="Time budget per case and size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Write the report as JSON (e.g. a baseline)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Allowed slowdown vs baseline")
+    parser.add_argument("--stat", default="median", choices=("min", "median", "mean"), help="Statistic to compare")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    cases = [case.strip() for case in args.cases.split(",") if case.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    report = run(sizes, cases, args.rounds, args.max_seconds, args.seed)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold, f"{args.stat}_us")
+
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.save}")
+
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) over {args.threshold}x:")
+        for line in regressions:
+            print(f"   {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
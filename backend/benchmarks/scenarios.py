@@ -0,0 +1,51 @@
+"""
+Scenarios - scripted cockpit / ATC sessions replayed by the load generator
+
+Each scenario is a list of committed segments in the order Scribe would
+deliver them.
+"""
+import random
+from typing import List
+
+SCENARIOS = {
+    "runway_conflict": [
+        "Coastal 115, line up and wait runway 28.",
+        "Line up and wait runway 28, Coastal 115.",
+        "Okay, before takeoff checklist complete.",
+        "United 234, wind 270 at 8, runway 28, cleared to land.",
+        "Cleared to land runway 28, United 234.",
+        "Did you hear that? Somebody cleared to land on our runway?",
+    ],
+    "normal_departure": [
+        "Delta 456, taxi to runway 10 via alpha, hold short runway 10.",
+        "Taxi runway 10 via alpha, hold short, Delta 456.",
+        "Flaps set, trims set, we're ready.",
+        "Delta 456, runway 10, cleared for takeoff.",
+        "Cleared for takeoff runway 10, Delta 456.",
+        "Positive rate, gear up.",
+        "Delta 456, climb and maintain 5000, contact departure.",
+        "Climb and maintain 5000, Delta 456.",
+    ],
+    "engine_warning": [
+        "Speedbird 22, descend and maintain flight level 120.",
+        "Descend flight level 120, Speedbird 22.",
+        "Hm, oil pressure on engine two is flickering.",
+        "Probably just a sensor glitch, let's ignore it for now.",
+        "Yeah, it did that last week too.",
+    ],
+    "cockpit_chatter": [
+        "So where are we going for dinner tonight?",
+        "I was thinking about that new place near the hotel.",
+        "The coffee on this aircraft is terrible again.",
+        "My kid started school this week, it was quite the morning.",
+        "Let's hope the hotel shuttle is on time for once.",
+    ],
+}
+
+
+def scenario_segments(name: str = None, rng: random.Random = None) -> List[str]:
+    """Segments of a named scenario, or of a random one"""
+    rng = rng or random
+    if name is None:
+        name = rng.choice(sorted(SCENARIOS))
+    return list(SCENARIOS[name])
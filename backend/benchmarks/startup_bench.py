@@ -0,0 +1,220 @@
+"""
+Startup Bench - worker cold start: import time, time to ready, first request
+
+Measures what a freshly spawned uvicorn worker costs before it answers
+like a warm one:
+- `import main` wall time over fresh interpreters, plus the heaviest
+  top-level packages from `python -X importtime`
+- time until /api/voice/health answers and latency of the first and
+  second /check-cockpit call, with the lifespan warm-up off (default)
+  and on (backend wired to the fake upstreams, so no paid APIs are used)
+
+The warm-up doesn't shorten ready + first request - it moves work in
+front of readiness. Compare "1st req": that is what users see when a
+load balancer only routes to ready workers (rolling restarts).
+
+Run from backend/:
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --runs 10 --gemini-latency-ms 300 --json startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.loadtest import BACKEND_DIR, _free_port, _wait_for
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \|(?P<indent>\s+)(?P<name>\S+)$")
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+# Escalated by the safety screen, so both calls reach Gemini
+FIRST_TRANSCRIPT = "Tower, LOT123, engine fire, mayday mayday, request runway 29"
+SECOND_TRANSCRIPT = "LOT123, cleared to land runway 29, wind 270 at 8 knots"
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def measure_import(runs: int, env: dict) -> Dict[str, float]:
+    """`import main` wall time in `runs` fresh interpreters"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return _summary(samples)
+
+
+def import_profile(env: dict, top: int) -> List[dict]:
+    """Heaviest top-level packages imported by `import main` (cumulative)"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match is None or "." in match["name"] or match["name"] == "main":
+            continue
+        # A package imported from several places shows up once, at its first import
+        packages.setdefault(match["name"], int(match["cumulative"]) / 1000)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"module": name, "cumulative_ms": round(ms, 1)} for name, ms in ranked]
+
+
+def cold_start(env: dict, warmup: bool, timeout: float) -> Dict[str, float]:
+    """Spawn one backend worker; time to ready and the first two check-cockpit calls"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    # One client for polling and requests - a fresh one per poll (SSL context
+    # setup) would steal CPU from the worker being measured
+    client = httpx.Client(base_url=url, timeout=30)
+    started_at = time.perf_counter()
+    backend = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env={**env, "STARTUP_WARMUP": "1" if warmup else "0"},
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started_at + timeout
+        while True:
+            try:
+                health = client.get("/api/voice/health", timeout=1)
+                if health.status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() > deadline or backend.poll() is not None:
+                raise RuntimeError(f"backend on {url} did not become ready")
+            time.sleep(0.02)
+        ready = time.perf_counter() - started_at
+
+        calls = []
+        for transcript in (FIRST_TRANSCRIPT, SECOND_TRANSCRIPT):
+            call_started_at = time.perf_counter()
+            client.post("/api/voice/check-cockpit", json={"transcript": transcript}).raise_for_status()
+            calls.append(time.perf_counter() - call_started_at)
+        return {
+            "ready": ready,
+            "first_request": calls[0],
+            "second_request": calls[1],
+            "ready_to_first_answer": ready + calls[0],
+            "startup": health.json().get("startup", {}),
+        }
+    finally:
+        client.close()
+        backend.terminate()
+        try:
+            backend.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            backend.kill()
+
+
+def print_report(report: dict):
+    imports = report["import"]
+    print(
+        f"import main: median {imports['median_ms']:.1f} ms "
+        f"(min {imports['min_ms']:.1f}, max {imports['max_ms']:.1f}, {report['config']['runs']} runs)"
+    )
+    print("heaviest packages: " + ", ".join(
+        f"{entry['module']} {entry['cumulative_ms']:.0f}" for entry in report["import_profile"]
+    ))
+    print()
+    header = f"{'warm-up':<10}{'ready':>10}{'1st req':>10}{'2nd req':>10}{'ready+1st':>11}"
+    print(header)
+    print("-" * len(header))
+    for mode, summary in report["cold_start"].items():
+        print(
+            f"{mode:<10}{summary['ready']['median_ms']:>10.1f}{summary['first_request']['median_ms']:>10.1f}"
+            f"{summary['second_request']['median_ms']:>10.1f}{summary['ready_to_first_answer']['median_ms']:>11.1f}"
+        )
+    print("(medians in ms; ready = process spawn until /api/voice/health answers)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend worker cold start against fake upstreams")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--top", type=int, default=8, help="Packages listed from -X importtime")
+    parser.add_argument("--gemini-latency-ms", type=float, default=300)
+    parser.add_argument("--elevenlabs-latency-ms", type=float, default=100)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for a worker to become ready")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    upstream_url = f"http://127.0.0.1:{_free_port()}"
+    upstreams = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_upstreams",
+            "--port", upstream_url.rsplit(":", 1)[1],
+            "--gemini-latency-ms", str(args.gemini_latency_ms),
+            "--gemini-sigma", "0",
+            "--elevenlabs-latency-ms", str(args.elevenlabs_latency_ms),
+            "--elevenlabs-sigma", "0",
+            "--yes-rate", "0",
+        ],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        _wait_for(f"{upstream_url}/stub/stats")
+        env = {
+            **os.environ,
+            "GEMINI_API_KEY": "fake-gemini-key",
+            "GEMINI_TRANSPORT": "rest",
+            "GEMINI_API_ENDPOINT": upstream_url,
+            "ELEVENLABS_API_KEY": "fake-elevenlabs-key",
+            "ELEVENLABS_API_BASE": upstream_url,
+        }
+
+        print(f"⏱️  import main x{args.runs}")
+        report = {
+            "config": vars(args),
+            "import": measure_import(args.runs, env),
+            "import_profile": import_profile(env, args.top),
+            "cold_start": {},
+        }
+        for warmup in (False, True):
+            mode = "on" if warmup else "off"
+            print(f"⏱️  Cold start x{args.runs}, warm-up {mode}")
+            runs = [cold_start(env, warmup, args.timeout) for _ in range(args.runs)]
+            report["cold_start"][mode] = {
+                metric: _summary([run[metric] for run in runs])
+                for metric in ("ready", "first_request", "second_request", "ready_to_first_answer")
+            }
+            report["cold_start"][mode]["startup"] = runs[-1]["startup"]
+
+        print()
+        print_report(report)
+
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"✅ Results written to {args.json_path}")
+    finally:
+        upstreams.terminate()
+        try:
+            upstreams.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            upstreams.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Transcript Corpus - synthetic ATC / cockpit transcripts of arbitrary length
+
+Deterministic for a given seed. Mixes tower instructions, readbacks and
+cockpit chatter with the callsign formats seen on frequency:
+- US civil registrations ("N12345", "N731PA")
+- airline telephony ("United 234", "Speedbird 22A")
+- ICAO designators, spaced ("UAL 234") or written together ("DLH4AB")
+and Scribe-like punctuation (missing full stops, line breaks).
+"""
+import random
+from typing import List
+
+TELEPHONY = [
+    "United", "Delta", "Coastal", "Speedbird", "Lufthansa", "Ryanair",
+    "Skywest", "Jetblue", "Lot", "Easy", "Cactus", "Southwest",
+]
+ICAO_DESIGNATORS = ["UAL", "DAL", "BAW", "DLH", "RYR", "SKW", "JBU", "LOT", "EZY", "AAL"]
+
+RUNWAYS = ["28", "28L", "10R", "27", "09", "33", "15"]
+TAXIWAYS = ["alpha", "bravo", "charlie", "delta", "echo"]
+
+ATC_INSTRUCTIONS = [
+    "line up and wait runway {runway}",
+    "runway {runway}, cleared for takeoff",
+    "wind {wind}, runway {runway}, cleared to land",
+    "taxi to runway {runway} via {taxiway}, hold short runway {runway}",
+    "cross runway {runway}",
+    "climb and maintain {altitude}",
+    "descend and maintain flight level {level}",
+    "turn left heading {heading}",
+    "reduce speed to {speed} knots",
+    "contact departure 124.35",
+]
+
+READBACKS = [
+    "line up and wait runway {runway}",
+    "cleared for takeoff runway {runway}",
+    "cleared to land runway {runway}",
+    "taxi runway {runway} via {taxiway}, hold short",
+    "crossing runway {runway}",
+    "climb and maintain {altitude}",
+    "descend flight level {level}",
+    "left heading {heading}",
+    "speed {speed}",
+    "over to departure",
+]
+
+CHATTER = [
+    "Okay, before takeoff checklist complete",
+    "Flaps set, trims set, we're ready",
+    "Positive rate, gear up",
+    "Did you hear that",
+    "Hm, oil pressure on engine two is flickering",
+    "Probably just a sensor glitch",
+    "Can you pass me the approach chart",
+    "The coffee on this aircraft is terrible again",
+    "Let's run the after landing checklist",
+    "Autopilot engaged",
+]
+
+
+def random_callsign(rng: random.Random) -> str:
+    """A callsign in one of the supported formats"""
+    kind = rng.random()
+    if kind < 0.25:
+        suffix = "".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ") for _ in range(rng.choice((0, 0, 1, 2))))
+        return f"N{rng.randint(100, 99999)}{suffix}"
+    if kind < 0.7:
+        suffix = rng.choice(("", "", "", "A", "K"))
+        return f"{rng.choice(TELEPHONY)} {rng.randint(1, 9999)}{suffix}"
+    designator = rng.choice(ICAO_DESIGNATORS)
+    if kind < 0.9:
+        return f"{designator} {rng.randint(1, 9999)}"
+    return f"{designator}{rng.randint(1, 999)}{rng.choice('ABCDEFGHJK')}{rng.choice('ABCDEFGHJK')}"
+
+
+def _fill(template: str, rng: random.Random) -> str:
+    return template.format(
+        runway=rng.choice(RUNWAYS),
+        taxiway=rng.choice(TAXIWAYS),
+        wind=f"{rng.randrange(10, 370, 10):03d} at {rng.randint(2, 25)}",
+        altitude=rng.randrange(2000, 12000, 1000),
+        level=rng.randrange(80, 400, 10),
+        heading=f"{rng.randrange(10, 370, 10):03d}",
+        speed=rng.randrange(160, 260, 10),
+    )
+
+
+def _terminator(rng: random.Random) -> str:
+    # Scribe mostly punctuates, but not always
+    roll = rng.random()
+    if roll < 0.75:
+        return ". "
+    if roll < 0.85:
+        return "? " if rng.random() < 0.3 else "! "
+    if roll < 0.93:
+        return "\n"
+    return " "
+
+
+def generate_exchange(rng: random.Random, fleet: List[str]) -> str:
+    """One instruction + readback, or a line of cockpit chatter"""
+    if rng.random() < 0.3:
+        return rng.choice(CHATTER) + _terminator(rng)
+
+    callsign = rng.choice(fleet)
+    index = rng.randrange(len(ATC_INSTRUCTIONS))
+    instruction = _fill(ATC_INSTRUCTIONS[index], rng)
+    readback = _fill(READBACKS[index], rng)
+    return (
+        f"{callsign}, {instruction}{_terminator(rng)}"
+        f"{readback[0].upper()}{readback[1:]}, {callsign}{_terminator(rng)}"
+    )
+
+
+def generate_transcript(chars: int, seed: int = 0, fleet_size: int = 12) -> str:
+    """
+    Synthetic transcript of (at least) `chars` characters, cut at `chars`
+
+    Args:
+        chars: Target length in characters
+        seed: RNG seed - the same seed always yields the same transcript
+        fleet_size: Number of distinct aircraft on frequency
+    """
+    rng = random.Random(seed)
+    fleet = [random_callsign(rng) for _ in range(fleet_size)]
+
+    parts = []
+    length = 0
+    while length < chars:
+        exchange = generate_exchange(rng, fleet)
+        parts.append(exchange)
+        length += len(exchange)
+    return "".join(parts)[:chars]
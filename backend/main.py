@@ -1,8 +1,39 @@
-from fastapi import FastAPI
+import time
+
+_import_started_at = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+# Before the service imports - their module-level settings read the environment
+load_dotenv()
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from routes.voice_routes import router as voice_router
+from services.http_client import close_http_client
+from services.metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_DURATION, monitor_event_loop_lag, render_metrics
+from services.voice_service import voice_service
+
+voice_service.startup_stats["import_seconds"] = round(time.perf_counter() - _import_started_at, 3)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: background token prefetch and, with STARTUP_WARMUP=1, SDK load
+    # and connection warm-up - uvicorn only accepts requests once this returns
+    await voice_service.start()
+    loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+    yield
+    # Shutdown: stop background work and close pooled connections
+    loop_lag_task.cancel()
+    await voice_service.stop()
+    await close_http_client()
 
-app = FastAPI(title="TwelveLabs API")
+
+app = FastAPI(title="TwelveLabs API", lifespan=lifespan)
 
 # CORS middleware - pozwala na komunikację z frontendem
 # W Docker: nginx proxy, więc pozwalamy na wszystkie origins
@@ -15,6 +46,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Request-level latency histogram and in-flight gauge for /metrics"""
+    HTTP_IN_FLIGHT.inc()
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        # Route template (e.g. /api/voice/sessions/{session_id}/check) keeps label cardinality bounded
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started_at,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+
 # Include routers
 app.include_router(voice_router)
 
@@ -25,3 +79,9 @@ def read_root():
 @app.get("/api/hello")
 def hello():
     return {"message": "Witaj w aplikacji TwelveLabs!", "status": "success"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics for this worker process"""
+    return render_metrics()
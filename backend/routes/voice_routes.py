@@ -1,16 +1,84 @@
 """
 Voice Routes - API endpoints for real-time voice transcription
 """
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+import os
+import uuid
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
+from services.batch_analysis import BATCH_MAX_ITEMS, normalize_items
 from services.voice_service import voice_service
 
+# Debounce before evaluating so a burst of partials coalesces into one evaluation
+WS_COALESCE_SECONDS = float(os.getenv("WS_COALESCE_SECONDS", "0.3"))
+
 router = APIRouter(prefix="/api/voice", tags=["voice"])
 
 
 class AnalyzeRequest(BaseModel):
     transcript: str
-    aircraft_callsign: str = None
+    aircraft_callsign: Optional[str] = None
+    session_id: Optional[str] = None
+
+
+class SessionSegmentsRequest(BaseModel):
+    base_index: int = 0
+    committed: List[str] = []
+    partial: str = ""
+    aircraft_callsign: Optional[str] = None
+
+
+class ParseTranscriptRequest(BaseModel):
+    transcript: str
+    offset: Optional[int] = None
+
+
+class BatchItemRequest(BaseModel):
+    id: Optional[str] = None
+    transcript: str
+    aircraft_callsign: Optional[str] = None
+
+
+class BatchAnalyzeRequest(BaseModel):
+    items: List[BatchItemRequest] = []
+    transcripts: List[str] = []
+    analyze: bool = True
+    skip_ids: List[str] = []
+
+
+def _cockpit_response(result: dict) -> dict:
+    """Build the public check-cockpit response from a VoiceService result"""
+    if result.get("error") and not result.get("success"):
+        # Return error but don't raise exception - frontend will handle
+        response = {
+            "needs_intervention": False,
+            "error": result["error"],
+            "success": False
+        }
+        # Superseded / deferred / shed calls: the client just retries later
+        for flag in ("superseded", "deferred", "retry_after", "shed"):
+            if flag in result:
+                response[flag] = result[flag]
+        return response
+    
+    response = {
+        "needs_intervention": result["needs_intervention"],
+        "success": True
+    }
+    
+    # Add emergency data if intervention is needed
+    if result.get("needs_intervention"):
+        response["summary"] = result.get("summary")
+        response["agent_message"] = result.get("agent_message")
+    
+    # Gemini unavailable - verdict from local checks only
+    if result.get("degraded"):
+        response["degraded"] = True
+    
+    return response
 
 
 @router.get("/token")
@@ -36,7 +104,7 @@ async def get_elevenlabs_token():
 @router.post("/analyze")
 async def analyze_transcript(request: AnalyzeRequest):
     """
-    Analyze transcript using Google Gemini 2.5 Flash to detect language
+    Detect the transcript language (local n-gram detector, Gemini when unsure)
     
     Args:
         request: {"transcript": "text to analyze"}
@@ -62,60 +130,256 @@ async def analyze_transcript(request: AnalyzeRequest):
     }
 
 
+@router.post("/emergency-instructions/stream")
+async def stream_emergency_instructions(request: AnalyzeRequest):
+    """
+    Emergency instructions as server-sent events, agent_message first
+    
+    The voice agent can start speaking on the first "delta" events instead
+    of waiting for the complete JSON. The "done" event carries the full
+    result and is authoritative (it replaces the deltas if the stream had
+    to fall back to a buffered call).
+    
+    Returns:
+        text/event-stream:
+        event: delta / data: {"text": "..."}
+        event: done  / data: {"summary": "...", "agent_message": "...", "success": bool, "error": ...}
+    """
+    async def events():
+        async for event in voice_service.stream_emergency_instructions(
+            request.transcript,
+            request.aircraft_callsign
+        ):
+            data = {key: value for key, value in event.items() if key != "type"}
+            yield f"event: {event['type']}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/check-cockpit")
 async def check_cockpit_conversation(request: AnalyzeRequest):
     """
     Analyze cockpit conversation to determine if pilots need intervention.
     Expert pilots advisor - detects if pilots missed important facts.
     
+    Overlapping requests from one client (same "session_id", or same
+    callsign if none is sent) are single-flight: the newest transcript wins
+    and older requests return "superseded".
+    
     Args:
-        request: {"transcript": "cockpit conversation text"}
+        request: {"transcript": "cockpit conversation text", "session_id": "optional client id"}
         
     Returns:
         If intervention needed:
             {"needs_intervention": true, "summary": "...", "agent_message": "...", "success": true}
         If no intervention:
             {"needs_intervention": false, "success": true}
+        If a newer request from the same client took over:
+            {"needs_intervention": false, "superseded": true, "success": false, "error": "..."}
     """
     result = await voice_service.analyze_cockpit_conversation(
         request.transcript, 
+        request.aircraft_callsign,
+        client_key=f"session:{request.session_id}" if request.session_id else None
+    )
+    
+    return _cockpit_response(result)
+
+
+@router.post("/sessions/{session_id}/check")
+async def check_cockpit_session(session_id: str, request: SessionSegmentsRequest):
+    """
+    Incremental cockpit analysis - client appends only new transcript segments.
+    The backend keeps the rolling transcript and evaluates the delta plus a
+    bounded context window.
+    
+    Args:
+        session_id: Client-generated session identifier
+        request: {"base_index": 3, "committed": ["new segment"], "partial": "...", "aircraft_callsign": "..."}
+        
+    Returns:
+        Same as /check-cockpit plus "committed_count".
+        If the session is missing segments: {"resync": true, "committed_count": n, "success": false}
+        (client resends committed segments starting at index n)
+    """
+    result = await voice_service.analyze_session_update(
+        session_id,
+        request.base_index,
+        request.committed,
+        request.partial,
         request.aircraft_callsign
     )
     
-    if result.get("error"):
-        # Return error but don't raise exception - frontend will handle
+    if result.get("resync"):
         return {
             "needs_intervention": False,
-            "error": result["error"],
+            "resync": True,
+            "committed_count": result["committed_count"],
             "success": False
         }
     
-    # Build response - include summary and agent_message if intervention needed
-    response = {
-        "needs_intervention": result["needs_intervention"],
-        "success": True
-    }
+    response = _cockpit_response(result)
+    response["committed_count"] = result["committed_count"]
+    return response
+
+
+@router.delete("/sessions/{session_id}")
+async def close_cockpit_session(session_id: str):
+    """
+    Drop a server-side analysis session (e.g. when recording stops)
+    """
+    return {"closed": voice_service.sessions.close(session_id), "success": True}
+
+
+@router.websocket("/ws")
+async def cockpit_analysis_socket(websocket: WebSocket):
+    """
+    Streaming cockpit analysis channel (replaces 2s HTTP polling)
     
-    # Add emergency data if intervention is needed
-    if result.get("needs_intervention"):
-        response["summary"] = result.get("summary")
-        response["agent_message"] = result.get("agent_message")
+    Client -> server:
+        {"type": "start", "session_id": "...", "aircraft_callsign": "..."}
+        {"type": "committed", "text": "..."}  ("text" may also be a list of segments)
+        {"type": "partial", "text": "..."}
+        
+    Server -> client:
+        {"type": "ready", "session_id": "..."}
+        {"type": "agent_message_delta", "text": "..."}  (streamed ahead of an intervention)
+        {"type": "analysis", "needs_intervention": bool, "summary": "...", "agent_message": "...", "success": bool}
+        {"type": "error", "error": "..."}
+        
+    Transcript events only update the session; a single evaluator task picks
+    up the latest state, so a burst of partials becomes one evaluation and
+    at most one model call per connection is in flight.
+    """
+    await websocket.accept()
     
-    return response
+    session = None
+    changed = asyncio.Event()
+    
+    async def send_delta(text: str):
+        await websocket.send_json({"type": "agent_message_delta", "text": text})
+    
+    async def evaluator():
+        try:
+            while True:
+                await changed.wait()
+                await asyncio.sleep(WS_COALESCE_SECONDS)
+                # Respect the session's adaptive analysis interval
+                delay = voice_service.analysis_delay(session)
+                while delay > 0:
+                    await asyncio.sleep(delay)
+                    delay = voice_service.analysis_delay(session)
+                changed.clear()
+                
+                try:
+                    result = await voice_service.evaluate_session(session, on_agent_message=send_delta)
+                except Exception as e:
+                    # One failed evaluation - report it and keep analysing later events
+                    print(f"❌ [Cockpit WS] Analysis failed: {e}")
+                    await websocket.send_json({"type": "error", "error": f"Analysis failed: {e}"})
+                    continue
+                message = _cockpit_response(result)
+                message["type"] = "analysis"
+                await websocket.send_json(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Without the evaluator the client would keep streaming into nothing
+            print(f"❌ [Cockpit WS] Evaluator stopped: {e}")
+            try:
+                await websocket.close(code=1011)
+            except Exception:
+                pass  # Connection already gone
+    
+    evaluator_task = None
+    try:
+        while True:
+            try:
+                event = await websocket.receive_json()
+            except ValueError:
+                await websocket.send_json({"type": "error", "error": "Invalid JSON"})
+                continue
+            if not isinstance(event, dict):
+                await websocket.send_json({"type": "error", "error": "Events must be JSON objects"})
+                continue
+            event_type = event.get("type")
+            
+            if event_type == "start":
+                session_id = event.get("session_id") or str(uuid.uuid4())
+                callsign = event.get("aircraft_callsign")
+                if not isinstance(session_id, str) or not (callsign is None or isinstance(callsign, str)):
+                    await websocket.send_json({"type": "error", "error": "session_id and aircraft_callsign must be strings"})
+                    continue
+                if session is not None and session.session_id != session_id:
+                    # Restarted under a new id - the old session would never be closed otherwise
+                    voice_service.sessions.close(session.session_id)
+                session = voice_service.sessions.get_or_create(session_id, callsign)
+                if evaluator_task is None:
+                    evaluator_task = asyncio.create_task(evaluator())
+                await websocket.send_json({"type": "ready", "session_id": session.session_id})
+                continue
+            
+            if session is None:
+                await websocket.send_json({"type": "error", "error": "Send a 'start' event first"})
+                continue
+            
+            text = event.get("text", "")
+            if event_type == "committed":
+                segments = [text] if isinstance(text, str) else text
+                if not isinstance(segments, list) or not all(isinstance(segment, str) for segment in segments):
+                    await websocket.send_json({"type": "error", "error": "'text' must be a string or a list of strings"})
+                    continue
+                session.append(session.committed_count, segments)
+            elif event_type == "partial":
+                if not isinstance(text, str):
+                    await websocket.send_json({"type": "error", "error": "'text' must be a string"})
+                    continue
+                session.set_partial(text)
+            else:
+                await websocket.send_json({"type": "error", "error": f"Unknown event type: {event_type}"})
+                continue
+            
+            changed.set()
+            
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if evaluator_task is not None:
+            evaluator_task.cancel()
+        if session is not None:
+            voice_service.sessions.close(session.session_id)
 
 
 @router.post("/parse-transcript")
-async def parse_transcript(request: AnalyzeRequest):
+async def parse_transcript(request: ParseTranscriptRequest):
     """
     Parse transcript to identify speakers (ATC vs Aircraft)
     
+    Incremental mode: send only the text after the previous "next_offset"
+    together with "offset"; messages before "stable_count" are final.
+    
     Args:
-        request: {"transcript": "conversation text"}
+        request: {"transcript": "conversation text"} or
+                 {"transcript": "text after offset", "offset": 120}
         
     Returns:
         {"messages": [{"speaker": "ATC/Aircraft", "text": "..."}], "success": true}
+        In incremental mode also "stable_count" and "next_offset".
     """
     try:
+        if request.offset is not None:
+            result = voice_service.parse_transcript_incremental(request.transcript, request.offset)
+            return {
+                "messages": result["messages"],
+                "stable_count": result["stable_count"],
+                "next_offset": result["next_offset"],
+                "success": True
+            }
+        
         messages = voice_service.parse_transcript(request.transcript)
         return {
             "messages": messages,
@@ -129,6 +393,40 @@ async def parse_transcript(request: AnalyzeRequest):
         }
 
 
+@router.post("/batch/analyze")
+async def batch_analyze(request: BatchAnalyzeRequest):
+    """
+    Offline analysis of recorded transcripts, streamed back as NDJSON
+    
+    Parsing runs on a process pool, model calls run with bounded concurrency
+    behind live traffic and are retried on upstream failures. Results arrive
+    in completion order; to resume an interrupted batch, send it again with
+    the ids already received in "skip_ids".
+    
+    Args:
+        request: {"items": [{"id": "...", "transcript": "...", "aircraft_callsign": "..."}]}
+                 or {"transcripts": ["...", ...]}, plus optional
+                 "analyze": false (parse only) and "skip_ids": [...]
+    
+    Returns:
+        One JSON object per line:
+        {"id", "messages", "needs_intervention", "summary", "agent_message", "success", "error", "attempts"}
+    """
+    raw_items = [item.model_dump() for item in request.items] + list(request.transcripts)
+    if len(raw_items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)")
+    try:
+        items = normalize_items(raw_items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def stream():
+        async for result in voice_service.batch.run(items, analyze=request.analyze, skip_ids=request.skip_ids):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @router.get("/health")
 async def health_check():
     """
@@ -136,5 +434,21 @@ async def health_check():
     """
     return {
         "status": "healthy",
-        "service": "voice transcription"
+        "service": "voice transcription",
+        "startup": voice_service.startup_stats,
+        "state": voice_service.state.stats(),
+        "llm": voice_service.llm.stats(),
+        "scheduler": voice_service.scheduler.stats(),
+        "token_pool": voice_service.token_pool.stats(),
+        "upstreams": {
+            "gemini": voice_service.gemini_upstream.stats(),
+            "elevenlabs": voice_service.elevenlabs_upstream.stats()
+        },
+        "verdict_cache": voice_service.verdict_cache.stats(),
+        "safety_screen": voice_service.safety_screen.stats(),
+        "language_detector": voice_service.language_detector.stats(),
+        "single_flight": voice_service.single_flight.stats(),
+        "sessions": voice_service.sessions.stats(),
+        "batch": voice_service.batch.stats(),
+        "analysis": {"mode": voice_service.analysis_mode, **voice_service.analysis_stats}
     }
@@ -0,0 +1,317 @@
+"""
+Analysis Scheduler - global Gemini rate budget with priority lanes
+
+Every model call from VoiceService goes through the scheduler. Calls wait
+in one priority queue and are released while the requests-per-minute and
+tokens-per-minute buckets have room. Windows mentioning runways,
+clearances or warnings go first; offline batch work runs in the bulk
+lane behind all live traffic. Low-priority calls that wait too long
+are shed. Session analysis intervals stretch as the budget runs out, so
+the service degrades chatter-heavy sessions first instead of failing
+everyone at once.
+
+Calls pass the Gemini circuit breaker before taking budget, and slow
+calls are hedged (see resilience.py) - a hedge takes its own request and
+token budget, and is skipped when there is none left.
+
+Budgets live in the state backend: with a shared backend (STATE_BACKEND
+sqlite / redis) all uvicorn workers draw from the same buckets; with the
+in-memory backend set each limit to 1/N of the account quota.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from services.metrics import SCHEDULER_QUEUE_WAIT
+from services.resilience import CircuitOpenError, UpstreamGuard
+from services.safety_screen import screen_reasons
+from services.state_backend import MemoryStateBackend
+
+# 0 = unlimited
+GEMINI_RPM_LIMIT = int(os.getenv("GEMINI_RPM_LIMIT", "0"))
+GEMINI_TPM_LIMIT = int(os.getenv("GEMINI_TPM_LIMIT", "0"))
+# Expected response size added to the prompt estimate
+GEMINI_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("GEMINI_OUTPUT_TOKEN_ESTIMATE", "200"))
+SCHEDULER_BASE_INTERVAL_SECONDS = float(os.getenv("SCHEDULER_BASE_INTERVAL_SECONDS", "1.0"))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "200"))
+
+LANE_HIGH = "high"
+LANE_NORMAL = "normal"
+LANE_LOW = "low"
+# Offline batch analysis - only runs when no live call is waiting
+LANE_BULK = "bulk"
+LANES = (LANE_HIGH, LANE_NORMAL, LANE_LOW, LANE_BULK)
+LANE_RANK = {lane: rank for rank, lane in enumerate(LANES)}
+
+# Longest a call may wait for budget before it is shed
+LANE_MAX_WAIT_SECONDS = {
+    LANE_HIGH: float(os.getenv("SCHEDULER_MAX_WAIT_HIGH_SECONDS", "10")),
+    LANE_NORMAL: float(os.getenv("SCHEDULER_MAX_WAIT_NORMAL_SECONDS", "4")),
+    LANE_LOW: float(os.getenv("SCHEDULER_MAX_WAIT_LOW_SECONDS", "2")),
+    LANE_BULK: float(os.getenv("SCHEDULER_MAX_WAIT_BULK_SECONDS", "60")),
+}
+# Session interval = base * factor * (1 + stretch * pressure)
+LANE_INTERVAL_FACTOR = {LANE_HIGH: 0.5, LANE_NORMAL: 1.0, LANE_LOW: 2.0, LANE_BULK: 2.0}
+LANE_INTERVAL_STRETCH = {LANE_HIGH: 0.0, LANE_NORMAL: 3.0, LANE_LOW: 8.0, LANE_BULK: 8.0}
+
+HIGH_PRIORITY_REASONS = {"runway", "clearance", "warning"}
+# Only the latest part of a window decides its lane
+LANE_RECENT_CHARS = 500
+
+_current_lane: ContextVar[str] = ContextVar("analysis_lane", default=LANE_NORMAL)
+
+
+class AnalysisShedError(Exception):
+    """Raised when a call is dropped because the rate budget is exhausted"""
+
+
+def analysis_lane(text: str) -> str:
+    """Priority lane for a transcript window, based on its most recent text"""
+    reasons = set(screen_reasons((text or "")[-LANE_RECENT_CHARS:]))
+    if reasons & HIGH_PRIORITY_REASONS:
+        return LANE_HIGH
+    if reasons:
+        return LANE_NORMAL
+    return LANE_LOW
+
+
+def estimate_tokens(prompt) -> int:
+    """Rough token count of a prompt (~4 characters per token) plus the response"""
+    return len(str(prompt)) // 4 + GEMINI_OUTPUT_TOKEN_ESTIMATE
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Whether a model call error counts against Gemini's circuit"""
+    # Only reached after a failed call, so the SDK (services.gemini_client) is loaded by then
+    from google.api_core import exceptions as google_exceptions
+
+    # A rejected request (4xx) says nothing about Gemini's health - except throttling
+    if isinstance(error, google_exceptions.ClientError):
+        return isinstance(error, google_exceptions.TooManyRequests)
+    return True
+
+
+class _Ticket:
+    def __init__(self, lane: str, cost: int, future: asyncio.Future):
+        self.lane = lane
+        self.cost = cost
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class AnalysisScheduler:
+    """
+    Priority queue in front of the LLM executor
+
+    Args:
+        executor: LLMExecutor running the released calls
+        rpm_limit: Requests per minute (0 = unlimited)
+        tpm_limit: Estimated tokens per minute (0 = unlimited)
+        state: State backend holding the rate buckets (per process by default)
+    """
+
+    def __init__(
+        self,
+        executor,
+        rpm_limit: int = GEMINI_RPM_LIMIT,
+        tpm_limit: int = GEMINI_TPM_LIMIT,
+        base_interval: float = SCHEDULER_BASE_INTERVAL_SECONDS,
+        max_queue: int = SCHEDULER_MAX_QUEUE,
+        state=None,
+        upstream: Optional[UpstreamGuard] = None,
+    ):
+        state = state or MemoryStateBackend()
+        self.executor = executor
+        self.upstream = upstream or UpstreamGuard("gemini")
+        self.requests = state.bucket("gemini_rpm", rpm_limit)
+        self.tokens = state.bucket("gemini_tpm", tpm_limit)
+        self.base_interval = base_interval
+        self.max_queue = max_queue
+        self._queue = []
+        self._waiting = 0
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # Metrics
+        self.lane_stats: Dict[str, dict] = {
+            lane: {"dispatched": 0, "shed": 0, "total_wait_seconds": 0.0} for lane in LANES
+        }
+
+    @contextmanager
+    def lane(self, lane: str):
+        """Run model calls made inside the block in `lane`"""
+        token = _current_lane.set(lane)
+        try:
+            yield
+        finally:
+            _current_lane.reset(token)
+
+    def pressure(self) -> float:
+        """0.0 (budget untouched) .. 1.0 (budget exhausted / queue backing up)"""
+        backlog = min(1.0, self._waiting / self.max_queue) if self.max_queue else 0.0
+        return max(self.requests.utilization(), self.tokens.utilization(), backlog)
+
+    def session_interval(self, lane: str) -> float:
+        """Minimum seconds between model analyses of one session in `lane`"""
+        return (
+            self.base_interval
+            * LANE_INTERVAL_FACTOR[lane]
+            * (1.0 + LANE_INTERVAL_STRETCH[lane] * self.pressure())
+        )
+
+    async def generate(self, model, prompt, system_tokens: int = 0, **kwargs):
+        """
+        Wait for budget in the current lane, then run the call on the executor
+
+        Args:
+            model: Gemini GenerativeModel instance
+            prompt: Prompt contents passed to the model
+            system_tokens: Size of the model's system instruction, if any
+
+        Raises:
+            CircuitOpenError: if Gemini is failing and calls are suspended
+            AnalysisShedError: if the budget doesn't free up in time
+            LLMTimeoutError: if the model call itself times out
+        """
+        self._check_circuit()
+        lane = _current_lane.get()
+        cost = estimate_tokens(prompt) + system_tokens
+        await self._admit(lane, cost)
+        return await self.upstream.call(
+            lambda: self.executor.generate(model, prompt, **kwargs),
+            is_failure=is_upstream_failure,
+            hedge_budget=lambda: self._take_now(cost),
+        )
+
+    async def stream(self, model, prompt, system_tokens: int = 0, **kwargs):
+        """
+        Like generate, but yields response text chunks as they arrive
+
+        Raises:
+            CircuitOpenError: if Gemini is failing and calls are suspended
+            AnalysisShedError: if the budget doesn't free up in time
+            LLMTimeoutError: if the stream stalls
+        """
+        self._check_circuit()
+        lane = _current_lane.get()
+        await self._admit(lane, estimate_tokens(prompt) + system_tokens)
+        with self.upstream.guarded(is_upstream_failure):
+            async for text in self.executor.stream(model, prompt, **kwargs):
+                yield text
+
+    def _check_circuit(self):
+        # Fail fast before the call takes any budget
+        if not self.upstream.available:
+            raise CircuitOpenError(self.upstream.name, self.upstream.retry_after())
+
+    async def _admit(self, lane: str, cost: int):
+        stats = self.lane_stats[lane]
+
+        if self.requests.unlimited and self.tokens.unlimited:
+            stats["dispatched"] += 1
+            SCHEDULER_QUEUE_WAIT.observe(0.0, lane=lane)
+            return
+
+        if self._waiting >= self.max_queue and lane != LANE_HIGH:
+            stats["shed"] += 1
+            raise AnalysisShedError(f"Analysis queue full ({self._waiting} waiting), {lane} priority call shed")
+
+        ticket = _Ticket(lane, cost, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (LANE_RANK[lane], next(self._sequence), ticket))
+        self._waiting += 1
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), LANE_MAX_WAIT_SECONDS[lane])
+        except asyncio.TimeoutError:
+            if not ticket.future.done():
+                self._withdraw(ticket)
+                stats["shed"] += 1
+                raise AnalysisShedError(
+                    f"Gemini rate budget exhausted, {lane} priority call shed after {LANE_MAX_WAIT_SECONDS[lane]:.0f}s"
+                )
+            # Released just as the wait timed out - the budget is spent, use it
+        except asyncio.CancelledError:
+            if not ticket.future.done():
+                self._withdraw(ticket)
+            raise
+
+        waited = time.monotonic() - ticket.enqueued_at
+        stats["dispatched"] += 1
+        stats["total_wait_seconds"] += waited
+        SCHEDULER_QUEUE_WAIT.observe(waited, lane=lane)
+
+    def _take_now(self, cost: int) -> bool:
+        """Take budget for one extra call without queueing (hedges never wait)"""
+        if self._waiting:
+            # Queued calls come first
+            return False
+        if self.requests.try_take(1):
+            return False
+        if self.tokens.try_take(cost):
+            self.requests.refund(1)
+            return False
+        return True
+
+    def _withdraw(self, ticket: _Ticket):
+        ticket.future.cancel()
+        self._waiting -= 1
+        # The withdrawn ticket may have been holding up the head of the queue
+        self._dispatch()
+
+    def _dispatch(self):
+        """Release queued calls in priority order while the budget allows"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue:
+            ticket = self._queue[0][2]
+            if ticket.future.done():
+                heapq.heappop(self._queue)
+                continue
+
+            # Check-and-take in one step - other workers draw from the same buckets
+            delay = self.requests.try_take(1)
+            if not delay:
+                delay = self.tokens.try_take(ticket.cost)
+                if delay:
+                    self.requests.refund(1)
+            if delay > 0:
+                # Strict priority: nothing jumps the head of the queue
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+
+            heapq.heappop(self._queue)
+            self._waiting -= 1
+            ticket.future.set_result(None)
+
+    def stats(self) -> dict:
+        """Budget levels, queue depth and per-lane wait / shed counters"""
+        waiting = {lane: 0 for lane in LANES}
+        for _, _, ticket in self._queue:
+            if not ticket.future.done():
+                waiting[ticket.lane] += 1
+
+        stats = {
+            "rpm_limit": int(self.requests.capacity),
+            "tpm_limit": int(self.tokens.capacity),
+            "pressure": round(self.pressure(), 3),
+            "queue_depth": sum(waiting.values()),
+        }
+        for lane in LANES:
+            lane_stats = self.lane_stats[lane]
+            dispatched = lane_stats["dispatched"]
+            stats[f"{lane}_waiting"] = waiting[lane]
+            stats[f"{lane}_dispatched"] = dispatched
+            stats[f"{lane}_shed"] = lane_stats["shed"]
+            stats[f"{lane}_avg_wait_ms"] = (
+                round(1000 * lane_stats["total_wait_seconds"] / dispatched, 1) if dispatched else 0.0
+            )
+            stats[f"{lane}_interval_seconds"] = round(self.session_interval(lane), 2)
+        return stats
@@ -0,0 +1,479 @@
+"""
+Analysis Sessions - server-side rolling transcript for incremental cockpit analysis
+
+The client appends only new committed segments (plus the current partial)
+and the backend evaluates the delta together with a bounded window of
+already-analyzed context, so request size stays flat over a long flight.
+
+Segments, their parsed messages and verdicts are kept as compact
+__slots__ records. Old segments already folded into the clearance table
+and out of reach of the analysis window are trimmed from memory, idle
+sessions are evicted LRU-first under a memory cap, and everything is
+appended to the on-disk segment log so evicted sessions can be rebuilt.
+
+With a shared state backend each change publishes a session revision; a
+worker holding an older copy of the session catches it up by applying the
+log events appended since the last offset it read.
+"""
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import List, Optional
+
+from services import transcript_parser
+from services.conflict_engine import ClearanceTracker
+from services.segment_log import EVENT_SEGMENT, EVENT_START, EVENT_TRUNCATE, EVENT_VERDICT, SegmentLog
+
+ANALYSIS_CONTEXT_CHARS = int(os.getenv("ANALYSIS_CONTEXT_CHARS", "1500"))
+ANALYSIS_MAX_WINDOW_CHARS = int(os.getenv("ANALYSIS_MAX_WINDOW_CHARS", "4000"))
+ANALYSIS_SESSION_TTL_SECONDS = float(os.getenv("ANALYSIS_SESSION_TTL_SECONDS", "3600"))
+ANALYSIS_MAX_SESSIONS = int(os.getenv("ANALYSIS_MAX_SESSIONS", "500"))
+# Committed text kept in memory per session (older text lives in the tracker + log)
+ANALYSIS_SESSION_MAX_CHARS = int(os.getenv("ANALYSIS_SESSION_MAX_CHARS", "20000"))
+# Memory cap for all sessions together
+ANALYSIS_SESSIONS_MEMORY_MB = float(os.getenv("ANALYSIS_SESSIONS_MEMORY_MB", "64"))
+ANALYSIS_VERDICT_HISTORY = int(os.getenv("ANALYSIS_VERDICT_HISTORY", "20"))
+
+# Session object, clearance table and last result (not measured per session)
+SESSION_OVERHEAD_BYTES = 4096
+
+
+class MessageRecord:
+    """One parsed message of a committed segment"""
+
+    __slots__ = ("speaker", "target_callsign", "text")
+
+    def __init__(self, message: dict):
+        self.speaker = message.get("speaker")
+        self.target_callsign = message.get("target_callsign")
+        self.text = message.get("text", "")
+
+    def as_dict(self) -> dict:
+        message = {"speaker": self.speaker, "text": self.text}
+        if self.target_callsign:
+            message["target_callsign"] = self.target_callsign
+        return message
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.text)
+
+
+class SegmentRecord:
+    """A committed transcript segment, parsed once on arrival"""
+
+    __slots__ = ("text", "messages")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.messages = tuple(MessageRecord(message) for message in transcript_parser.parse_transcript(text))
+
+    def memory_bytes(self) -> int:
+        return (
+            sys.getsizeof(self) + sys.getsizeof(self.text) + sys.getsizeof(self.messages)
+            + sum(message.memory_bytes() for message in self.messages)
+        )
+
+
+class VerdictRecord:
+    """Outcome of one completed analysis"""
+
+    __slots__ = ("segment_count", "needs_intervention", "summary", "analyzed_at")
+
+    def __init__(self, segment_count: int, result: dict):
+        self.segment_count = segment_count
+        self.needs_intervention = bool(result.get("needs_intervention"))
+        self.summary = result.get("summary", "")
+        self.analyzed_at = time.time()
+
+
+class AnalysisSession:
+    """Rolling transcript of a single cockpit monitoring session"""
+
+    __slots__ = (
+        "session_id", "aircraft_callsign", "segments", "base_segment", "committed_text", "partial",
+        "analyzed_chars", "last_window", "last_result", "last_analyzed_at", "last_active",
+        "verdicts", "tracker", "tracked_segments", "segment_bytes", "max_chars", "log",
+        "revision", "revisions", "log_offset", "log_stale",
+    )
+
+    def __init__(
+        self,
+        session_id: str,
+        aircraft_callsign: str = None,
+        max_chars: int = ANALYSIS_SESSION_MAX_CHARS,
+        log: Optional[SegmentLog] = None,
+        revisions=None,
+    ):
+        self.session_id = session_id
+        self.aircraft_callsign = aircraft_callsign
+        # In-memory segments; segments[0] has absolute index base_segment
+        self.segments: List[SegmentRecord] = []
+        self.base_segment = 0
+        self.committed_text = ""
+        self.partial = ""
+        # Number of committed characters already covered by an analysis
+        self.analyzed_chars = 0
+        self.last_window = None
+        self.last_result = None
+        self.last_analyzed_at = None
+        self.last_active = time.monotonic()
+        self.verdicts = deque(maxlen=ANALYSIS_VERDICT_HISTORY)
+        # Deterministic clearance table, fed one committed segment at a time
+        self.tracker = ClearanceTracker()
+        self.tracked_segments = 0
+        self.segment_bytes = 0
+        self.max_chars = max_chars
+        self.log = log
+        # Shared table of session revisions (None = single worker)
+        self.revisions = revisions
+        self.revision = None
+        # Log offset up to which this copy has applied every event
+        self.log_offset = 0
+        # Another worker appended past log_offset - catch up before the next use
+        self.log_stale = False
+
+    @property
+    def committed_count(self) -> int:
+        """Number of committed segments received so far (including trimmed ones)"""
+        return self.base_segment + len(self.segments)
+
+    def append(self, base_index: int, segments: List[str], partial: str = "") -> bool:
+        """
+        Append new committed segments starting at `base_index`
+
+        Returns:
+            False if the client is ahead of this session (segments are
+            missing and the client has to resend from `committed_count`)
+        """
+        self.last_active = time.monotonic()
+
+        if base_index > self.committed_count:
+            return False
+
+        changed = base_index < self.committed_count
+        if changed:
+            # Client re-sent segments we already have - its view wins
+            self._truncate(base_index)
+
+        for segment in segments:
+            segment = (segment or "").strip()
+            if not segment:
+                continue
+            self._log(EVENT_SEGMENT, index=self.committed_count, text=segment)
+            record = SegmentRecord(segment)
+            changed = True
+            self.segments.append(record)
+            self.segment_bytes += record.memory_bytes()
+            self.committed_text = f"{self.committed_text} {segment}" if self.committed_text else segment
+
+        self.partial = (partial or "").strip()
+        self._trim()
+        if changed:
+            self._publish()
+        return True
+
+    def _log(self, event: str, **fields):
+        """Append an event to the segment log and keep log_offset in step with it"""
+        if not self.log:
+            return
+        written = self.log.append(self.session_id, event, **fields)
+        if written is None:
+            return
+        start, end = written
+        if start == self.log_offset:
+            self.log_offset = end
+        else:
+            self.log_stale = True
+
+    def _publish(self):
+        """Announce a new revision of the committed segments to other workers"""
+        if self.revisions is None:
+            return
+        self.revision = uuid.uuid4().hex[:12]
+        self.revisions.set(self.session_id, {"revision": self.revision}, ANALYSIS_SESSION_TTL_SECONDS)
+
+    def _truncate(self, base_index: int):
+        self._log(EVENT_TRUNCATE, index=base_index)
+
+        if base_index >= self.base_segment:
+            del self.segments[base_index - self.base_segment:]
+        else:
+            # Resend reaches into trimmed history - restart the in-memory part there
+            self.segments.clear()
+            self.base_segment = base_index
+        self.committed_text = " ".join(record.text for record in self.segments)
+        self.segment_bytes = sum(record.memory_bytes() for record in self.segments)
+        self.analyzed_chars = min(self.analyzed_chars, len(self.committed_text))
+
+        if self.tracked_segments > base_index:
+            self.tracker.reset()
+            self.tracked_segments = self.base_segment
+
+    def track_clearances(self) -> List[dict]:
+        """Feed new committed segments to the clearance table, return active conflicts"""
+        for record in self.segments[self.tracked_segments - self.base_segment:]:
+            self.tracker.consume([message.as_dict() for message in record.messages])
+        self.tracked_segments = self.committed_count
+        self._trim()
+        return self.tracker.active_conflicts()
+
+    def _trim(self):
+        """Drop old segments that are tracked and out of reach of the analysis window"""
+        if len(self.committed_text) <= self.max_chars:
+            return
+
+        # Text before this offset can't appear in a pending window again
+        keep_from = max(
+            self.analyzed_chars - ANALYSIS_CONTEXT_CHARS,
+            len(self.committed_text) - ANALYSIS_MAX_WINDOW_CHARS,
+        )
+        tracked = self.tracked_segments - self.base_segment
+        dropped = 0
+        dropped_chars = 0
+        for record in self.segments[:tracked]:
+            end = dropped_chars + len(record.text) + 1
+            if end > keep_from or len(self.committed_text) - end < self.max_chars // 2:
+                break
+            dropped += 1
+            dropped_chars = end
+            self.segment_bytes -= record.memory_bytes()
+
+        if dropped:
+            del self.segments[:dropped]
+            self.base_segment += dropped
+            self.committed_text = self.committed_text[dropped_chars:]
+            self.analyzed_chars = max(0, self.analyzed_chars - dropped_chars)
+
+    def set_partial(self, partial: str):
+        """Replace the current partial (not yet committed) text"""
+        self.last_active = time.monotonic()
+        self.partial = (partial or "").strip()
+
+    @property
+    def transcript(self) -> str:
+        """Rolling transcript held in memory (committed + current partial)"""
+        return f"{self.committed_text} {self.partial}".strip()
+
+    @property
+    def trimmed(self) -> bool:
+        """True if older committed segments were dropped from memory"""
+        return self.base_segment > 0
+
+    def pending_window(
+        self,
+        context_chars: int = ANALYSIS_CONTEXT_CHARS,
+        max_chars: int = ANALYSIS_MAX_WINDOW_CHARS,
+    ) -> Optional[str]:
+        """
+        Text to evaluate next: the unanalyzed delta plus a bounded tail of
+        already-analyzed context. Returns None if nothing changed since the
+        last evaluated window.
+        """
+        context_start = max(0, self.analyzed_chars - context_chars)
+        window = f"{self.committed_text[context_start:]} {self.partial}".strip()
+
+        if len(window) > max_chars:
+            window = window[-max_chars:]
+
+        if window == self.last_window:
+            return None
+        return window
+
+    def mark_analyzed(self, window: str, result: dict):
+        """Record a completed evaluation of `window`"""
+        self.last_window = window
+        self.last_result = result
+        self.last_analyzed_at = time.monotonic()
+        # The partial can still change, so only committed text counts as analyzed
+        self.analyzed_chars = len(self.committed_text)
+        self.verdicts.append(VerdictRecord(self.committed_count, result))
+        self._log(
+            EVENT_VERDICT,
+            segment_count=self.committed_count,
+            needs_intervention=bool(result.get("needs_intervention")),
+            summary=result.get("summary", ""),
+            agent_message=result.get("agent_message", ""),
+        )
+        self._trim()
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by this session"""
+        return (
+            SESSION_OVERHEAD_BYTES + self.segment_bytes
+            + sys.getsizeof(self.committed_text) + sys.getsizeof(self.partial)
+        )
+
+    def restore(self, events: List[dict]):
+        """
+        Apply segment log events (without logging or publishing them again)
+
+        Events this copy already applied - its own appends, when catching up
+        past them - are skipped, so replaying a stretch of the log that
+        overlaps the in-memory state ends in the same state as a full replay.
+        """
+        log, self.log = self.log, None
+        revisions, self.revisions = self.revisions, None
+        try:
+            for event in events:
+                kind = event.get("event")
+                if kind == EVENT_START:
+                    self.aircraft_callsign = self.aircraft_callsign or event.get("aircraft_callsign")
+                elif kind == EVENT_SEGMENT:
+                    index = event.get("index", self.committed_count)
+                    text = (event.get("text") or "").strip()
+                    if (
+                        self.base_segment <= index < self.committed_count
+                        and self.segments[index - self.base_segment].text == text
+                    ):
+                        continue
+                    if self.append(index, [text]):
+                        self.track_clearances()
+                elif kind == EVENT_TRUNCATE:
+                    self.append(event.get("index", self.committed_count), [])
+                elif kind == EVENT_VERDICT and event.get("segment_count") == self.committed_count:
+                    if (
+                        self.verdicts
+                        and self.verdicts[-1].segment_count == self.committed_count
+                        and self.verdicts[-1].summary == event.get("summary", "")
+                    ):
+                        continue
+                    result = {
+                        "needs_intervention": event.get("needs_intervention", False),
+                        "summary": event.get("summary", ""),
+                        "agent_message": event.get("agent_message", ""),
+                        "success": True,
+                        "error": None,
+                    }
+                    self.last_result = result
+                    self.analyzed_chars = len(self.committed_text)
+                    self.verdicts.append(VerdictRecord(self.committed_count, result))
+        finally:
+            self.log = log
+            self.revisions = revisions
+        self.last_active = time.monotonic()
+
+
+class AnalysisSessionManager:
+    """
+    In-process registry of analysis sessions with idle expiry and a memory cap
+
+    Args:
+        ttl_seconds: Idle time after which a session is dropped
+        max_sessions: Most sessions kept in memory
+        memory_cap_bytes: Approximate memory budget for all sessions
+        log: Segment log (defaults to one configured from SESSION_LOG_DIR)
+        state: State backend; a shared one keeps workers' copies of a
+            session in sync through published revisions
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = ANALYSIS_SESSION_TTL_SECONDS,
+        max_sessions: int = ANALYSIS_MAX_SESSIONS,
+        memory_cap_bytes: int = int(ANALYSIS_SESSIONS_MEMORY_MB * 1024 * 1024),
+        log: Optional[SegmentLog] = None,
+        state=None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.memory_cap_bytes = memory_cap_bytes
+        self.log = log if log is not None else SegmentLog()
+        self.revisions = state.table("session_revisions", 4 * max_sessions) if state is not None and state.shared else None
+        self._sessions: "OrderedDict[str, AnalysisSession]" = OrderedDict()
+
+        # Metrics
+        self.created = 0
+        self.restored = 0
+        self.expired = 0
+        self.evicted = 0
+        self.stale = 0
+
+    def get_or_create(self, session_id: str, aircraft_callsign: str = None) -> AnalysisSession:
+        """Return the session for `session_id`, rebuilding it from the log or creating it if needed"""
+        self._expire()
+
+        session = self._sessions.get(session_id)
+        revision = self.revisions.get(session_id) if self.revisions is not None else None
+        if session is not None and (
+            session.log_stale or (revision and revision.get("revision") != session.revision)
+        ):
+            # Another worker changed this session since we last saw it - apply what it added
+            events, session.log_offset = self.log.read(session_id, session.log_offset)
+            session.restore(events)
+            session.log_stale = False
+            if revision:
+                session.revision = revision.get("revision")
+            self.stale += 1
+
+        if session is None:
+            session = AnalysisSession(session_id, aircraft_callsign, log=self.log, revisions=self.revisions)
+            events, session.log_offset = self.log.read(session_id)
+            if revision:
+                session.revision = revision.get("revision")
+            if events:
+                session.restore(events)
+                self.restored += 1
+                print(f"♻️ [Session {session_id[:8]}] Restored {session.committed_count} segments from log")
+            else:
+                session._log(EVENT_START, aircraft_callsign=aircraft_callsign)
+                self.created += 1
+            self._sessions[session_id] = session
+        else:
+            self._sessions.move_to_end(session_id)
+            if aircraft_callsign:
+                session.aircraft_callsign = aircraft_callsign
+
+        self._evict()
+        return session
+
+    def get(self, session_id: str) -> Optional[AnalysisSession]:
+        return self._sessions.get(session_id)
+
+    def close(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by all sessions"""
+        return sum(session.memory_bytes() for session in self._sessions.values())
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_active >= cutoff:
+                break
+            del self._sessions[session_id]
+            self.expired += 1
+
+    def _evict(self):
+        """Drop least recently used sessions over the count or memory cap"""
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+        if self.memory_cap_bytes <= 0:
+            return
+        total = self.memory_bytes()
+        # The most recently used session always stays
+        while total > self.memory_cap_bytes and len(self._sessions) > 1:
+            _, session = self._sessions.popitem(last=False)
+            total -= session.memory_bytes()
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        """Snapshot of session counts and memory use"""
+        return {
+            "open": len(self._sessions),
+            "memory_bytes": self.memory_bytes(),
+            "memory_cap_bytes": self.memory_cap_bytes,
+            "created": self.created,
+            "restored": self.restored,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "stale": self.stale,
+        }
+
+    def __len__(self):
+        return len(self._sessions)
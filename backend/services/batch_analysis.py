@@ -0,0 +1,246 @@
+"""
+Batch Analysis - offline parsing and cockpit analysis of recorded transcripts
+
+Post-flight review runs thousands of archived transcripts at once. Parsing
+is CPU-bound and runs in chunks on a process pool; model calls fan out
+with bounded concurrency in the scheduler's bulk lane (behind all live
+traffic) and transient failures are retried with backoff. Results are
+yielded as they complete, so callers can stream them as NDJSON and resume
+an interrupted batch by skipping ids already written.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterable, List, Optional
+
+from services import gemini_client, transcript_parser
+from services.analysis_scheduler import LANE_BULK
+
+BATCH_PARSE_WORKERS = int(os.getenv("BATCH_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Transcripts per process-pool task
+BATCH_PARSE_CHUNK = int(os.getenv("BATCH_PARSE_CHUNK", "32"))
+# Slices smaller than this are parsed in-process (~10 ms, not worth a pool round-trip)
+BATCH_INLINE_PARSE_CHARS = int(os.getenv("BATCH_INLINE_PARSE_CHARS", "50000"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_RETRIES = int(os.getenv("BATCH_RETRIES", "2"))
+BATCH_RETRY_BASE_SECONDS = float(os.getenv("BATCH_RETRY_BASE_SECONDS", "1.0"))
+# Largest batch accepted in one HTTP request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "5000"))
+
+_DONE = object()
+
+
+def normalize_items(raw_items: Iterable) -> List[dict]:
+    """
+    Batch items from plain transcripts or {"id", "transcript", "aircraft_callsign"} dicts
+
+    Items without an id get their position in the batch as id.
+
+    Raises:
+        ValueError: for an item without a transcript or a duplicate id
+    """
+    items = []
+    seen = set()
+    for position, raw in enumerate(raw_items):
+        if isinstance(raw, str):
+            raw = {"transcript": raw}
+        if not isinstance(raw, dict) or not isinstance(raw.get("transcript"), str):
+            raise ValueError(f"Item {position}: expected a transcript string or an object with 'transcript'")
+        item_id = str(raw["id"]) if raw.get("id") is not None else str(position)
+        if item_id in seen:
+            raise ValueError(f"Item {position}: duplicate id {item_id!r}")
+        seen.add(item_id)
+        items.append({
+            "id": item_id,
+            "transcript": raw["transcript"],
+            "aircraft_callsign": raw.get("aircraft_callsign"),
+        })
+    return items
+
+
+class BatchAnalyzer:
+    """
+    Runs batches of transcripts through the parser and the pilots advisor
+
+    Args:
+        service: VoiceService performing the analysis
+        parse_workers: Parser processes (0 = parse in-process)
+        concurrency: Model analyses in flight per batch
+        retries: Extra attempts for failed analyses
+    """
+
+    def __init__(
+        self,
+        service,
+        parse_workers: int = BATCH_PARSE_WORKERS,
+        concurrency: int = BATCH_LLM_CONCURRENCY,
+        retries: int = BATCH_RETRIES,
+    ):
+        self.service = service
+        self.parse_workers = parse_workers
+        self.concurrency = max(1, concurrency)
+        self.retries = max(0, retries)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._batch_counter = 0
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.skipped = 0
+        self.analyzed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _parse_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process with live threads and sockets isn't safe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    async def parse(self, transcripts: List[str]) -> List[List[dict]]:
+        """parse_transcript for each transcript, chunked over the process pool"""
+        if self.parse_workers <= 0 or sum(len(transcript) for transcript in transcripts) <= BATCH_INLINE_PARSE_CHARS:
+            return transcript_parser.parse_many(transcripts)
+
+        loop = asyncio.get_running_loop()
+        pool = self._parse_pool()
+        chunks = [transcripts[i:i + BATCH_PARSE_CHUNK] for i in range(0, len(transcripts), BATCH_PARSE_CHUNK)]
+        parsed = await asyncio.gather(*(
+            loop.run_in_executor(pool, transcript_parser.parse_many, chunk) for chunk in chunks
+        ))
+        return [messages for chunk in parsed for messages in chunk]
+
+    async def run(
+        self,
+        items: List[dict],
+        analyze: bool = True,
+        skip_ids: Iterable[str] = (),
+    ) -> AsyncIterator[dict]:
+        """
+        Parse (and analyze) `items`, yielding one result per item as it completes
+
+        Args:
+            items: Output of normalize_items
+            analyze: Also run the pilots advisor (otherwise parse only)
+            skip_ids: Ids already processed by an interrupted run
+
+        Yields:
+            {"id", "messages", "success", "error"} plus, when analyzing,
+            "needs_intervention", "summary", "agent_message" and "attempts"
+        """
+        skip_ids = set(skip_ids)
+        pending = [item for item in items if item["id"] not in skip_ids]
+        self.batches += 1
+        self.items += len(pending)
+        self.skipped += len(items) - len(pending)
+        self._batch_counter += 1
+        batch_id = f"{os.getpid()}-{self._batch_counter}"
+
+        results: asyncio.Queue = asyncio.Queue()
+        work: asyncio.Queue = asyncio.Queue(maxsize=4 * self.concurrency)
+        slice_size = BATCH_PARSE_CHUNK * max(1, self.parse_workers)
+
+        async def produce():
+            # Parse slice by slice so analysis starts before the whole batch is parsed
+            try:
+                for start in range(0, len(pending), slice_size):
+                    batch_slice = pending[start:start + slice_size]
+                    parsed = await self.parse([item["transcript"] for item in batch_slice])
+                    for item, messages in zip(batch_slice, parsed):
+                        await work.put((item, messages))
+            finally:
+                for _ in range(self.concurrency):
+                    await work.put(_DONE)
+
+        async def consume():
+            while True:
+                entry = await work.get()
+                if entry is _DONE:
+                    return
+                item, messages = entry
+                if analyze:
+                    result = await self._analyze(item, messages, batch_id)
+                else:
+                    result = {"id": item["id"], "messages": messages, "success": True, "error": None}
+                await results.put(result)
+
+        async def supervise():
+            tasks = [asyncio.create_task(produce())]
+            tasks += [asyncio.create_task(consume()) for _ in range(self.concurrency)]
+            try:
+                await asyncio.gather(*tasks)
+                await results.put(_DONE)
+            except Exception as e:
+                await results.put(e)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        supervisor = asyncio.create_task(supervise())
+        try:
+            while True:
+                result = await results.get()
+                if result is _DONE:
+                    return
+                if isinstance(result, Exception):
+                    raise result
+                yield result
+        finally:
+            # Caller stopped reading (client disconnected, CLI interrupted)
+            supervisor.cancel()
+
+    async def _analyze(self, item: dict, messages: List[dict], batch_id: str) -> dict:
+        attempt = 0
+        while True:
+            attempt += 1
+            result = await self.service.analyze_cockpit_conversation(
+                item["transcript"],
+                item["aircraft_callsign"],
+                client_key=f"batch:{batch_id}:{item['id']}",
+                lane=LANE_BULK,
+                messages=messages,
+            )
+            # Missing configuration won't fix itself - only retry upstream failures
+            # and local-only verdicts from while Gemini's circuit was open
+            retriable = (not result.get("success") or result.get("degraded")) and gemini_client.configured()
+            if not retriable or attempt > self.retries:
+                break
+            self.retried += 1
+            await asyncio.sleep(result.get("retry_after") or BATCH_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+
+        if result.get("success"):
+            self.analyzed += 1
+        else:
+            self.failed += 1
+        return {
+            "id": item["id"],
+            "messages": messages,
+            "needs_intervention": result.get("needs_intervention", False),
+            "summary": result.get("summary"),
+            "agent_message": result.get("agent_message"),
+            "success": bool(result.get("success")),
+            "error": result.get("error"),
+            "attempts": attempt,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        """Snapshot of batch counters"""
+        return {
+            "parse_workers": self.parse_workers,
+            "concurrency": self.concurrency,
+            "batches": self.batches,
+            "items": self.items,
+            "skipped": self.skipped,
+            "analyzed": self.analyzed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
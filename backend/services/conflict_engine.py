@@ -0,0 +1,327 @@
+"""
+Conflict Engine - deterministic runway / clearance conflict detection
+
+Consumes parse_transcript messages and keeps a per-runway and per-callsign
+clearance table. The concrete conflicts from the safety prompt (two
+aircraft cleared onto the same runway, "line up and wait" while another
+aircraft is cleared to land, wrong readbacks) are raised in-process
+without a model round-trip.
+
+Clearances end when released (go-around, runway vacated, airborne) or
+expire after CLEARANCE_TTL_SECONDS / CLEARANCE_MAX_MESSAGES, so a takeoff
+clearance from minutes ago doesn't conflict with today's landing.
+"""
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+# A clearance not acted on within this long is treated as used up
+CLEARANCE_TTL_SECONDS = float(os.getenv("CLEARANCE_TTL_SECONDS", "300"))
+# ... or after this many later messages (one-shot transcripts carry no timing)
+CLEARANCE_MAX_MESSAGES = int(os.getenv("CLEARANCE_MAX_MESSAGES", "30"))
+
+LAND = "land"
+TAKEOFF = "takeoff"
+LINE_UP = "line_up_and_wait"
+CROSS = "cross"
+HOLD_SHORT = "hold_short"
+RELEASE = "release"
+
+# First match wins - order matters ("cleared to land" before generic phrases)
+CLEARANCE_PATTERNS = [
+    (RELEASE, re.compile(
+        r"\bgo(?:ing)?[ -]around\b|\bcancel(?:l?ing)? (?:the )?(?:takeoff|landing|take off)(?: clearance)?\b|"
+        r"\bvacat(?:e|ed|ing)\b|\bclear of (?:the )?runway\b|\bexit(?:ing)? (?:the )?runway\b|"
+        # Takeoff completed - the runway is free again
+        r"\bpositive rate\b|\bairborne\b|\bcontact departure\b",
+        re.IGNORECASE)),
+    (LAND, re.compile(
+        r"\bcleared (?:to land|for (?:the )?option|touch and go|low approach)\b",
+        re.IGNORECASE)),
+    (TAKEOFF, re.compile(r"\bcleared (?:for )?take ?-?off\b", re.IGNORECASE)),
+    (LINE_UP, re.compile(r"\bline up and wait\b|\bposition and hold\b|\blining up\b", re.IGNORECASE)),
+    (HOLD_SHORT, re.compile(r"\bhold(?:ing)? short\b", re.IGNORECASE)),
+    (CROSS, re.compile(r"\bcross(?:ing)? runway\b|\bcleared to cross\b", re.IGNORECASE)),
+]
+
+RUNWAY_RE = re.compile(r"\b(?:runway|rwy)\s*(\d{1,2})\s*(left|right|center|centre|[LRC])?\b", re.IGNORECASE)
+
+# Clearances that put an aircraft on (or about to be on) the runway
+OCCUPYING = {LAND, TAKEOFF, LINE_UP, CROSS}
+# At least one side of a conflicting pair must be an active landing/takeoff
+MOVING = {LAND, TAKEOFF}
+# Readback mismatch is only checked between these kinds
+READBACK_CHECKED = {LAND, TAKEOFF, LINE_UP, HOLD_SHORT}
+
+KIND_DESCRIPTIONS = {
+    LAND: "cleared to land on",
+    TAKEOFF: "cleared for takeoff on",
+    LINE_UP: "cleared to line up and wait on",
+    CROSS: "cleared to cross",
+    HOLD_SHORT: "holding short of",
+}
+
+OWN_ACTIONS = {
+    LAND: "Be prepared to go around and confirm your landing clearance with tower.",
+    TAKEOFF: "Do not begin the takeoff roll - hold position and confirm with tower.",
+    LINE_UP: "Do not take off - hold position and confirm with tower before proceeding.",
+    CROSS: "Hold short and confirm with tower before crossing.",
+}
+
+
+def normalize_runway(number: str, side: Optional[str]) -> str:
+    runway = str(int(number))
+    if side:
+        runway += side[0].upper()
+    return runway
+
+
+def _callsign_key(callsign: str) -> str:
+    return " ".join(callsign.lower().split())
+
+
+def extract_clearance(text: str):
+    """
+    Clearance kind and runway mentioned in a single message
+
+    Returns:
+        (kind, runway) - either may be None
+    """
+    kind = None
+    for candidate, pattern in CLEARANCE_PATTERNS:
+        if pattern.search(text):
+            kind = candidate
+            break
+
+    runway_match = RUNWAY_RE.search(text)
+    runway = normalize_runway(*runway_match.groups()) if runway_match else None
+    return kind, runway
+
+
+class ClearanceTracker:
+    """
+    Per-runway / per-callsign clearance table fed with parsed messages
+
+    Call `consume(messages)` with the output of parse_transcript (or any
+    new slice of it); it returns conflicts raised by those messages.
+    `active_conflicts()` is the current state - conflicts a later release
+    or expiry already resolved are gone from it.
+
+    Args:
+        ttl: Seconds a clearance stays in force
+        max_messages: Later messages after which a clearance is dropped
+        clock: Time source (monotonic seconds)
+    """
+
+    def __init__(
+        self,
+        ttl: float = CLEARANCE_TTL_SECONDS,
+        max_messages: int = CLEARANCE_MAX_MESSAGES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.clock = clock
+        self.messages = 0
+        # callsign key -> {"callsign", "kind", "runway", "issued_at", "message"}
+        self.clearances: Dict[str, dict] = {}
+        # runway -> set of callsign keys with an occupying clearance
+        self.runways: Dict[str, set] = {}
+        # callsign key -> last ATC-issued (kind, runway, issued_at, message)
+        self.issued: Dict[str, tuple] = {}
+        self._raised = set()
+        self._active: Dict[tuple, dict] = {}
+
+    def reset(self):
+        self.__init__(self.ttl, self.max_messages, self.clock)
+
+    def consume(self, messages: List[dict]) -> List[dict]:
+        """
+        Update the clearance table with new messages
+
+        Returns:
+            Newly raised conflicts:
+            [{"type": "runway_conflict"|"readback_mismatch", "runway": "28", "callsigns": [...], "description": "..."}]
+        """
+        raised = []
+        for message in messages:
+            raised.extend(self._consume_message(message))
+        return raised
+
+    def active_conflicts(self) -> List[dict]:
+        """Conflicts whose clearances are still in force"""
+        self._expire()
+        return list(self._active.values())
+
+    def _expired(self, issued_at: float, message: int) -> bool:
+        return (
+            self.clock() - issued_at > self.ttl
+            or self.messages - message > self.max_messages
+        )
+
+    def _expire(self):
+        for key in [key for key, entry in self.clearances.items() if self._expired(entry["issued_at"], entry["message"])]:
+            previous = self.clearances.pop(key)
+            self.runways.get(previous["runway"], set()).discard(key)
+            self._drop_conflicts(key)
+        for key in [key for key, issued in self.issued.items() if self._expired(issued[2], issued[3])]:
+            del self.issued[key]
+
+    def _consume_message(self, message: dict) -> List[dict]:
+        self.messages += 1
+        self._expire()
+        speaker = message.get("speaker")
+        from_atc = speaker == "ATC"
+        callsign = message.get("target_callsign") if from_atc else speaker
+        if not callsign or callsign == "Unknown":
+            return []
+
+        kind, runway = extract_clearance(message.get("text", ""))
+        if kind is None:
+            return []
+
+        key = _callsign_key(callsign)
+        previous = self.clearances.get(key)
+        if runway is None and previous:
+            runway = previous["runway"]
+
+        self._set_clearance(key, callsign, kind, runway)
+
+        conflicts = []
+        if from_atc:
+            self.issued[key] = (kind, runway, self.clock(), self.messages)
+        else:
+            conflicts.extend(self._check_readback(key, callsign, kind, runway))
+
+        if kind in OCCUPYING and runway:
+            conflicts.extend(self._check_runway(runway))
+        return conflicts
+
+    def _set_clearance(self, key: str, callsign: str, kind: str, runway: Optional[str]):
+        previous = self.clearances.pop(key, None)
+        if previous:
+            self.runways.get(previous["runway"], set()).discard(key)
+            self._drop_conflicts(key)
+
+        if kind == RELEASE:
+            return
+
+        self.clearances[key] = {
+            "callsign": callsign,
+            "kind": kind,
+            "runway": runway,
+            "issued_at": self.clock(),
+            "message": self.messages,
+        }
+        if kind in OCCUPYING and runway:
+            self.runways.setdefault(runway, set()).add(key)
+
+    def _drop_conflicts(self, key: str):
+        for conflict_id in [cid for cid in self._active if key in cid[2]]:
+            del self._active[conflict_id]
+
+    def _check_runway(self, runway: str) -> List[dict]:
+        raised = []
+        occupants = sorted(self.runways.get(runway, ()))
+        for i, first in enumerate(occupants):
+            for second in occupants[i + 1:]:
+                a, b = self.clearances[first], self.clearances[second]
+                if a["kind"] not in MOVING and b["kind"] not in MOVING:
+                    continue
+
+                conflict_id = ("runway_conflict", runway, frozenset((first, second)))
+                if conflict_id in self._active:
+                    continue
+                conflict = {
+                    "type": "runway_conflict",
+                    "runway": runway,
+                    "callsigns": [a["callsign"], b["callsign"]],
+                    "kinds": {a["callsign"]: a["kind"], b["callsign"]: b["kind"]},
+                    "description": (
+                        f"{a['callsign']} is {KIND_DESCRIPTIONS[a['kind']]} runway {runway} while "
+                        f"{b['callsign']} is {KIND_DESCRIPTIONS[b['kind']]} the same runway"
+                    ),
+                }
+                self._active[conflict_id] = conflict
+                if conflict_id not in self._raised:
+                    self._raised.add(conflict_id)
+                    raised.append(conflict)
+        return raised
+
+    def _check_readback(self, key: str, callsign: str, kind: str, runway: Optional[str]) -> List[dict]:
+        issued = self.issued.get(key)
+        if not issued or kind not in READBACK_CHECKED or issued[0] not in READBACK_CHECKED:
+            return []
+
+        issued_kind, issued_runway = issued[:2]
+        runway_differs = issued_runway and runway and issued_runway != runway
+        if issued_kind == kind and not runway_differs:
+            return []
+
+        conflict_id = ("readback_mismatch", runway, frozenset((key,)))
+        if conflict_id in self._raised:
+            return []
+        self._raised.add(conflict_id)
+
+        conflict = {
+            "type": "readback_mismatch",
+            "runway": runway or issued_runway,
+            "callsigns": [callsign],
+            "kinds": {callsign: kind},
+            "description": (
+                f"{callsign} read back '{KIND_DESCRIPTIONS.get(kind, kind)} runway {runway or '?'}' but ATC issued "
+                f"'{KIND_DESCRIPTIONS.get(issued_kind, issued_kind)} runway {issued_runway or '?'}'"
+            ),
+        }
+        self._active[conflict_id] = conflict
+        return [conflict]
+
+
+def _same_callsign(a: str, b: str) -> bool:
+    return _callsign_key(a) == _callsign_key(b)
+
+
+def describe_conflicts(conflicts: List[dict], aircraft_callsign: str = None) -> dict:
+    """
+    Deterministic summary and agent message for detected conflicts
+
+    Returns:
+        {"summary": "...", "agent_message": "..."}
+    """
+    summary = " ".join(f"{conflict['description']}." for conflict in conflicts)
+
+    # Prefer a conflict involving the monitored aircraft
+    own = None
+    if aircraft_callsign:
+        own = next(
+            (c for c in conflicts if any(_same_callsign(cs, aircraft_callsign) for cs in c["callsigns"])),
+            None,
+        )
+
+    if own is None:
+        conflict = conflicts[0]
+        agent_message = (
+            f"Attention: Conflicting clearances detected on runway {conflict['runway']}. "
+            f"{conflict['description']}. Verify with tower before proceeding."
+        )
+        return {"summary": summary, "agent_message": agent_message}
+
+    own_callsign = next(cs for cs in own["callsigns"] if _same_callsign(cs, aircraft_callsign))
+    own_kind = own["kinds"][own_callsign]
+
+    if own["type"] == "readback_mismatch":
+        agent_message = (
+            f"Caution: Your readback does not match the clearance issued. {own['description']}. "
+            f"Confirm your clearance with tower before proceeding."
+        )
+        return {"summary": summary, "agent_message": agent_message}
+
+    other = next(cs for cs in own["callsigns"] if cs != own_callsign)
+    other_kind = own["kinds"][other]
+    agent_message = (
+        f"Alert: {other} is {KIND_DESCRIPTIONS[other_kind]} runway {own['runway']} "
+        f"while you are {KIND_DESCRIPTIONS[own_kind]} the same runway. "
+        f"{OWN_ACTIONS.get(own_kind, 'Confirm your clearance with tower.')}"
+    )
+    return {"summary": summary, "agent_message": agent_message}
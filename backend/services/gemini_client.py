@@ -0,0 +1,67 @@
+"""
+Gemini Client - lazy google-generativeai setup
+
+Importing the SDK pulls in protobuf, gRPC and the generated API clients
+(~0.7 s, more than the rest of the backend together). It is imported and
+configured on first use - or ahead of time by the lifespan warm-up
+(STARTUP_WARMUP=1) - so CLIs, benchmarks and parser processes that never
+call Gemini don't pay for it.
+"""
+import inspect
+import os
+import threading
+import time
+from functools import lru_cache
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash-exp")
+# "grpc" (SDK default) or "rest"; rest + GEMINI_API_ENDPOINT allows a local stub server
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT")
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+_lock = threading.Lock()
+_genai = None
+load_seconds = 0.0
+
+
+def configured() -> bool:
+    """Whether Gemini calls are possible at all (without loading the SDK)"""
+    return bool(GEMINI_API_KEY)
+
+
+def loaded() -> bool:
+    return _genai is not None
+
+
+def sdk():
+    """The google.generativeai module, imported and configured on first call"""
+    global _genai, load_seconds
+    if _genai is None:
+        # Warm-up imports on a thread; a request racing it waits here
+        with _lock:
+            if _genai is None:
+                started_at = time.perf_counter()
+                import google.generativeai as genai
+
+                if GEMINI_API_KEY:
+                    genai_options = {"api_key": GEMINI_API_KEY}
+                    if GEMINI_TRANSPORT:
+                        genai_options["transport"] = GEMINI_TRANSPORT
+                    if GEMINI_API_ENDPOINT:
+                        genai_options["client_options"] = {"api_endpoint": GEMINI_API_ENDPOINT}
+                    genai.configure(**genai_options)
+                load_seconds = time.perf_counter() - started_at
+                print(f"📦 [Gemini] SDK loaded in {load_seconds * 1000:.0f} ms")
+                _genai = genai
+    return _genai
+
+
+@lru_cache(maxsize=None)
+def supports(class_name: str, parameter: str) -> bool:
+    """Whether the installed SDK's `class_name` accepts `parameter` (feature detection)"""
+    return parameter in inspect.signature(getattr(sdk(), class_name)).parameters
+
+
+def generative_model(**kwargs):
+    """New GenerativeModel for GEMINI_MODEL_NAME"""
+    return sdk().GenerativeModel(GEMINI_MODEL_NAME, **kwargs)
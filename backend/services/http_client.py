@@ -0,0 +1,54 @@
+"""
+HTTP Client - shared keep-alive connection pool for outbound calls
+
+One AsyncClient per worker process, opened lazily and closed in the
+FastAPI lifespan, so repeated calls to the same upstream reuse TCP/TLS
+connections instead of paying a fresh handshake every time.
+
+httpx itself is imported with the client, not with this module, to keep
+worker import time down; the lifespan warm-up creates it before serving.
+"""
+import importlib.util
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "120"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+
+# httpx needs h2 for HTTP/2
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+HTTP2_ENABLED = HTTP2_AVAILABLE and os.getenv("HTTP2_ENABLED", "1") != "0"
+
+_client: Optional["httpx.AsyncClient"] = None
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Return the shared AsyncClient, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx
+
+        _client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=HTTP_TIMEOUT_SECONDS,
+        )
+    return _client
+
+
+async def close_http_client():
+    """Close the shared AsyncClient (called on application shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
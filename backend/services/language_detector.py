@@ -0,0 +1,253 @@
+"""
+Language Detector - offline character n-gram language identification
+
+Scores a transcript against precomputed per-language n-gram profiles
+(naive Bayes over hashed 1-3 character n-grams) instead of asking Gemini.
+Profiles live in one binary file that is memory-mapped on first use: each
+hash bucket holds a row of float32 log-probabilities, one per language, so
+scoring touches only the rows of n-grams that occur in the text. The file
+is not kept in git - it is built from the text corpora at install time
+(Dockerfile, `make setup`) or, failing that, on first use, and rebuilt
+when a corpus is newer than it.
+
+Covers the languages heard on our frequencies: Polish, English and the
+neighbours (German, Czech, Slovak, Lithuanian, Ukrainian, Russian).
+
+Build the profiles ahead of time (run from backend/):
+    python -m services.language_detector
+"""
+import math
+import mmap
+import os
+import re
+import struct
+import time
+import zlib
+from collections import Counter
+from typing import Optional
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "language_data")
+
+LANGUAGE_PROFILES_PATH = os.getenv("LANGUAGE_PROFILES_PATH", os.path.join(_DATA_DIR, "profiles.bin"))
+LANGUAGE_CORPUS_DIR = os.path.join(_DATA_DIR, "corpus")
+# Only the recent tail is scored - more text doesn't change the answer
+LANGUAGE_MAX_CHARS = int(os.getenv("LANGUAGE_MAX_CHARS", "1000"))
+# Average log-likelihood gap per n-gram between the best and second language
+LANGUAGE_HIGH_MARGIN = float(os.getenv("LANGUAGE_HIGH_MARGIN", "0.35"))
+LANGUAGE_MEDIUM_MARGIN = float(os.getenv("LANGUAGE_MEDIUM_MARGIN", "0.15"))
+# Fewer letters than this is always low confidence
+LANGUAGE_MIN_LETTERS = int(os.getenv("LANGUAGE_MIN_LETTERS", "12"))
+
+NGRAM_ORDERS = (1, 2, 3)
+PROFILE_BUCKETS = 1 << 14
+PROFILE_SMOOTHING = 0.5
+
+LANGUAGE_NAMES = {
+    "en": "English",
+    "pl": "Polish",
+    "de": "German",
+    "cs": "Czech",
+    "sk": "Slovak",
+    "lt": "Lithuanian",
+    "uk": "Ukrainian",
+    "ru": "Russian",
+}
+
+# magic, format version, language count, bucket count
+_HEADER = struct.Struct("<4sHHI")
+_MAGIC = b"LNGP"
+_VERSION = 1
+_NAME = struct.Struct("<16s")
+
+_NON_LETTERS = re.compile(r"[\W\d_]+")
+
+
+def extract_ngrams(text: str) -> Counter:
+    """Hashed n-gram counts of `text` (letters only, words padded with spaces)"""
+    counts = Counter()
+    for word in _NON_LETTERS.split(text.lower()):
+        if not word:
+            continue
+        padded = f" {word} "
+        for n in NGRAM_ORDERS:
+            for i in range(len(padded) - n + 1):
+                counts[padded[i:i + n]] += 1
+    del counts[" "]
+
+    buckets = Counter()
+    for gram, count in counts.items():
+        buckets[zlib.crc32(gram.encode("utf-8")) & (PROFILE_BUCKETS - 1)] += count
+    return buckets
+
+
+def build_profiles(corpus_dir: str = LANGUAGE_CORPUS_DIR, path: str = LANGUAGE_PROFILES_PATH) -> list:
+    """
+    Build the profile file from one `<code>.txt` corpus per language
+
+    Returns:
+        Language codes in file order
+    """
+    codes = sorted(name[:-4] for name in os.listdir(corpus_dir) if name.endswith(".txt"))
+    rows = []
+    for code in codes:
+        with open(os.path.join(corpus_dir, f"{code}.txt"), encoding="utf-8") as f:
+            counts = extract_ngrams(f.read())
+        total = sum(counts.values()) + PROFILE_SMOOTHING * PROFILE_BUCKETS
+        rows.append([
+            math.log((counts.get(bucket, 0) + PROFILE_SMOOTHING) / total)
+            for bucket in range(PROFILE_BUCKETS)
+        ])
+
+    # Bucket-major: one n-gram lookup reads one contiguous row of languages
+    row = struct.Struct(f"<{len(codes)}f")
+    # Per process - several workers may build on first use at the same time
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(codes), PROFILE_BUCKETS))
+        for code in codes:
+            f.write(_NAME.pack(code.encode("ascii")))
+        for bucket in range(PROFILE_BUCKETS):
+            f.write(row.pack(*(language_row[bucket] for language_row in rows)))
+    os.replace(tmp_path, path)
+    return codes
+
+
+class LanguageDetector:
+    """
+    Memory-mapped n-gram profiles and the scorer on top of them
+
+    Args:
+        path: Profile file built by build_profiles
+        corpus_dir: Corpora the file is built from when missing or outdated
+    """
+
+    def __init__(self, path: str = LANGUAGE_PROFILES_PATH, corpus_dir: str = LANGUAGE_CORPUS_DIR):
+        self.path = path
+        self.corpus_dir = corpus_dir
+        self._mmap: Optional[mmap.mmap] = None
+        self._codes: list = []
+        self._row: Optional[struct.Struct] = None
+        self._rows_offset = 0
+        self._buckets = 0
+        self._load_error: Optional[str] = None
+
+        # Metrics
+        self.detections = 0
+        self.by_confidence = {"high": 0, "medium": 0, "low": 0}
+        self.total_seconds = 0.0
+
+    def _load(self) -> bool:
+        if self._mmap is not None:
+            return True
+        if self._load_error is not None:
+            return False
+        try:
+            if self._outdated():
+                started_at = time.perf_counter()
+                build_profiles(self.corpus_dir, self.path)
+                print(
+                    f"🔤 [Language Detector] Built profiles from {self.corpus_dir} "
+                    f"in {(time.perf_counter() - started_at) * 1000:.0f} ms"
+                )
+            with open(self.path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, languages, buckets = _HEADER.unpack_from(mapped, 0)
+            if magic != _MAGIC or version != _VERSION:
+                mapped.close()
+                raise ValueError(f"not a v{_VERSION} language profile file")
+            offset = _HEADER.size
+            codes = []
+            for _ in range(languages):
+                codes.append(_NAME.unpack_from(mapped, offset)[0].rstrip(b"\0").decode("ascii"))
+                offset += _NAME.size
+        except (OSError, ValueError, struct.error) as e:
+            self._load_error = str(e)
+            print(f"⚠️ [Language Detector] Profiles unavailable ({self.path}): {e}")
+            return False
+
+        self._mmap = mapped
+        self._codes = codes
+        self._row = struct.Struct(f"<{languages}f")
+        self._rows_offset = offset
+        self._buckets = buckets
+        print(f"🔤 [Language Detector] Loaded {languages} language profiles")
+        return True
+
+    def _outdated(self) -> bool:
+        """Whether the profile file is missing or older than one of the corpora"""
+        if not os.path.isdir(self.corpus_dir):
+            # Prebuilt file deployed without the corpora - use it as it is
+            return False
+        try:
+            built_at = os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return True
+        return any(
+            os.path.getmtime(os.path.join(self.corpus_dir, name)) > built_at
+            for name in os.listdir(self.corpus_dir)
+            if name.endswith(".txt")
+        )
+
+    @property
+    def available(self) -> bool:
+        return self._load()
+
+    def detect(self, text: str) -> Optional[dict]:
+        """
+        Most likely language of `text`
+
+        Returns:
+            {"language": "Polish", "confidence": "high/medium/low"},
+            or None when the profiles can't be loaded
+        """
+        if not self._load():
+            return None
+        started_at = time.perf_counter()
+
+        text = text[-LANGUAGE_MAX_CHARS:]
+        counts = extract_ngrams(text)
+        total = sum(counts.values())
+        scores = [0.0] * len(self._codes)
+        row, mapped, offset = self._row, self._mmap, self._rows_offset
+        for bucket, count in counts.items():
+            if bucket >= self._buckets:
+                continue
+            values = row.unpack_from(mapped, offset + bucket * row.size)
+            scores = [score + count * value for score, value in zip(scores, values)]
+
+        if total == 0:
+            language, confidence = "Unknown", "low"
+        else:
+            ranked = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+            best = ranked[0]
+            margin = (scores[best] - scores[ranked[1]]) / total if len(ranked) > 1 else math.inf
+            letters = len(_NON_LETTERS.sub("", text))
+            if letters < LANGUAGE_MIN_LETTERS or margin < LANGUAGE_MEDIUM_MARGIN:
+                confidence = "low"
+            elif margin < LANGUAGE_HIGH_MARGIN:
+                confidence = "medium"
+            else:
+                confidence = "high"
+            language = LANGUAGE_NAMES.get(self._codes[best], self._codes[best])
+
+        self.detections += 1
+        self.by_confidence[confidence] += 1
+        self.total_seconds += time.perf_counter() - started_at
+        return {"language": language, "confidence": confidence}
+
+    def stats(self) -> dict:
+        """Snapshot of detector counters"""
+        return {
+            "loaded": self._mmap is not None,
+            "languages": len(self._codes),
+            "detections": self.detections,
+            "high": self.by_confidence["high"],
+            "medium": self.by_confidence["medium"],
+            "low": self.by_confidence["low"],
+            "avg_detect_us": round(self.total_seconds / self.detections * 1e6, 1) if self.detections else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    built = build_profiles()
+    print(f"✅ {len(built)} language profiles ({', '.join(built)}) -> {LANGUAGE_PROFILES_PATH}")
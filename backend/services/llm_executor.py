@@ -0,0 +1,258 @@
+"""
+LLM Executor - async execution layer for Gemini calls
+
+Keeps model round-trips off the event loop so a slow Gemini call never
+stalls other requests (e.g. /api/voice/token) served by the same worker.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+from services.metrics import span, upstream_call
+
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "15"))
+GEMINI_USE_ASYNC_API = os.getenv("GEMINI_USE_ASYNC_API", "1") != "0"
+
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call exceeds its per-call timeout"""
+
+
+_STREAM_END = object()
+
+
+class LLMExecutor:
+    """
+    Runs Gemini `generate_content` calls with bounded concurrency.
+
+    Uses the SDK's native `generate_content_async` when available, otherwise
+    falls back to a dedicated thread pool sized to the concurrency limit.
+    Calls beyond the limit wait in a queue; the queue depth is tracked.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+        timeout: float = GEMINI_TIMEOUT_SECONDS,
+        use_async_api: bool = GEMINI_USE_ASYNC_API,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.use_async_api = use_async_api
+        self._semaphore = None
+        self._executor = None
+
+        # Metrics
+        self.in_flight = 0
+        # Pool threads still running a call (possibly one its caller gave up on)
+        self.threads_busy = 0
+        self.queued = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.total_call_seconds = 0.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="gemini",
+            )
+        return self._executor
+
+    def _uses_async_api(self, model) -> bool:
+        return self.use_async_api and hasattr(model, "generate_content_async")
+
+    def _submit(self, semaphore: asyncio.Semaphore, fn) -> asyncio.Future:
+        """
+        Run `fn` on the thread pool, handing it the caller's concurrency slot
+
+        A thread can't be cancelled, so the slot is released when the thread
+        finishes rather than when the caller times out - otherwise sustained
+        timeouts would pile up more concurrent Gemini calls than the limit.
+        """
+        loop = asyncio.get_running_loop()
+
+        def release():
+            self.threads_busy -= 1
+            semaphore.release()
+
+        def done(_):
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:
+                pass  # Event loop already closed (shutdown)
+
+        self.threads_busy += 1
+        future = self._get_executor().submit(fn)
+        future.add_done_callback(done)
+        return asyncio.wrap_future(future)
+
+    async def _acquire(self) -> asyncio.Semaphore:
+        semaphore = self._get_semaphore()
+        queued_at = time.perf_counter()
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        try:
+            with span("gemini_queue_wait"):
+                await semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.total_wait_seconds += time.perf_counter() - queued_at
+        return semaphore
+
+    async def generate(self, model, prompt, timeout: Optional[float] = None, **kwargs):
+        """
+        Run `model.generate_content(prompt)` without blocking the event loop
+
+        Args:
+            model: Gemini GenerativeModel instance
+            prompt: Prompt contents passed to the model
+            timeout: Per-call timeout in seconds (defaults to executor timeout)
+
+        Returns:
+            The SDK response object
+
+        Raises:
+            LLMTimeoutError: if the call does not finish within the timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        semaphore = await self._acquire()
+        holds_slot = True
+
+        self.in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            with span("gemini_call"), upstream_call("gemini"):
+                if self._uses_async_api(model):
+                    call = model.generate_content_async(prompt, **kwargs)
+                else:
+                    call = self._submit(semaphore, lambda: model.generate_content(prompt, **kwargs))
+                    holds_slot = False
+                response = await asyncio.wait_for(call, timeout)
+            self.completed += 1
+            return response
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"Gemini call timed out after {timeout:.1f}s")
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.total_call_seconds += time.perf_counter() - started_at
+            self.in_flight -= 1
+            if holds_slot:
+                semaphore.release()
+
+    async def stream(self, model, prompt, timeout: Optional[float] = None, **kwargs) -> AsyncIterator[str]:
+        """
+        Run `model.generate_content(prompt, stream=True)`, yielding text chunks as they arrive
+
+        The call holds a concurrency slot until the stream ends; the timeout
+        applies to each chunk (including the first).
+
+        Raises:
+            LLMTimeoutError: if no chunk arrives within the timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        semaphore = await self._acquire()
+        holds_slot = True
+
+        self.in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            with span("gemini_stream"), upstream_call("gemini"):
+                if self._uses_async_api(model):
+                    response = await asyncio.wait_for(
+                        model.generate_content_async(prompt, stream=True, **kwargs), timeout
+                    )
+                    chunks = response.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                        except StopAsyncIteration:
+                            break
+                        yield chunk.text
+                else:
+                    holds_slot = False
+                    async for text in self._stream_in_thread(semaphore, model, prompt, timeout, **kwargs):
+                        yield text
+            self.completed += 1
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"Gemini stream stalled for {timeout:.1f}s")
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.total_call_seconds += time.perf_counter() - started_at
+            self.in_flight -= 1
+            if holds_slot:
+                semaphore.release()
+
+    async def _stream_in_thread(
+        self, semaphore: asyncio.Semaphore, model, prompt, timeout: float, **kwargs
+    ) -> AsyncIterator[str]:
+        """Iterate the blocking stream on the thread pool, handing chunks to the event loop"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def pump():
+            try:
+                for chunk in model.generate_content(prompt, stream=True, **kwargs):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+                loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+            except BaseException as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        self._submit(semaphore, pump)
+        try:
+            while True:
+                item = await asyncio.wait_for(queue.get(), timeout)
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # The consumer stopped early - let the thread drop the rest
+            stop.set()
+
+    def stats(self) -> dict:
+        """Snapshot of concurrency and queue-depth metrics"""
+        finished = self.completed + self.errors + self.timeouts
+        return {
+            "mode": "async_api" if self.use_async_api else "thread_pool",
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+            "in_flight": self.in_flight,
+            "threads_busy": self.threads_busy,
+            "queue_depth": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(1000 * self.total_wait_seconds / finished, 1) if finished else 0.0,
+            "avg_call_ms": round(1000 * self.total_call_seconds / finished, 1) if finished else 0.0,
+        }
+
+    def shutdown(self):
+        """Release the fallback thread pool, if one was created"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,304 @@
+"""
+LLM Responses - typed parsing of Gemini JSON responses
+
+Asks Gemini for schema-constrained JSON (response_mime_type +
+response_schema) and decodes it in one pass: orjson when installed,
+markdown fences skipped by slicing to the outer braces instead of
+re-joining lines, then validated against a Pydantic model. Malformed
+responses are retried a bounded number of times and counted.
+
+Streamed calls decode one string field (the spoken agent_message) while
+the JSON is still arriving, so speech can start on the first tokens.
+"""
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional, Type, TypeVar
+
+from pydantic import BaseModel, Field, ValidationError
+
+from services import gemini_client
+from services.metrics import span
+
+try:
+    import orjson
+    FAST_JSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    FAST_JSON_AVAILABLE = False
+
+GEMINI_STRUCTURED_OUTPUT = os.getenv("GEMINI_STRUCTURED_OUTPUT", "1") != "0"
+# Extra attempts after a response that doesn't match its schema
+GEMINI_RESPONSE_PARSE_RETRIES = int(os.getenv("GEMINI_RESPONSE_PARSE_RETRIES", "1"))
+
+_loads = orjson.loads if FAST_JSON_AVAILABLE else json.loads
+
+Schema = TypeVar("Schema", bound=BaseModel)
+
+
+class LanguageResult(BaseModel):
+    language: str
+    confidence: str = "unknown"
+
+
+# agent_message comes first so it can be streamed to the voice agent before
+# the rest of the object (Gemini also orders schema properties by name)
+class EmergencyInstructions(BaseModel):
+    agent_message: str = Field(min_length=1)
+    summary: str = Field(min_length=1)
+
+
+class CockpitVerdict(BaseModel):
+    agent_message: str = ""
+    needs_intervention: bool
+    summary: str = ""
+
+
+class ResponseParseError(ValueError):
+    """Raised when a model response is not valid JSON for its schema"""
+
+    def __init__(self, message: str, text: str):
+        super().__init__(message)
+        self.text = text
+
+
+# Keys of the OpenAPI subset accepted as a Gemini response_schema
+GEMINI_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+
+
+def _gemini_schema_node(node: dict) -> dict:
+    reduced = {key: value for key, value in node.items() if key in GEMINI_SCHEMA_KEYS}
+    if "properties" in reduced:
+        reduced["properties"] = {name: _gemini_schema_node(child) for name, child in reduced["properties"].items()}
+    if "items" in reduced:
+        reduced["items"] = _gemini_schema_node(reduced["items"])
+    return reduced
+
+
+@lru_cache(maxsize=None)
+def gemini_schema(schema: Type[BaseModel]) -> dict:
+    """
+    Response schema for Gemini from a Pydantic model
+
+    Gemini accepts only a subset of JSON Schema (no defaults, lengths,
+    titles); the full model still validates the decoded response.
+    """
+    return _gemini_schema_node(schema.model_json_schema())
+
+
+def parse_json_response(text: str, schema: Type[Schema]) -> Schema:
+    """
+    Decode a JSON object from `text` (optionally wrapped in a ``` fence)
+
+    Raises:
+        ResponseParseError: if no valid object matching `schema` is found
+    """
+    start = text.find("{")
+    end = text.rfind("}")
+    if start < 0 or end < start:
+        raise ResponseParseError("Response contains no JSON object", text)
+
+    try:
+        # A full-length slice is the same object - no copy for clean responses
+        data = _loads(text[start:end + 1])
+    except ValueError as e:
+        raise ResponseParseError(f"Failed to parse JSON: {e}", text)
+
+    try:
+        return schema.model_validate(data)
+    except ValidationError as e:
+        raise ResponseParseError(f"Response does not match {schema.__name__}: {e.error_count()} error(s)", text)
+
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class FieldStreamExtractor:
+    """
+    Incrementally decodes one top-level string field from a streamed JSON object
+
+    Feed it response chunks as they arrive; each call returns the newly
+    decoded part of the field's value. Escapes split across chunks are held
+    back until complete.
+    """
+
+    def __init__(self, field: str):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos: Optional[int] = None
+        self.value = ""
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._start.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        out = []
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.done = True
+                pos += 1
+                break
+            if char != "\\":
+                end = pos + 1
+                while end < len(buffer) and buffer[end] not in '"\\':
+                    end += 1
+                out.append(buffer[pos:end])
+                pos = end
+                continue
+            if pos + 1 >= len(buffer):
+                break
+            code = buffer[pos + 1]
+            if code != "u":
+                out.append(_ESCAPES.get(code, code))
+                pos += 2
+                continue
+            if pos + 6 > len(buffer):
+                break
+            unit = int(buffer[pos + 2:pos + 6], 16)
+            if 0xD800 <= unit < 0xDC00:
+                # High surrogate - wait for its low half
+                if pos + 12 > len(buffer):
+                    break
+                if buffer[pos + 6:pos + 8] == "\\u":
+                    low = int(buffer[pos + 8:pos + 12], 16)
+                    out.append(chr(0x10000 + ((unit - 0xD800) << 10) + (low - 0xDC00)))
+                    pos += 12
+                    continue
+            out.append(chr(unit))
+            pos += 6
+
+        self._pos = pos
+        text = "".join(out)
+        self.value += text
+        return text
+
+
+class ResponseParser:
+    """
+    Structured Gemini calls: JSON response mode, typed parsing, bounded retries
+
+    Args:
+        structured_output: Request schema-constrained JSON when the SDK supports it
+        retries: Extra attempts after a malformed response
+    """
+
+    def __init__(
+        self,
+        structured_output: bool = GEMINI_STRUCTURED_OUTPUT,
+        retries: int = GEMINI_RESPONSE_PARSE_RETRIES,
+    ):
+        self._structured_output = structured_output
+        self.retries = max(0, retries)
+
+        # Metrics
+        self.parsed = 0
+        self.malformed = 0
+        self.retried = 0
+        self.failed = 0
+        self.streamed = 0
+
+    @property
+    def structured_output(self) -> bool:
+        """Requested and supported by the SDK (response_schema arrived in google-generativeai 0.7)"""
+        return self._structured_output and gemini_client.supports("GenerationConfig", "response_schema")
+
+    def generation_config(self, schema: Type[BaseModel]):
+        """generate_content kwargs asking for JSON matching `schema`"""
+        if not self.structured_output:
+            return {}
+        return {
+            "generation_config": gemini_client.sdk().GenerationConfig(
+                response_mime_type="application/json",
+                response_schema=gemini_schema(schema),
+            )
+        }
+
+    async def generate(self, scheduler, model, prompt, schema: Type[Schema], **kwargs) -> Schema:
+        """
+        Run a model call through `scheduler` and parse its response as `schema`
+
+        Raises:
+            ResponseParseError: if every attempt returned malformed JSON
+        """
+        kwargs.update(self.generation_config(schema))
+
+        for attempt in range(self.retries + 1):
+            response = await scheduler.generate(model, prompt, **kwargs)
+            text = response.text
+            try:
+                with span("json_parse"):
+                    result = parse_json_response(text, schema)
+            except ResponseParseError as e:
+                self.malformed += 1
+                print(f"⚠️ [LLM Responses] Malformed {schema.__name__} (attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    self.retried += 1
+                    continue
+                self.failed += 1
+                raise
+            self.parsed += 1
+            return result
+
+    async def stream_field(
+        self,
+        scheduler,
+        model,
+        prompt,
+        schema: Type[Schema],
+        field: str,
+        on_text: Callable[[str], Awaitable[None]],
+        **kwargs,
+    ) -> Schema:
+        """
+        Streamed variant of generate: `on_text` receives the `field` string as it is decoded
+
+        There is no retry - text already handed out can't be taken back, so
+        callers fall back to generate on failure.
+
+        Raises:
+            ResponseParseError: if the complete response is malformed
+        """
+        kwargs.update(self.generation_config(schema))
+        extractor = FieldStreamExtractor(field)
+        parts = []
+        async for chunk in scheduler.stream(model, prompt, **kwargs):
+            parts.append(chunk)
+            text = extractor.feed(chunk)
+            if text:
+                await on_text(text)
+
+        text = "".join(parts)
+        try:
+            with span("json_parse"):
+                result = parse_json_response(text, schema)
+        except ResponseParseError as e:
+            self.malformed += 1
+            self.failed += 1
+            print(f"⚠️ [LLM Responses] Malformed streamed {schema.__name__}: {e}")
+            raise
+        self.parsed += 1
+        self.streamed += 1
+        return result
+
+    def stats(self) -> dict:
+        """Snapshot of parse counters"""
+        return {
+            # Don't import the SDK just to answer a metrics scrape
+            "structured_output": self.structured_output if gemini_client.loaded() else self._structured_output,
+            "fast_json": FAST_JSON_AVAILABLE,
+            "parsed": self.parsed,
+            "malformed": self.malformed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "streamed": self.streamed,
+        }
@@ -0,0 +1,277 @@
+"""
+Metrics - in-process latency spans, counters and gauges with Prometheus text output
+
+Each uvicorn worker keeps its own registry; /metrics reports the worker
+that served the scrape (label `pid` tells them apart).
+"""
+import asyncio
+import bisect
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = int(os.getenv("METRICS_RESERVOIR_SIZE", "1024"))
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("METRICS_LOOP_LAG_INTERVAL_SECONDS", "0.05"))
+
+PID = str(os.getpid())
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    labels = {"pid": PID, **labels}
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge set directly or computed at scrape time by a callback"""
+
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function: Callable[[], Dict[tuple, float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        values = dict(self._values)
+        if self._function is not None:
+            try:
+                values.update(self._function())
+            except Exception as e:
+                print(f"❌ [Metrics] Gauge {self.name} callback failed: {e}")
+        return self.header() + [
+            f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram plus a bounded reservoir of recent samples,
+    exported as `<name>_quantile{quantile="0.5|0.95|0.99"}` for p50/p95/p99
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = {
+                "counts": [0] * (len(self.buckets) + 1),
+                "sum": 0.0,
+                "count": 0,
+                "recent": deque(maxlen=RESERVOIR_SIZE),
+            }
+            self._series[key] = series
+        series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+        series["sum"] += value
+        series["count"] += 1
+        series["recent"].append(value)
+
+    def quantiles(self, **labels) -> Dict[float, float]:
+        """p50/p95/p99 over the most recent samples"""
+        series = self._series.get(self._key(labels))
+        if not series or not series["recent"]:
+            return {}
+        return self._quantiles(series)
+
+    @staticmethod
+    def _quantiles(series) -> Dict[float, float]:
+        ordered = sorted(series["recent"])
+        last = len(ordered) - 1
+        return {q: ordered[min(last, int(round(q * last)))] for q in QUANTILES}
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        quantile_lines = [
+            f"# HELP {self.name}_quantile {self.documentation} (recent-sample quantiles)",
+            f"# TYPE {self.name}_quantile gauge",
+        ]
+        for key, series in self._series.items():
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+            for q, value in self._quantiles(series).items():
+                quantile_lines.append(
+                    f"{self.name}_quantile{_format_labels({**labels, 'quantile': str(q)})} {_format_value(value)}"
+                )
+        return lines + quantile_lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> _Metric:
+        return self._metrics[name]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "voice_stage_duration_seconds", "Time spent in each VoiceService stage", ["stage"]
+))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "voice_stage_errors_total", "Exceptions raised inside each VoiceService stage", ["stage"]
+))
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "upstream_requests_in_flight", "Outbound calls currently in flight", ["upstream"]
+))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "upstream_errors_total", "Failed outbound calls per upstream", ["upstream", "reason"]
+))
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+))
+SCHEDULER_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "analysis_scheduler_queue_wait_seconds", "Time model calls waited for Gemini rate budget", ["lane"]
+))
+EVENT_LOOP_LAG = REGISTRY.register(Histogram(
+    "event_loop_lag_seconds", "Delay between a scheduled wake-up and the event loop running it",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+))
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block of work as `stage` (works inside async functions too)"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - started_at, stage=stage)
+
+
+@contextmanager
+def upstream_call(upstream: str):
+    """Track in-flight count and errors for an outbound call"""
+    UPSTREAM_IN_FLIGHT.inc(upstream=upstream)
+    try:
+        yield
+    except BaseException as e:
+        UPSTREAM_ERRORS.inc(upstream=upstream, reason=type(e).__name__)
+        raise
+    finally:
+        UPSTREAM_IN_FLIGHT.dec(upstream=upstream)
+
+
+async def monitor_event_loop_lag(interval: float = LOOP_LAG_INTERVAL_SECONDS):
+    """Sample event-loop lag forever (run as a background task)"""
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled_at = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - scheduled_at - interval))
+
+
+def register_stats_gauge(name: str, documentation: str, labelname: str, stats: Callable[[], dict]):
+    """
+    Expose numeric fields of a `stats()` dict as one gauge family,
+    e.g. verdict cache hits/misses/hit_rate as `<name>{<labelname>="hits"}`
+    """
+    def collect() -> Dict[tuple, float]:
+        return {
+            (field,): float(value)
+            for field, value in stats().items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+
+    return REGISTRY.register(Gauge(name, documentation, [labelname], function=collect))
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition of all registered metrics"""
+    return REGISTRY.render()
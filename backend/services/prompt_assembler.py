@@ -0,0 +1,159 @@
+"""
+Prompt Assembler - token-budgeted transcript context for Gemini prompts
+
+Keeps the prompt size flat over a long session. The most recent part of
+the transcript goes in verbatim. Older history is reduced to compact facts
+taken from the parsed messages: clearances still in force, active
+conflicts, the last ATC instruction per aircraft and crew remarks about
+warnings.
+"""
+import os
+from typing import List, Optional
+
+from services import transcript_parser
+from services.conflict_engine import KIND_DESCRIPTIONS, ClearanceTracker
+from services.safety_screen import screen_reasons
+
+# Budget for the whole transcript section of a prompt
+PROMPT_TRANSCRIPT_TOKENS = int(os.getenv("PROMPT_TRANSCRIPT_TOKENS", "2000"))
+# Part of that budget reserved for recent verbatim text
+PROMPT_RECENT_TOKENS = int(os.getenv("PROMPT_RECENT_TOKENS", "1200"))
+CHARS_PER_TOKEN = 4
+
+MAX_FACT_CHARS = 160
+MAX_REMARKS = 5
+
+HISTORY_HEADER = "EARLIER IN THIS SESSION (older transcript condensed to facts):"
+RECENT_HEADER = "RECENT TRANSCRIPT (verbatim):"
+
+
+def _shorten(text: str, limit: int = MAX_FACT_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def tracker_facts(tracker: ClearanceTracker) -> List[str]:
+    """Active conflicts and clearances in force, from a clearance table"""
+    facts = [f"Unresolved conflict: {conflict['description']}" for conflict in tracker.active_conflicts()]
+    for clearance in reversed(list(tracker.clearances.values())):
+        description = KIND_DESCRIPTIONS.get(clearance["kind"], clearance["kind"])
+        runway = f" runway {clearance['runway']}" if clearance["runway"] else ""
+        facts.append(f"Clearance in force: {clearance['callsign']} {description}{runway}")
+    return facts
+
+
+def message_facts(messages: List[dict]) -> List[str]:
+    """Last ATC instruction per aircraft and the latest warning remarks, newest first"""
+    instructions = {}
+    remarks = []
+    for message in reversed(messages):
+        text = message.get("text", "")
+        target = message.get("target_callsign")
+        if message.get("speaker") == "ATC" and target and target not in instructions:
+            instructions[target] = f"Last ATC instruction to {target}: {_shorten(text)}"
+        elif len(remarks) < MAX_REMARKS and "warning" in screen_reasons(text):
+            remarks.append(f"Earlier remark ({message.get('speaker', 'Unknown')}): {_shorten(text)}")
+    return list(instructions.values()) + remarks
+
+
+class PromptAssembler:
+    """
+    Builds the transcript section of a prompt within a token budget
+
+    Args:
+        transcript_tokens: Budget for the whole transcript section
+        recent_tokens: Part of the budget kept as verbatim recent text
+    """
+
+    def __init__(
+        self,
+        transcript_tokens: int = PROMPT_TRANSCRIPT_TOKENS,
+        recent_tokens: int = PROMPT_RECENT_TOKENS,
+    ):
+        self.max_chars = transcript_tokens * CHARS_PER_TOKEN
+        self.recent_chars = min(recent_tokens, transcript_tokens) * CHARS_PER_TOKEN
+
+        # Metrics
+        self.assembled = 0
+        self.condensed = 0
+        self.chars_in = 0
+        self.chars_out = 0
+
+    def recent_window(self, transcript: str, max_chars: int = None) -> str:
+        """Tail of `transcript` of at most `max_chars`, starting at a sentence boundary if possible"""
+        max_chars = self.recent_chars if max_chars is None else max_chars
+        transcript = (transcript or "").strip()
+        if len(transcript) <= max_chars:
+            return transcript
+
+        tail = transcript[-max_chars:]
+        sentence_break = transcript_parser.SENTENCE_BREAK_RE.search(tail)
+        if sentence_break and sentence_break.end() < len(tail) // 2:
+            tail = tail[sentence_break.end():]
+        return tail.strip()
+
+    def assemble(self, transcript: str, facts: Optional[List[str]] = None) -> str:
+        """
+        Transcript section for a prompt, at most `transcript_tokens` long
+
+        Args:
+            transcript: Transcript (or analysis window) to send
+            facts: History facts known by the caller (e.g. from a session's
+                clearance table); derived from the older transcript if omitted
+
+        Returns:
+            `transcript` unchanged if it fits and there are no facts,
+            otherwise condensed history facts + recent verbatim text
+        """
+        transcript = (transcript or "").strip()
+        self.assembled += 1
+        self.chars_in += len(transcript)
+
+        if len(transcript) <= self.max_chars and not facts:
+            self.chars_out += len(transcript)
+            return transcript
+
+        recent = transcript if len(transcript) <= self.max_chars else self.recent_window(transcript)
+        if facts is None:
+            older = transcript[:len(transcript) - len(recent)]
+            facts = self.history_facts(older)
+
+        context = self._with_facts(recent, facts)
+        self.condensed += 1
+        self.chars_out += len(context)
+        return context
+
+    def history_facts(self, older_text: str) -> List[str]:
+        """Compact facts from the part of the transcript that no longer fits"""
+        if not older_text.strip():
+            return []
+        messages = transcript_parser.parse_transcript(older_text)
+        tracker = ClearanceTracker()
+        tracker.consume(messages)
+        return tracker_facts(tracker) + message_facts(messages)
+
+    def _with_facts(self, recent: str, facts: List[str]) -> str:
+        overhead = len(HISTORY_HEADER) + len(RECENT_HEADER) + 4
+        budget = self.max_chars - len(recent) - overhead
+        lines = []
+        for fact in facts:
+            line = f"- {fact}"
+            if len(line) + 1 > budget:
+                break
+            lines.append(line)
+            budget -= len(line) + 1
+
+        if not lines:
+            return recent
+        return f"{HISTORY_HEADER}\n" + "\n".join(lines) + f"\n\n{RECENT_HEADER}\n{recent}"
+
+    def stats(self) -> dict:
+        """Snapshot of assembly counters"""
+        return {
+            "max_chars": self.max_chars,
+            "recent_chars": self.recent_chars,
+            "assembled": self.assembled,
+            "condensed": self.condensed,
+            "avg_chars_in": round(self.chars_in / self.assembled) if self.assembled else 0,
+            "avg_chars_out": round(self.chars_out / self.assembled) if self.assembled else 0,
+        }
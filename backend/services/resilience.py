@@ -0,0 +1,337 @@
+"""
+Resilience - circuit breaking and hedged requests for upstream calls
+
+Every outbound upstream (Gemini, ElevenLabs) goes through an UpstreamGuard:
+
+- Circuit breaker: when most of the recent calls failed, the circuit opens
+  and calls fail fast with CircuitOpenError instead of piling onto an
+  upstream that is already struggling. After a cool-down one half-open
+  probe decides between closing the circuit and a longer cool-down.
+- Hedged requests: a call still running past the upstream's recent p95
+  latency gets one duplicate; the first success wins and the other is
+  cancelled. Hedges are capped to a fraction of all calls so a slow
+  upstream never sees double load, draw from the caller's rate budget
+  (skipped when it is spent) and are only used for idempotent calls.
+
+Callers check `guard.available` to switch to local-only behaviour while
+the circuit is open. State is per worker process.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Optional, TypeVar
+
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_FAILURE_RATIO = float(os.getenv("CIRCUIT_FAILURE_RATIO", "0.5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "15"))
+# Cool-down doubles after each failed probe, up to this
+CIRCUIT_MAX_OPEN_SECONDS = float(os.getenv("CIRCUIT_MAX_OPEN_SECONDS", "120"))
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") != "0"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+# Latency samples needed before hedging starts
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.25"))
+# Upper bound on hedges as a fraction of calls
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} circuit open, retry in {retry_after:.1f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class UpstreamHTTPError(Exception):
+    """Non-success HTTP status from an upstream"""
+
+    def __init__(self, upstream: str, status_code: int, text: str = ""):
+        super().__init__(f"{upstream} returned HTTP {status_code}")
+        self.upstream = upstream
+        self.status_code = status_code
+        self.text = text
+
+    @property
+    def upstream_fault(self) -> bool:
+        """5xx and 429 say the upstream is in trouble; other 4xx are our own fault"""
+        return self.status_code >= 500 or self.status_code == 429
+
+
+class CircuitBreaker:
+    """
+    Failure-ratio circuit breaker with single-probe half-open state
+
+    Args:
+        name: Upstream name (for logs)
+        window: Recent call outcomes considered
+        min_calls: Outcomes needed before the circuit may open
+        failure_ratio: Failed share of the window that opens the circuit
+        open_seconds: Initial cool-down
+        max_open_seconds: Longest cool-down after repeated failed probes
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = CIRCUIT_WINDOW,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        failure_ratio: float = CIRCUIT_FAILURE_RATIO,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        max_open_seconds: float = CIRCUIT_MAX_OPEN_SECONDS,
+    ):
+        self.name = name
+        self.min_calls = max(1, min_calls)
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(open_seconds, max_open_seconds)
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=max(window, self.min_calls))
+        self._opened_at = 0.0
+        self._open_for = open_seconds
+        self._probe_in_flight = False
+
+        # Metrics
+        self.opened = 0
+        self.rejected = 0
+        self.probes = 0
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe may run (0 unless open)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self._open_for - time.monotonic())
+
+    @property
+    def available(self) -> bool:
+        """False while calls would be rejected"""
+        if self.state == OPEN:
+            return self.retry_after() == 0.0
+        if self.state == HALF_OPEN:
+            return not self._probe_in_flight
+        return True
+
+    def allow(self) -> bool:
+        """Admit one call (in half-open state: the single probe)"""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+            self.probes += 1
+        return True
+
+    def record_success(self):
+        if self.state == HALF_OPEN:
+            print(f"✅ [Circuit {self.name}] Probe succeeded - circuit closed")
+            self.state = CLOSED
+            self._outcomes.clear()
+            self._open_for = self.open_seconds
+            self._probe_in_flight = False
+        elif self.state == CLOSED:
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        if self.state == HALF_OPEN:
+            self._open(min(self.max_open_seconds, self._open_for * 2))
+        elif self.state == CLOSED:
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures >= self.failure_ratio * len(self._outcomes):
+                self._open(self.open_seconds)
+
+    def record_abandoned(self):
+        """The call was cancelled - no verdict on the upstream"""
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+
+    def _open(self, seconds: float):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._open_for = seconds
+        self._probe_in_flight = False
+        self._outcomes.clear()
+        self.opened += 1
+        print(f"🔌 [Circuit {self.name}] Open for {seconds:.0f}s - upstream failing")
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "open": int(self.state != CLOSED),
+            "retry_after": round(self.retry_after(), 1),
+            "recent_failures": self._outcomes.count(False),
+            "recent_calls": len(self._outcomes),
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "probes": self.probes,
+        }
+
+
+class UpstreamGuard:
+    """
+    Circuit breaker plus latency-based hedging for one upstream
+
+    Args:
+        name: Upstream name ("gemini", "elevenlabs")
+        breaker: Circuit breaker (default: one with the env settings)
+        hedge: Allow hedged duplicates
+        hedge_quantile: Latency quantile after which a call is hedged
+        max_hedge_ratio: Hedges allowed per call
+    """
+
+    def __init__(
+        self,
+        name: str,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge: bool = HEDGE_ENABLED,
+        hedge_quantile: float = HEDGE_QUANTILE,
+        max_hedge_ratio: float = HEDGE_MAX_RATIO,
+    ):
+        self.name = name
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.max_hedge_ratio = max_hedge_ratio
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+        # Metrics
+        self.calls = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+
+    @property
+    def available(self) -> bool:
+        return self.breaker.available
+
+    def retry_after(self) -> float:
+        return self.breaker.retry_after()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a call is hedged (None: not enough samples yet)"""
+        if not self.hedge or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return max(HEDGE_MIN_DELAY_SECONDS, ordered[int(self.hedge_quantile * (len(ordered) - 1))])
+
+    @contextmanager
+    def guarded(self, is_failure: Callable[[Exception], bool] = None):
+        """
+        Run a block as one call through the circuit breaker (no hedging)
+
+        Raises:
+            CircuitOpenError: if the circuit rejects the call
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+        self.calls += 1
+        try:
+            yield
+        except Exception as e:
+            if is_failure is None or is_failure(e):
+                self.failures += 1
+                self.breaker.record_failure()
+            else:
+                # The upstream answered - the request itself was bad
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            # Cancelled, or a stream closed early
+            self.breaker.record_abandoned()
+            raise
+        else:
+            self.breaker.record_success()
+
+    async def call(
+        self,
+        factory: Callable[[], Awaitable[T]],
+        is_failure: Callable[[Exception], bool] = None,
+        hedge: bool = True,
+        hedge_budget: Callable[[], bool] = None,
+    ) -> T:
+        """
+        Await `factory()` through the circuit breaker, hedging slow calls
+
+        Args:
+            factory: Starts one attempt (called again for the hedge)
+            is_failure: Which exceptions count against the upstream (default: all)
+            hedge: Allow a hedged duplicate for this call - only for
+                idempotent calls, the upstream may run both attempts
+            hedge_budget: Takes rate budget for the hedge right before it
+                starts; returning False skips the hedge
+
+        Raises:
+            CircuitOpenError: if the circuit rejects the call
+        """
+        started_at = time.perf_counter()
+        with self.guarded(is_failure):
+            # The half-open probe runs alone
+            hedge = hedge and self.breaker.state == CLOSED
+            result = await (self._hedged(factory, hedge_budget) if hedge else factory())
+        self._latencies.append(time.perf_counter() - started_at)
+        return result
+
+    async def _hedged(self, factory: Callable[[], Awaitable[T]], budget: Callable[[], bool] = None) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await factory()
+
+        first = asyncio.ensure_future(factory())
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or self.hedges + 1 > self.max_hedge_ratio * self.calls:
+                return await first
+            if budget is not None and not budget():
+                self.hedges_skipped += 1
+                return await first
+
+            self.hedges += 1
+            tasks.append(asyncio.ensure_future(factory()))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        """Snapshot of breaker and hedging counters"""
+        delay = self.hedge_delay()
+        return {
+            **self.breaker.stats(),
+            "calls": self.calls,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedges_skipped": self.hedges_skipped,
+            "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else 0.0,
+        }
@@ -0,0 +1,128 @@
+"""
+Safety Screen - cheap deterministic pre-filter in front of the Gemini analysis
+
+Only transcript windows that mention runways, clearances, altitudes,
+readbacks, warnings or callsigns are escalated to the model; casual
+cockpit chatter is answered locally.
+
+The critical patterns are the local fallback verdict while Gemini is
+unavailable: distress calls and hard warnings still raise an alert.
+"""
+import os
+import re
+from typing import List
+
+from services.transcript_parser import extract_callsigns
+
+SAFETY_SCREEN_ENABLED = os.getenv("SAFETY_SCREEN_ENABLED", "1") != "0"
+
+SCREEN_PATTERNS = {
+    "runway": r"\b(?:runways?|rwy)\b",
+    "clearance": (
+        r"\bcleared\b|\bclearance\b|\bline up and wait\b|\bhold(?:ing)? short\b|"
+        r"\bgo[ -]around\b|\btaxi\b|\bcross(?:ing)?\b|\bexpedite\b|\bcontact (?:tower|ground|approach|departure)\b"
+    ),
+    "altitude": (
+        r"\b\d{1,2},?\d{3} ?(?:feet|ft)\b|\bflight level\b|\bFL ?\d{2,3}\b|"
+        r"\b(?:climb|descend|maintain|altitude|altimeter)\b"
+    ),
+    "heading": r"\bheading\b|\bturn (?:left|right)\b|\bvectors?\b",
+    "speed": r"\b\d{2,3} ?knots\b|\b(?:reduce|increase) speed\b|\bairspeed\b",
+    "readback": r"\b(?:roger|wilco|affirm(?:ative)?|negative|say again|unable|read ?back)\b",
+    "warning": (
+        r"\b(?:warning|caution|alert|master (?:caution|warning)|fire|smoke|fumes|"
+        r"engine|failure|fail(?:ed|ing)?|fault|malfunction|hydraulics?|pressure|"
+        r"temperature|fuel|oil|windshear|wind shear|turbulence|icing|stall|terrain|"
+        r"pull up|sink rate|glide ?slope|tcas|traffic|resolution advisory|"
+        r"mayday|pan[ -]pan|emergency|glitch|sensor|vibration|overspeed|gear|flaps|"
+        r"checklist|unstable|unstabili[sz]ed|bird strike)\b"
+    ),
+}
+
+SCREEN_RE = re.compile(
+    "|".join(f"(?P<{name}>{pattern})" for name, pattern in SCREEN_PATTERNS.items()),
+    re.IGNORECASE,
+)
+
+
+# Unambiguous emergencies - enough for an alert without the model
+CRITICAL_PATTERNS = {
+    "distress": r"\bmayday\b|\bpan[ -]pan\b|\bdeclar(?:e|ing|ed) (?:an )?emergency\b",
+    "fire": r"\b(?:engine |cabin |cargo )?fire\b|\bsmoke\b|\bfumes\b",
+    "terrain": r"\bterrain\b|\bpull up\b|\bsink rate\b",
+    "stall": r"\bstall\b",
+    "windshear": r"\bwind ?shear\b",
+    "traffic": r"\bresolution advisory\b|\btcas (?:ra|climb|descend)\b",
+    "engine": r"\bengine (?:failure|fail(?:ed|ing)|out|flame ?out)\b",
+}
+
+CRITICAL_DESCRIPTIONS = {
+    "distress": "distress call",
+    "fire": "fire or smoke",
+    "terrain": "terrain warning",
+    "stall": "stall warning",
+    "windshear": "windshear",
+    "traffic": "traffic resolution advisory",
+    "engine": "engine failure",
+}
+
+CRITICAL_RE = re.compile(
+    "|".join(f"(?P<{name}>{pattern})" for name, pattern in CRITICAL_PATTERNS.items()),
+    re.IGNORECASE,
+)
+
+
+def screen_reasons(text: str) -> List[str]:
+    """Names of the safety-relevant categories found in `text`"""
+    reasons = {match.lastgroup for match in SCREEN_RE.finditer(text or "")}
+    if extract_callsigns(text):
+        reasons.add("callsign")
+    return sorted(reasons)
+
+
+def critical_reasons(text: str) -> List[str]:
+    """Names of the emergency categories found in `text`, in CRITICAL_PATTERNS order"""
+    found = {match.lastgroup for match in CRITICAL_RE.finditer(text or "")}
+    return [name for name in CRITICAL_PATTERNS if name in found]
+
+
+class SafetyScreen:
+    """
+    Stage in front of the model call with escalation / skip counters
+
+    Args:
+        enabled: When False every window is escalated (screen bypassed)
+    """
+
+    def __init__(self, enabled: bool = SAFETY_SCREEN_ENABLED):
+        self.enabled = enabled
+        self.screened = 0
+        self.escalated = 0
+        self.skipped = 0
+        self.reason_counts = {}
+
+    def should_escalate(self, text: str) -> bool:
+        """True if `text` has to go to the model"""
+        if not self.enabled:
+            return True
+
+        self.screened += 1
+        reasons = screen_reasons(text)
+        if not reasons:
+            self.skipped += 1
+            return False
+
+        self.escalated += 1
+        for reason in reasons:
+            self.reason_counts[reason] = self.reason_counts.get(reason, 0) + 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "screened": self.screened,
+            "escalated": self.escalated,
+            "skipped": self.skipped,
+            "skip_rate": round(self.skipped / self.screened, 3) if self.screened else 0.0,
+            "reasons": dict(self.reason_counts),
+        }
@@ -0,0 +1,139 @@
+"""
+Segment Log - append-only on-disk log of analysis session events
+
+One JSON Lines file per session records committed segments, truncations
+(client resends) and completed verdicts. Sessions evicted from memory are
+rebuilt from their log when the client comes back, and finished flights
+stay on disk for replay until the retention period runs out. Readers can
+resume from a byte offset, so a worker whose copy of a session fell
+behind only reads the events appended since.
+
+Disabled unless SESSION_LOG_DIR is set.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import List, Optional, Tuple
+
+SESSION_LOG_DIR = os.getenv("SESSION_LOG_DIR", "")
+SESSION_LOG_RETENTION_SECONDS = float(os.getenv("SESSION_LOG_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+EVENT_START = "start"
+EVENT_SEGMENT = "segment"
+EVENT_TRUNCATE = "truncate"
+EVENT_VERDICT = "verdict"
+
+
+class SegmentLog:
+    """
+    Per-session JSON Lines files in one directory
+
+    Args:
+        directory: Log directory ("" disables the log)
+        retention_seconds: Logs untouched for longer are deleted on startup
+    """
+
+    def __init__(self, directory: str = SESSION_LOG_DIR, retention_seconds: float = SESSION_LOG_RETENTION_SECONDS):
+        self.directory = directory
+        self.retention_seconds = retention_seconds
+        self.enabled = bool(directory)
+
+        # Metrics
+        self.appended = 0
+        self.replayed = 0
+        self.write_errors = 0
+        self.pruned = 0
+
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            self._prune()
+
+    def path(self, session_id: str) -> str:
+        """Log file of a session (ids come from clients, so the name is a hash)"""
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.jsonl")
+
+    def append(self, session_id: str, event: str, **fields) -> Optional[Tuple[int, int]]:
+        """
+        Append one event to the session's log
+
+        Returns:
+            (start, end) byte offsets of the written record, or None if the
+            log is disabled or the write failed
+        """
+        if not self.enabled:
+            return None
+        record = {"event": event, "ts": round(time.time(), 3), **fields}
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        try:
+            # Small appends land in the page cache - no fsync on the request path.
+            # O_APPEND puts the record after any other worker's, so the
+            # position after the write is where this record ends.
+            with open(self.path(session_id), "ab") as f:
+                f.write(data)
+                f.flush()
+                end = f.tell()
+            self.appended += 1
+        except OSError as e:
+            self.write_errors += 1
+            print(f"⚠️ [Segment Log] Append failed: {e}")
+            return None
+        return end - len(data), end
+
+    def read(self, session_id: str, offset: int = 0) -> Tuple[List[dict], int]:
+        """
+        Events logged for a session from byte `offset` on, oldest first
+
+        Returns:
+            (events, offset just past the last complete event read)
+        """
+        if not self.enabled:
+            return [], offset
+        events = []
+        try:
+            with open(self.path(session_id), "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Torn or still being written - pick it up next time
+                        break
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        break
+                    offset += len(line)
+        except FileNotFoundError:
+            return [], offset
+        except OSError as e:
+            print(f"⚠️ [Segment Log] Read failed: {e}")
+            return [], offset
+        self.replayed += 1
+        return events, offset
+
+    def replay(self, session_id: str) -> List[dict]:
+        """All events logged for a session, oldest first ([] if there is no log)"""
+        return self.read(session_id)[0]
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for name in os.listdir(self.directory):
+            if not name.endswith(".jsonl"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    self.pruned += 1
+            except OSError:
+                continue
+
+    def stats(self) -> dict:
+        """Snapshot of log counters"""
+        return {
+            "enabled": self.enabled,
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "write_errors": self.write_errors,
+            "pruned": self.pruned,
+        }
@@ -0,0 +1,108 @@
+"""
+Single Flight - per-client coalescing of overlapping model calls
+
+At most one model call per client key is in flight. A request for the
+same input joins the running call; a request for newer input cancels the
+running call, and its callers get a "superseded" result instead of a stale
+verdict. Keys must identify one client (a session id) - anonymous callers
+are keyed by their input, so they only ever join, never cancel each other.
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") != "0"
+
+SUPERSEDED_RESULT = {
+    "needs_intervention": False,
+    "superseded": True,
+    "success": False,
+    "error": "Superseded by a newer request",
+}
+
+
+class _Flight:
+    def __init__(self, fingerprint: str, task: asyncio.Task):
+        self.fingerprint = fingerprint
+        self.task = task
+        self.waiters = 1
+
+
+class SingleFlight:
+    """
+    Registry of in-flight calls keyed by client
+
+    Args:
+        enabled: When False every call runs independently
+    """
+
+    def __init__(self, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.enabled = enabled
+        self._flights: Dict[str, _Flight] = {}
+
+        # Metrics
+        self.started = 0
+        self.joined = 0
+        self.superseded = 0
+
+    async def run(self, key: str, fingerprint: str, call: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        Run `call()` as the only in-flight call for `key`
+
+        Args:
+            key: Client identity (e.g. "session:<id>", or "transcript:<hash>" for anonymous callers)
+            fingerprint: Identity of the input - equal fingerprints share one call
+            call: Coroutine factory performing the model call
+
+        Returns:
+            The call's result, or SUPERSEDED_RESULT if a newer request for
+            the same key cancelled it
+        """
+        if not self.enabled:
+            return await call()
+
+        flight = self._flights.get(key)
+        if flight is not None and not flight.task.done():
+            if flight.fingerprint == fingerprint:
+                self.joined += 1
+                flight.waiters += 1
+                return await self._wait(flight)
+
+            flight.task.cancel()
+            self.superseded += 1
+
+        flight = _Flight(fingerprint, asyncio.create_task(call()))
+        self._flights[key] = flight
+        flight.task.add_done_callback(lambda _: self._release(key, flight))
+        self.started += 1
+        return await self._wait(flight)
+
+    async def _wait(self, flight: _Flight) -> dict:
+        # asyncio.wait (unlike awaiting the task) doesn't cancel the shared
+        # call when one of its waiters goes away
+        try:
+            await asyncio.wait({flight.task})
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.waiters == 0:
+                flight.task.cancel()
+            raise
+
+        if flight.task.cancelled():
+            return dict(SUPERSEDED_RESULT)
+        # Each waiter gets its own copy - callers add per-request fields
+        return dict(flight.task.result())
+
+    def _release(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        """Snapshot of coalescing counters"""
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "joined": self.joined,
+            "superseded": self.superseded,
+        }
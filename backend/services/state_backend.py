@@ -0,0 +1,473 @@
+"""
+State Backend - storage shared by all uvicorn workers on a host
+
+`voice_service` is a per-process singleton, so caches, rate budgets and
+session bookkeeping are split across workers unless they live in a shared
+store. A backend provides named tables (JSON values with TTL and an LRU
+bound) and per-minute token buckets:
+
+- memory: per process, no sharing (tests, single worker)
+- sqlite: one SQLite file in WAL mode shared by every worker on the host
+- redis: any Redis-compatible server (needs the optional `redis` package)
+
+Calls are synchronous; local SQLite and Redis answer in well under a
+millisecond, so they run on the event loop like the other service stats.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+# VERDICT_CACHE_PATH predates the shared backend and still selects SQLite
+_LEGACY_SQLITE_PATH = os.getenv("VERDICT_CACHE_PATH")
+
+STATE_BACKEND = os.getenv("STATE_BACKEND") or ("sqlite" if _LEGACY_SQLITE_PATH else "memory")
+STATE_SQLITE_PATH = os.getenv("STATE_SQLITE_PATH") or _LEGACY_SQLITE_PATH or "/tmp/voice-state.sqlite3"
+STATE_REDIS_URL = os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0")
+STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "voice:")
+
+# Idle buckets are forgotten after this long (they'd be full again anyway)
+BUCKET_IDLE_TTL_SECONDS = 120
+# A read only refreshes an SQLite row's LRU position once it is this stale
+SQLITE_TOUCH_INTERVAL_SECONDS = 30
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously (limit <= 0 means unlimited)"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _level(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return self.tokens
+
+    def _consume(self, cost: float):
+        self._level()
+        self.tokens -= cost
+
+    def delay(self, cost: float) -> float:
+        """Seconds until `cost` can be taken (0 if it can be taken now)"""
+        if self.unlimited:
+            return 0.0
+        cost = min(cost, self.capacity)
+        tokens = self._level()
+        if tokens >= cost:
+            return 0.0
+        return (cost - tokens) / self.rate
+
+    def take(self, cost: float):
+        if not self.unlimited:
+            self._consume(min(cost, self.capacity))
+
+    def try_take(self, cost: float) -> float:
+        """
+        Take `cost` if the bucket has it, in one atomic step
+
+        Returns:
+            0 if it was taken, otherwise the seconds until it can be
+            (and nothing is taken)
+        """
+        if self.unlimited:
+            return 0.0
+        return self._try_consume(min(cost, self.capacity))
+
+    def refund(self, cost: float):
+        """Give back tokens taken for a call that didn't go out"""
+        if not self.unlimited:
+            self._consume(-min(cost, self.capacity))
+
+    def _try_consume(self, cost: float) -> float:
+        tokens = self._level()
+        if tokens < cost:
+            return (cost - tokens) / self.rate
+        self.tokens -= cost
+        return 0.0
+
+    def utilization(self) -> float:
+        if self.unlimited:
+            return 0.0
+        return max(0.0, min(1.0, 1.0 - self._level() / self.capacity))
+
+
+class MemoryTable:
+    """Per-process LRU with TTL"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: dict, ttl: float):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MemoryStateBackend:
+    """State kept in this process only"""
+
+    name = "memory"
+    shared = False
+
+    def table(self, name: str, max_entries: int) -> MemoryTable:
+        return MemoryTable(max_entries)
+
+    def bucket(self, name: str, per_minute: int) -> TokenBucket:
+        return TokenBucket(per_minute)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "shared": self.shared}
+
+
+class SQLiteTable:
+    """Table rows in the shared SQLite file, LRU-bounded by access time"""
+
+    def __init__(self, backend: "SQLiteStateBackend", name: str, max_entries: int):
+        self.backend = backend
+        self.name = name
+        self.max_entries = max_entries
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        try:
+            conn = self.backend.conn()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM state WHERE tbl = ? AND key = ?", (self.name, key)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("DELETE FROM state WHERE tbl = ? AND key = ?", (self.name, key))
+                self.evictions += 1
+                return None
+            # Hot keys would otherwise turn every read into a write
+            if now - row[2] >= SQLITE_TOUCH_INTERVAL_SECONDS:
+                conn.execute("UPDATE state SET accessed_at = ? WHERE tbl = ? AND key = ?", (now, self.name, key))
+        except sqlite3.Error as e:
+            self.backend.error(e)
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict, ttl: float):
+        now = time.time()
+        try:
+            conn = self.backend.conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO state (tbl, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.name, key, json.dumps(value), now + ttl, now),
+            )
+            deleted = conn.execute(
+                "DELETE FROM state WHERE tbl = ? AND key IN ("
+                "SELECT key FROM state WHERE tbl = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.name, self.name, self.max_entries),
+            ).rowcount
+            self.evictions += max(deleted, 0)
+        except sqlite3.Error as e:
+            self.backend.error(e)
+
+    def delete(self, key: str):
+        try:
+            self.backend.conn().execute("DELETE FROM state WHERE tbl = ? AND key = ?", (self.name, key))
+        except sqlite3.Error as e:
+            self.backend.error(e)
+
+    def __len__(self):
+        try:
+            return self.backend.conn().execute("SELECT COUNT(*) FROM state WHERE tbl = ?", (self.name,)).fetchone()[0]
+        except sqlite3.Error as e:
+            self.backend.error(e)
+            return 0
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """Token bucket whose level lives in the shared SQLite file"""
+
+    def __init__(self, backend: "SQLiteStateBackend", name: str, per_minute: int):
+        super().__init__(per_minute)
+        self.backend = backend
+        self.name = name
+
+    def _stored(self, conn, now: float) -> float:
+        row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (self.name,)).fetchone()
+        if row is None:
+            return self.capacity
+        return min(self.capacity, row[0] + (now - row[1]) * self.rate)
+
+    def _level(self) -> float:
+        try:
+            return self._stored(self.backend.conn(), time.time())
+        except sqlite3.Error as e:
+            # Fail open - the upstream still enforces its own quota
+            self.backend.error(e)
+            return self.capacity
+
+    def _consume(self, cost: float):
+        self._update(cost, conditional=False)
+
+    def _try_consume(self, cost: float) -> float:
+        return self._update(cost, conditional=True)
+
+    def _update(self, cost: float, conditional: bool) -> float:
+        """Check and take under one write lock, so workers can't both spend the last tokens"""
+        now = time.time()
+        try:
+            conn = self.backend.conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                tokens = self._stored(conn, now)
+                if conditional and tokens < cost:
+                    conn.execute("ROLLBACK")
+                    return (cost - tokens) / self.rate
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.name, tokens - cost, now),
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self.backend.error(e)
+        return 0.0
+
+
+class SQLiteStateBackend:
+    """
+    State in one SQLite file (WAL mode) so every worker process on the
+    host shares the same entries and budgets
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str = STATE_SQLITE_PATH):
+        self.path = path
+        self.errors = 0
+        self._local = threading.local()
+        conn = self.conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "tbl TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL, PRIMARY KEY (tbl, key))"
+        )
+        # LRU eviction in SQLiteTable.set scans a table by access time
+        conn.execute("CREATE INDEX IF NOT EXISTS state_lru ON state (tbl, accessed_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def error(self, e: Exception):
+        self.errors += 1
+        print(f"⚠️ [State Backend] SQLite error: {e}")
+
+    def table(self, name: str, max_entries: int) -> SQLiteTable:
+        return SQLiteTable(self, name, max_entries)
+
+    def bucket(self, name: str, per_minute: int) -> TokenBucket:
+        return SQLiteTokenBucket(self, name, per_minute)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "shared": self.shared, "path": self.path, "errors": self.errors}
+
+
+class RedisTable:
+    """Keys with native TTL plus a sorted-set index for the LRU bound"""
+
+    def __init__(self, backend: "RedisStateBackend", name: str, max_entries: int):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.prefix = f"{backend.prefix}{name}:"
+        self.index = f"{backend.prefix}{name}@lru"
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            raw = self.backend.client.get(self.prefix + key)
+            if raw is None:
+                return None
+            self.backend.client.zadd(self.index, {key: time.time()})
+        except redis.RedisError as e:
+            self.backend.error(e)
+            return None
+        return json.loads(raw)
+
+    def set(self, key: str, value: dict, ttl: float):
+        client = self.backend.client
+        try:
+            pipe = client.pipeline()
+            pipe.set(self.prefix + key, json.dumps(value), px=max(1, int(ttl * 1000)))
+            pipe.zadd(self.index, {key: time.time()})
+            pipe.zcard(self.index)
+            overflow = pipe.execute()[-1] - self.max_entries
+            if overflow > 0:
+                stale = client.zrange(self.index, 0, overflow - 1)
+                pipe = client.pipeline()
+                pipe.delete(*[self.prefix + k.decode() for k in stale])
+                pipe.zrem(self.index, *stale)
+                pipe.execute()
+                self.evictions += len(stale)
+        except redis.RedisError as e:
+            self.backend.error(e)
+
+    def delete(self, key: str):
+        try:
+            pipe = self.backend.client.pipeline()
+            pipe.delete(self.prefix + key)
+            pipe.zrem(self.index, key)
+            pipe.execute()
+        except redis.RedisError as e:
+            self.backend.error(e)
+
+    def __len__(self):
+        try:
+            return self.backend.client.zcard(self.index)
+        except redis.RedisError as e:
+            self.backend.error(e)
+            return 0
+
+
+# KEYS[1] = bucket; ARGV = capacity, rate (per second), now, cost, idle ttl,
+# conditional (1 = only take if the bucket has `cost`, return level - cost either way)
+_BUCKET_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local cost = tonumber(ARGV[4])
+if ARGV[6] == '1' and tokens < cost then
+    return tostring(tokens - cost)
+end
+if cost ~= 0 then
+    tokens = tokens - cost
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', ARGV[3])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+end
+return tostring(tokens)
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """Token bucket updated atomically by a Lua script"""
+
+    def __init__(self, backend: "RedisStateBackend", name: str, per_minute: int):
+        super().__init__(per_minute)
+        self.backend = backend
+        self.key = f"{backend.prefix}bucket:{name}"
+
+    def _call(self, cost: float, conditional: bool = False) -> float:
+        try:
+            return float(self.backend.bucket_script(
+                keys=[self.key],
+                args=[self.capacity, self.rate, time.time(), cost, BUCKET_IDLE_TTL_SECONDS, int(conditional)],
+            ))
+        except redis.RedisError as e:
+            # Fail open - the upstream still enforces its own quota
+            self.backend.error(e)
+            return self.capacity
+
+    def _level(self) -> float:
+        return self._call(0)
+
+    def _consume(self, cost: float):
+        self._call(cost)
+
+    def _try_consume(self, cost: float) -> float:
+        remaining = self._call(cost, conditional=True)
+        return 0.0 if remaining >= 0 else -remaining / self.rate
+
+
+class RedisStateBackend:
+    """State on a Redis-compatible server (shared across workers and hosts)"""
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = STATE_REDIS_URL, prefix: str = STATE_KEY_PREFIX):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("STATE_BACKEND=redis needs the 'redis' package (pip install redis)")
+        self.url = url
+        self.prefix = prefix
+        self.errors = 0
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.bucket_script = self.client.register_script(_BUCKET_SCRIPT)
+
+    def error(self, e: Exception):
+        self.errors += 1
+        print(f"⚠️ [State Backend] Redis error: {e}")
+
+    def table(self, name: str, max_entries: int) -> RedisTable:
+        return RedisTable(self, name, max_entries)
+
+    def bucket(self, name: str, per_minute: int) -> TokenBucket:
+        return RedisTokenBucket(self, name, per_minute)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "shared": self.shared, "errors": self.errors}
+
+
+def create_state_backend(kind: str = STATE_BACKEND):
+    """
+    Backend selected by STATE_BACKEND ("memory", "sqlite" or "redis")
+
+    Raises:
+        ValueError: for an unknown backend name
+    """
+    if kind == "memory":
+        return MemoryStateBackend()
+    if kind == "sqlite":
+        return SQLiteStateBackend()
+    if kind == "redis":
+        return RedisStateBackend()
+    raise ValueError(f"Unknown STATE_BACKEND: {kind!r} (expected memory, sqlite or redis)")
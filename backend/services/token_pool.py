@@ -0,0 +1,131 @@
+"""
+Token Pool - small in-memory pool of pre-minted ElevenLabs single-use tokens
+
+Tokens are minted in the background and handed out once, so /api/voice/token
+can answer from memory. Tokens close to expiry are discarded, never served.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+ELEVENLABS_TOKEN_POOL_SIZE = int(os.getenv("ELEVENLABS_TOKEN_POOL_SIZE", "0"))
+# ElevenLabs single-use tokens are valid for 15 minutes
+ELEVENLABS_TOKEN_TTL_SECONDS = float(os.getenv("ELEVENLABS_TOKEN_TTL_SECONDS", "900"))
+# Never hand out a token with less than this much lifetime left
+ELEVENLABS_TOKEN_MIN_REMAINING_SECONDS = float(os.getenv("ELEVENLABS_TOKEN_MIN_REMAINING_SECONDS", "120"))
+TOKEN_POOL_RETRY_SECONDS = 5.0
+
+
+class TokenPool:
+    """
+    Pre-minted single-use token pool with background replenishment
+
+    Args:
+        mint: Coroutine returning {"token": "...", "error": None} or {"token": None, "error": "..."}
+        size: Number of tokens to keep ready (0 disables the pool)
+        ttl: Token lifetime in seconds
+        min_remaining: Minimum lifetime left for a token to be served
+    """
+
+    def __init__(
+        self,
+        mint: Callable[[], Awaitable[dict]],
+        size: int = ELEVENLABS_TOKEN_POOL_SIZE,
+        ttl: float = ELEVENLABS_TOKEN_TTL_SECONDS,
+        min_remaining: float = ELEVENLABS_TOKEN_MIN_REMAINING_SECONDS,
+    ):
+        self.mint = mint
+        self.size = max(0, size)
+        self.ttl = ttl
+        self.min_remaining = min(min_remaining, ttl / 2)
+        self._tokens = deque()  # (token, expires_at)
+        self._refill = None
+        self._task = None
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.mint_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def _discard_expiring(self):
+        cutoff = time.monotonic() + self.min_remaining
+        while self._tokens and self._tokens[0][1] <= cutoff:
+            self._tokens.popleft()
+            self.expired += 1
+
+    async def acquire(self) -> dict:
+        """
+        Take a token from the pool, minting one directly if the pool is empty
+
+        Returns:
+            dict: {"token": "...", "error": None} or {"token": None, "error": "..."}
+        """
+        if not self.enabled:
+            return await self.mint()
+
+        self._discard_expiring()
+        if self._refill is not None:
+            self._refill.set()
+
+        if self._tokens:
+            self.hits += 1
+            token, _ = self._tokens.popleft()
+            return {"token": token, "error": None}
+
+        self.misses += 1
+        return await self.mint()
+
+    async def _run(self):
+        while True:
+            self._discard_expiring()
+
+            if len(self._tokens) < self.size:
+                result = await self.mint()
+                if result.get("token"):
+                    self._tokens.append((result["token"], time.monotonic() + self.ttl))
+                    continue
+                self.mint_errors += 1
+                await asyncio.sleep(TOKEN_POOL_RETRY_SECONDS)
+                continue
+
+            # Pool is full - sleep until a token is taken or the oldest one expires
+            wake_in = self._tokens[0][1] - self.min_remaining - time.monotonic()
+            self._refill.clear()
+            try:
+                await asyncio.wait_for(self._refill.wait(), timeout=max(wake_in, 0.1))
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start background replenishment (no-op if the pool is disabled)"""
+        if self.enabled and self._task is None:
+            self._refill = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop background replenishment and drop pooled tokens"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._tokens.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "available": len(self._tokens),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "mint_errors": self.mint_errors,
+        }
@@ -0,0 +1,132 @@
+"""
+Transcript Parser - speaker identification for ATC / cockpit transcripts
+
+Patterns are compiled once at import. Each sentence is classified with a
+single combined match (leading callsign = ATC, trailing callsign = aircraft),
+and the incremental mode only scans text appended after the last complete
+sentence.
+"""
+import re
+from typing import Dict, List
+
+# Common callsign patterns (letters + numbers)
+# Examples: "Coastal 115", "United 234", "Delta 456", "N12345"
+CALLSIGN_PATTERN = r'[A-Z][a-z]+\s+\d+[A-Za-z]*|[A-Z]{2,}\s+\d+|N\d{3,}[A-Z]*'
+
+CALLSIGN_RE = re.compile(r'\b(' + CALLSIGN_PATTERN + r')\b')
+
+# Split by sentence endings or natural pauses
+SENTENCE_BREAK_RE = re.compile(r'[.!?]\s+|\n')
+
+# One pass per sentence:
+# - "start" is a callsign at the very beginning (ATC addressing an aircraft)
+# - "end" is the leftmost callsign that ends the sentence (aircraft readback)
+SPEAKER_RE = re.compile(
+    r'(?:\b(?P<start>' + CALLSIGN_PATTERN + r')\b)?'
+    r'.*?'
+    r'(?:\b(?P<end>' + CALLSIGN_PATTERN + r')\b[,.]?\s*)?$'
+)
+
+MIN_SENTENCE_LENGTH = 5
+
+
+def classify_sentence(sentence: str) -> Dict[str, str]:
+    """
+    Identify the speaker of a single sentence
+
+    Aviation radio protocol:
+    - ATC speaks first, addressing aircraft: "Coastal 115, line up and wait..."
+    - Aircraft responds, ending with callsign: "Line up and wait, Coastal 115"
+    """
+    match = SPEAKER_RE.match(sentence)
+
+    if match.group("start"):
+        # ATC speaking TO aircraft
+        return {
+            "speaker": "ATC",
+            "target_callsign": match.group("start"),
+            "text": sentence
+        }
+    if match.group("end"):
+        # Aircraft speaking, confirms with callsign at end
+        return {
+            "speaker": match.group("end"),
+            "text": sentence
+        }
+    # Unknown speaker - could be pilot conversation in cockpit
+    return {
+        "speaker": "Unknown",
+        "text": sentence
+    }
+
+
+def _scan(text: str):
+    """
+    Yield (sentence, end_offset, complete) for every sentence in `text`.
+    The last sentence is incomplete unless `text` ends with a break.
+    """
+    position = 0
+    for match in SENTENCE_BREAK_RE.finditer(text):
+        yield text[position:match.start()], match.end(), True
+        position = match.end()
+    yield text[position:], position, False
+
+
+def parse_incremental(text: str, offset: int = 0) -> dict:
+    """
+    Parse `text`, the part of a growing transcript starting at `offset`
+
+    Args:
+        text: Transcript text from `offset` onwards
+        offset: Absolute position of `text` within the full transcript
+
+    Returns:
+        {
+            "messages": [...],      # messages found in `text`
+            "stable_count": n,      # first n messages are complete and won't change
+            "next_offset": m        # absolute offset to resume from next time
+        }
+    """
+    messages = []
+    stable_count = 0
+    next_offset = offset
+
+    for sentence, end, complete in _scan(text or ""):
+        if complete:
+            next_offset = offset + end
+
+        sentence = sentence.strip()
+        if len(sentence) < MIN_SENTENCE_LENGTH:
+            continue
+
+        messages.append(classify_sentence(sentence))
+        if complete:
+            stable_count = len(messages)
+
+    return {
+        "messages": messages,
+        "stable_count": stable_count,
+        "next_offset": next_offset
+    }
+
+
+def parse_transcript(transcript: str) -> List[Dict[str, str]]:
+    """
+    Parse a full transcript to identify speakers (ATC vs Aircraft)
+
+    Returns:
+        List of messages: [{"speaker": "ATC/Aircraft", "callsign": "...", "text": "..."}]
+    """
+    if not transcript or len(transcript.strip()) < MIN_SENTENCE_LENGTH:
+        return []
+    return parse_incremental(transcript)["messages"]
+
+
+def parse_many(transcripts: List[str]) -> List[List[Dict[str, str]]]:
+    """parse_transcript over a list of transcripts (one process-pool task per chunk)"""
+    return [parse_transcript(transcript) for transcript in transcripts]
+
+
+def extract_callsigns(text: str) -> List[str]:
+    """All callsigns mentioned in `text`, in order of appearance"""
+    return CALLSIGN_RE.findall(text or "")
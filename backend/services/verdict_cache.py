@@ -0,0 +1,86 @@
+"""
+Verdict Cache - LRU/TTL cache of check-cockpit verdicts
+
+Keyed on a normalized transcript plus callsign, so transcripts that differ
+only by case, whitespace or punctuation reuse the previous verdict (and
+emergency instructions) instead of calling Gemini. Every word counts - a
+different last word ("fire" / "fine", "runway 28" / "runway 10") is a
+different transcript.
+"""
+import hashlib
+import os
+import re
+from typing import Optional
+
+from services.state_backend import MemoryTable
+
+VERDICT_CACHE_ENABLED = os.getenv("VERDICT_CACHE_ENABLED", "1") != "0"
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "1024"))
+VERDICT_CACHE_TTL_SECONDS = float(os.getenv("VERDICT_CACHE_TTL_SECONDS", "600"))
+
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_transcript(transcript: str) -> str:
+    """
+    Canonical form of a transcript for cache lookups
+
+    Lowercases, drops punctuation and collapses whitespace.
+    """
+    text = _NON_WORD_RE.sub(" ", (transcript or "").lower())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class VerdictCache:
+    """
+    Cache of check-cockpit results with hit/miss/eviction counters
+
+    Args:
+        backend: Table of a state backend (per-process LRU by default;
+            pass a shared backend's table to share entries between workers)
+        ttl: Entry lifetime in seconds
+        enabled: When False, every lookup is a miss and nothing is stored
+    """
+
+    def __init__(self, backend=None, ttl: float = VERDICT_CACHE_TTL_SECONDS, enabled: bool = VERDICT_CACHE_ENABLED):
+        if backend is None:
+            backend = MemoryTable(VERDICT_CACHE_SIZE)
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(transcript: str, aircraft_callsign: str = None) -> str:
+        """Cache key for a transcript + monitored callsign"""
+        callsign = " ".join((aircraft_callsign or "").lower().split())
+        normalized = normalize_transcript(transcript)
+        return hashlib.sha1(f"{callsign}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(value)
+
+    def set(self, key: str, value: dict):
+        if self.enabled:
+            self.backend.set(key, dict(value), self.ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
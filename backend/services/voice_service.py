@@ -1,27 +1,149 @@
 """
 Voice Service - ElevenLabs integration for real-time transcription + Gemini analysis
 """
+import asyncio
 import os
-import httpx
-import re
-from dotenv import load_dotenv
-from typing import List, Dict
-import google.generativeai as genai
-
-load_dotenv()
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional
+from services import gemini_client, transcript_parser
+from services.gemini_client import GEMINI_TRANSPORT
+from services.llm_executor import GEMINI_USE_ASYNC_API, LLMExecutor
+from services.analysis_scheduler import (
+    GEMINI_OUTPUT_TOKEN_ESTIMATE,
+    LANE_HIGH,
+    LANE_LOW,
+    AnalysisScheduler,
+    AnalysisShedError,
+    analysis_lane,
+    estimate_tokens,
+)
+from services.http_client import get_http_client
+from services.token_pool import TokenPool
+from services.verdict_cache import VERDICT_CACHE_SIZE, VerdictCache
+from services.state_backend import create_state_backend
+from services.safety_screen import CRITICAL_DESCRIPTIONS, SafetyScreen, critical_reasons
+from services.resilience import CircuitOpenError, UpstreamGuard, UpstreamHTTPError
+from services.language_detector import LanguageDetector
+from services.single_flight import SingleFlight
+from services.batch_analysis import BatchAnalyzer
+from services.prompt_assembler import PromptAssembler, tracker_facts
+from services.llm_responses import (
+    CockpitVerdict,
+    EmergencyInstructions,
+    LanguageResult,
+    ResponseParseError,
+    ResponseParser,
+)
+from services.conflict_engine import ClearanceTracker, describe_conflicts
+from services.analysis_session import AnalysisSession, AnalysisSessionManager
+from services.metrics import UPSTREAM_ERRORS, register_stats_gauge, span, upstream_call
 
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+ELEVENLABS_API_BASE = os.getenv("ELEVENLABS_API_BASE", "https://api.elevenlabs.io")
+# sequential: verdict, then instructions if "yes"
+# speculative: instructions generated concurrently, cancelled on "no"
+# fused: verdict + instructions in one JSON call
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "sequential")
+ANALYSIS_MODES = ("sequential", "speculative", "fused")
+# Per-callsign advisor models holding the static system instruction
+ADVISOR_MODEL_CACHE_SIZE = int(os.getenv("ADVISOR_MODEL_CACHE_SIZE", "64"))
+# Ask Gemini when the local language detector is unsure
+LANGUAGE_GEMINI_FALLBACK = os.getenv("LANGUAGE_GEMINI_FALLBACK", "1") != "0"
+# Load the SDK, prime caches and open upstream connections before the worker serves.
+# Opt-in: it only moves the cost in front of readiness (and adds the connect
+# requests), so it pays off where traffic waits for a ready worker - rolling
+# restarts behind a readiness check - not on a plain cold start.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"
+STARTUP_WARMUP_TIMEOUT_SECONDS = float(os.getenv("STARTUP_WARMUP_TIMEOUT_SECONDS", "10"))
+# Also make one free request per upstream (Gemini countTokens, ElevenLabs GET /)
+STARTUP_WARMUP_CONNECT = os.getenv("STARTUP_WARMUP_CONNECT", "1") != "0"
 
 
 class VoiceService:
     """Service for handling voice transcription with ElevenLabs and AI analysis with Gemini"""
     
     def __init__(self):
-        self.gemini_model = None
-        if GEMINI_API_KEY:
-            genai.configure(api_key=GEMINI_API_KEY)
-            self.gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        self._gemini_model = None
+        self._gemini_preload: Optional[asyncio.Task] = None
+        # Caches, rate budgets and session revisions shared by all workers
+        self.state = create_state_backend()
+        # The SDK's async API is gRPC-only, so REST calls go through the thread pool
+        self.llm = LLMExecutor(use_async_api=GEMINI_USE_ASYNC_API and GEMINI_TRANSPORT != "rest")
+        # Circuit breakers + hedging per upstream; analysis goes local-only while Gemini's is open
+        self.gemini_upstream = UpstreamGuard("gemini")
+        self.elevenlabs_upstream = UpstreamGuard("elevenlabs")
+        # All model calls go through the scheduler (rate budget + priority lanes)
+        self.scheduler = AnalysisScheduler(self.llm, state=self.state, upstream=self.gemini_upstream)
+        self.sessions = AnalysisSessionManager(state=self.state)
+        self.token_pool = TokenPool(self._mint_elevenlabs_token)
+        self.verdict_cache = VerdictCache(self.state.table("verdicts", VERDICT_CACHE_SIZE))
+        self.safety_screen = SafetyScreen()
+        self.language_detector = LanguageDetector()
+        self.single_flight = SingleFlight()
+        self.prompt_assembler = PromptAssembler()
+        self.responses = ResponseParser()
+        self.batch = BatchAnalyzer(self)
+        self.analysis_mode = ANALYSIS_MODE if ANALYSIS_MODE in ANALYSIS_MODES else "sequential"
+        self.analysis_stats = {
+            "speculative_started": 0,
+            "speculative_used": 0,
+            "speculative_cancelled": 0,
+            "fused_calls": 0,
+            "fused_parse_failures": 0,
+            "stream_fallbacks": 0,
+            "language_gemini_fallbacks": 0,
+            "degraded": 0,
+            "advisor_model_hits": 0,
+            "advisor_model_misses": 0,
+        }
+        self._advisor_models = OrderedDict()
+        # Filled by warm_up(); import_seconds is set by main.py
+        self.startup_stats = {
+            "import_seconds": 0.0,
+            "warmup_seconds": 0.0,
+            "warmed_up": 0,
+            "warmup_errors": 0,
+        }
+        self._register_metrics()
+    
+    @property
+    def gemini_model(self):
+        """
+        Default Gemini model, created on first use (None without GEMINI_API_KEY)
+        
+        The first access imports the SDK (~0.7 s) - async code uses
+        `await self._gemini()` so that happens off the event loop.
+        """
+        if self._gemini_model is None and gemini_client.configured():
+            self._gemini_model = gemini_client.generative_model()
+        return self._gemini_model
+    
+    async def _gemini(self):
+        """Default Gemini model, loading the SDK in a thread if it isn't loaded yet"""
+        if self._gemini_model is None and gemini_client.configured():
+            await asyncio.to_thread(self._load_gemini)
+        return self._gemini_model
+    
+    def _register_metrics(self):
+        """Expose component stats (queue depth, cache hit rates, ...) on /metrics"""
+        register_stats_gauge("voice_state_backend", "Shared state backend", "field", self.state.stats)
+        register_stats_gauge("voice_llm_executor", "Gemini executor concurrency and queue depth", "field", self.llm.stats)
+        register_stats_gauge("voice_analysis_scheduler", "Gemini rate budget, lanes and queue waits", "field", self.scheduler.stats)
+        register_stats_gauge("voice_token_pool", "ElevenLabs token prefetch pool", "field", self.token_pool.stats)
+        register_stats_gauge("voice_upstream_gemini", "Gemini circuit breaker and hedging", "field", self.gemini_upstream.stats)
+        register_stats_gauge("voice_upstream_elevenlabs", "ElevenLabs circuit breaker and hedging", "field", self.elevenlabs_upstream.stats)
+        register_stats_gauge("voice_verdict_cache", "Check-cockpit verdict cache", "field", self.verdict_cache.stats)
+        register_stats_gauge("voice_safety_screen", "Safety pre-filter decisions", "field", self.safety_screen.stats)
+        register_stats_gauge("voice_language_detector", "Local n-gram language detection", "field", self.language_detector.stats)
+        register_stats_gauge("voice_llm_responses", "Structured response parsing and retries", "field", self.responses.stats)
+        register_stats_gauge("voice_prompt_assembler", "Token-budgeted prompt assembly", "field", self.prompt_assembler.stats)
+        register_stats_gauge("voice_single_flight", "Per-client model call coalescing", "field", self.single_flight.stats)
+        register_stats_gauge("voice_batch", "Offline batch analysis", "field", self.batch.stats)
+        register_stats_gauge("voice_analysis", "Analysis mode counters", "field", lambda: self.analysis_stats)
+        register_stats_gauge("voice_sessions", "Analysis sessions and their memory use", "field", self.sessions.stats)
+        register_stats_gauge("voice_startup", "Worker import and warm-up timings", "field", lambda: self.startup_stats)
+        register_stats_gauge("voice_segment_log", "On-disk session segment log", "field", self.sessions.log.stats)
     
     def parse_transcript(self, transcript: str) -> List[Dict[str, str]]:
         """
@@ -37,55 +159,128 @@ class VoiceService:
         Returns:
             List of messages: [{"speaker": "ATC/Aircraft", "callsign": "...", "text": "..."}]
         """
-        if not transcript or len(transcript.strip()) < 5:
-            return []
-        
-        # Split by sentence endings or natural pauses
-        sentences = re.split(r'[.!?]\s+|\n', transcript)
-        messages = []
+        with span("parse_transcript"):
+            return transcript_parser.parse_transcript(transcript)
+    
+    def parse_transcript_incremental(self, text: str, offset: int = 0) -> dict:
+        """
+        Parse only the part of a growing transcript appended since `offset`
         
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence or len(sentence) < 5:
-                continue
-            
-            # Common callsign patterns (letters + numbers)
-            # Examples: "Coastal 115", "United 234", "Delta 456", "N12345"
-            callsign_pattern = r'\b([A-Z][a-z]+\s+\d+[A-Za-z]*|[A-Z]{2,}\s+\d+|N\d{3,}[A-Z]*)\b'
-            
-            # Check if sentence STARTS with callsign (ATC speaking)
-            start_match = re.match(r'^' + callsign_pattern, sentence)
-            
-            # Check if sentence ENDS with callsign (Aircraft speaking)
-            end_match = re.search(callsign_pattern + r'[,.]?\s*$', sentence)
+        Args:
+            text: Transcript text starting at `offset`
+            offset: `next_offset` returned by the previous call (0 for a fresh parse)
             
-            if start_match:
-                # ATC speaking TO aircraft
-                callsign = start_match.group(1)
-                messages.append({
-                    "speaker": "ATC",
-                    "target_callsign": callsign,
-                    "text": sentence
-                })
-            elif end_match:
-                # Aircraft speaking, confirms with callsign at end
-                callsign = end_match.group(1)
-                messages.append({
-                    "speaker": callsign,
-                    "text": sentence
-                })
-            else:
-                # Unknown speaker - could be pilot conversation in cockpit
-                messages.append({
-                    "speaker": "Unknown",
-                    "text": sentence
-                })
+        Returns:
+            {"messages": [...], "stable_count": n, "next_offset": m}
+        """
+        with span("parse_transcript"):
+            return transcript_parser.parse_incremental(text, offset)
+    
+    async def start(self):
+        """Start background work (token prefetch) and warm up - called from the app lifespan"""
+        if ELEVENLABS_API_KEY:
+            self.token_pool.start()
+        if STARTUP_WARMUP:
+            await self.warm_up()
+        elif gemini_client.configured():
+            # Load the SDK in the background without holding up readiness - a
+            # request that needs it before then waits in _gemini(), off the loop
+            self._gemini_preload = asyncio.create_task(self._preload_gemini())
+    
+    async def warm_up(self, timeout: float = STARTUP_WARMUP_TIMEOUT_SECONDS, connect: bool = STARTUP_WARMUP_CONNECT):
+        """
+        Do the first-request work up front, so the worker starts serving warm
         
-        return messages
+        Loads the Gemini SDK and the models/schemas built from it, maps the
+        language profiles, creates the shared HTTP client and (with `connect`)
+        opens the upstream connections. Steps run concurrently; a step that
+        fails or runs past `timeout` is only logged - the worker still starts
+        and the request that needs it pays the cost instead.
+        
+        Returns:
+            {"<step>_seconds": duration} for the steps that finished
+        """
+        started_at = time.perf_counter()
+        timings = {}
+        steps = {
+            "language_profiles": asyncio.to_thread(self.language_detector._load),
+            "http_client": asyncio.to_thread(get_http_client),
+        }
+        if gemini_client.configured():
+            steps["gemini_sdk"] = asyncio.to_thread(self._warm_gemini)
+        if connect and ELEVENLABS_API_KEY:
+            steps["elevenlabs_connect"] = self._warm_elevenlabs_connection()
+        if connect and gemini_client.configured():
+            steps["gemini_connect"] = self._warm_gemini_connection()
+        
+        async def timed(name, step):
+            step_started_at = time.perf_counter()
+            try:
+                await step
+            except Exception as e:
+                self.startup_stats["warmup_errors"] += 1
+                print(f"⚠️ [Startup] Warm-up step {name} failed: {e}")
+                return
+            timings[f"{name}_seconds"] = round(time.perf_counter() - step_started_at, 3)
+        
+        tasks = [asyncio.create_task(timed(name, step)) for name, step in steps.items()]
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.startup_stats["warmup_errors"] += len(pending)
+            print(f"⚠️ [Startup] Warm-up timed out after {timeout:.0f}s, {len(pending)} step(s) left")
+        
+        elapsed = time.perf_counter() - started_at
+        self.startup_stats.update(timings, warmup_seconds=round(elapsed, 3), warmed_up=1)
+        print(f"🔥 [Startup] Warm-up done in {elapsed * 1000:.0f} ms")
+        return timings
+    
+    def _load_gemini(self):
+        """SDK import, default model and the response schemas (runs in a thread)"""
+        model = self.gemini_model
+        for schema in (LanguageResult, EmergencyInstructions, CockpitVerdict):
+            self.responses.generation_config(schema)
+        return model
+    
+    def _warm_gemini(self):
+        """_load_gemini plus the default advisor model (runs in a thread)"""
+        if self._load_gemini() is not None:
+            self._advisor_model(None)
+    
+    async def _preload_gemini(self):
+        started_at = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._load_gemini)
+        except Exception as e:
+            self.startup_stats["warmup_errors"] += 1
+            print(f"⚠️ [Startup] Background Gemini SDK load failed: {e}")
+            return
+        self.startup_stats["gemini_preload_seconds"] = round(time.perf_counter() - started_at, 3)
+    
+    async def _warm_gemini_connection(self):
+        """Open the Gemini channel with a free countTokens call (outside the circuit breaker)"""
+        # The model call path needs the SDK; wait for _warm_gemini's import instead of racing it
+        model = await self._gemini()
+        if self.llm.use_async_api:
+            await model.count_tokens_async("ping")
+        else:
+            await asyncio.to_thread(model.count_tokens, "ping")
+    
+    async def _warm_elevenlabs_connection(self):
+        """Open a pooled keep-alive connection to ElevenLabs (any status will do)"""
+        await get_http_client().get(ELEVENLABS_API_BASE)
+    
+    async def stop(self):
+        """Stop background work - called from the app lifespan"""
+        await self.token_pool.stop()
+        self.batch.shutdown()
+        self.llm.shutdown()
     
     async def get_elevenlabs_token(self) -> dict:
         """
-        Generate a single-use token for ElevenLabs Real-time Scribe
+        Get a single-use token for ElevenLabs Real-time Scribe
+        Served from the prefetch pool when enabled (ELEVENLABS_TOKEN_POOL_SIZE > 0)
         
         Returns:
             dict: {"token": "...", "error": None} or {"token": None, "error": "..."}
@@ -93,34 +288,65 @@ class VoiceService:
         if not ELEVENLABS_API_KEY:
             return {"token": None, "error": "ELEVENLABS_API_KEY not configured"}
         
+        with span("token_acquire"):
+            return await self.token_pool.acquire()
+    
+    async def _mint_elevenlabs_token(self) -> dict:
+        """
+        Generate a single-use token for ElevenLabs Real-time Scribe
+        
+        Returns:
+            dict: {"token": "...", "error": None} or {"token": None, "error": "..."}
+        """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.elevenlabs.io/v1/single-use-token/realtime_scribe",
-                    headers={
-                        "xi-api-key": ELEVENLABS_API_KEY
-                    },
-                    timeout=10.0
+            with span("token_mint"):
+                # Not hedged - every attempt mints a token billed to the account
+                response = await self.elevenlabs_upstream.call(
+                    self._request_elevenlabs_token,
+                    is_failure=lambda e: not isinstance(e, UpstreamHTTPError) or e.upstream_fault,
+                    hedge=False
                 )
+            
+            data = response.json()
+            token = data.get("token")
+            print(f"✅ Generated ElevenLabs token")
+            return {"token": token, "error": None}
+        
+        except UpstreamHTTPError as e:
+            error_msg = f"Failed to get token: {e.status_code}"
+            print(f"❌ {error_msg}: {e.text}")
+            return {"token": None, "error": error_msg}
+        
+        except CircuitOpenError as e:
+            print(f"🔌 Token request skipped: {e}")
+            return {"token": None, "error": f"ElevenLabs unavailable, retry in {e.retry_after:.0f}s"}
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    token = data.get("token")
-                    print(f"✅ Generated ElevenLabs token")
-                    return {"token": token, "error": None}
-                else:
-                    error_msg = f"Failed to get token: {response.status_code}"
-                    print(f"❌ {error_msg}: {response.text}")
-                    return {"token": None, "error": error_msg}
-                    
         except Exception as e:
             error_msg = f"Token generation error: {str(e)}"
             print(f"❌ {error_msg}")
             return {"token": None, "error": error_msg}
     
+    async def _request_elevenlabs_token(self):
+        """One token request"""
+        with upstream_call("elevenlabs"):
+            response = await get_http_client().post(
+                f"{ELEVENLABS_API_BASE}/v1/single-use-token/realtime_scribe",
+                headers={
+                    "xi-api-key": ELEVENLABS_API_KEY
+                },
+                timeout=10.0
+            )
+        if response.status_code != 200:
+            UPSTREAM_ERRORS.inc(upstream="elevenlabs", reason=f"http_{response.status_code}")
+            raise UpstreamHTTPError("elevenlabs", response.status_code, response.text)
+        return response
+    
     async def analyze_transcript_language(self, transcript: str) -> dict:
         """
-        Analyze transcript using Gemini 2.5 Flash to detect language
+        Detect the language of a transcript
+        
+        The local n-gram detector answers in well under a millisecond; Gemini
+        is only asked when the detector is unsure (or its profiles are missing).
         
         Args:
             transcript: Text to analyze
@@ -128,83 +354,69 @@ class VoiceService:
         Returns:
             dict: {"language": "...", "confidence": "...", "error": None} or {"error": "..."}
         """
-        if not self.gemini_model:
-            return {"error": "GEMINI_API_KEY not configured"}
-        
         if not transcript or len(transcript.strip()) < 5:
             return {"error": "Transcript too short to analyze"}
         
+        with span("language_detect"):
+            local = self.language_detector.detect(transcript)
+        if local is not None:
+            if local["confidence"] != "low" or not (LANGUAGE_GEMINI_FALLBACK and gemini_client.configured()):
+                print(f"🔤 Detected language locally: {local['language']} ({local['confidence']})")
+                return {**local, "error": None}
+            self.analysis_stats["language_gemini_fallbacks"] += 1
+        
+        result = await self._gemini_transcript_language(transcript)
+        if result.get("error") and local is not None:
+            # Gemini failed - an unsure local answer beats none
+            return {**local, "error": None}
+        return result
+    
+    async def _gemini_transcript_language(self, transcript: str) -> dict:
+        """Detect the language of a transcript with Gemini"""
+        if not gemini_client.configured():
+            return {"error": "GEMINI_API_KEY not configured"}
+        
         try:
             print(f"🤖 Analyzing transcript with Gemini: '{transcript[:100]}...'")
             
-            prompt = f"""Analyze this transcript and detect the language. 
+            with span("prompt_build"):
+                # The recent tail is plenty for language detection
+                transcript = self.prompt_assembler.recent_window(transcript)
+                prompt = f"""Analyze this transcript and detect the language. 
 Respond ONLY with JSON format (no markdown, no code blocks):
 {{"language": "language name in English", "confidence": "high/medium/low"}}
 
 Transcript: {transcript}"""
             
-            response = self.gemini_model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if response_text.startswith("```"):
-                # Extract JSON from code block
-                lines = response_text.split('\n')
-                response_text = '\n'.join(lines[1:-1]) if len(lines) > 2 else response_text
-                response_text = response_text.replace("```json", "").replace("```", "").strip()
-            
-            print(f"🤖 Gemini response: {response_text}")
-            
-            # Parse JSON response
-            import json
             try:
-                result = json.loads(response_text)
-                return {
-                    "language": result.get("language", "Unknown"),
-                    "confidence": result.get("confidence", "unknown"),
-                    "error": None
-                }
-            except json.JSONDecodeError:
-                # Fallback - extract language from text
+                with self.scheduler.lane(LANE_LOW):
+                    model = await self._gemini()
+                    result = await self.responses.generate(self.scheduler, model, prompt, LanguageResult)
+            except ResponseParseError as e:
+                # Fallback - report the raw answer as the language
                 return {
-                    "language": response_text,
+                    "language": e.text.strip(),
                     "confidence": "unknown",
                     "error": None
                 }
+            
+            print(f"🤖 Gemini response: {result.language} ({result.confidence})")
+            return {
+                "language": result.language,
+                "confidence": result.confidence,
+                "error": None
+            }
                 
         except Exception as e:
             error_msg = f"Analysis error: {str(e)}"
             print(f"❌ {error_msg}")
             return {"error": error_msg}
     
-    async def generate_emergency_instructions(self, transcript: str, aircraft_callsign: str = None) -> dict:
-        """
-        Generate emergency response instructions for voice agent
-        Called when intervention is needed - creates summary and agent message
-        
-        Args:
-            transcript: Cockpit conversation that triggered emergency
-            
-        Returns:
-            dict: {
-                "summary": "Context for agent",
-                "agent_message": "First message agent should say to pilots",
-                "success": bool,
-                "error": None
-            }
-        """
-        if not self.gemini_model:
-            return {"error": "GEMINI_API_KEY not configured", "success": False}
+    def _emergency_prompt(self, transcript: str, aircraft_callsign: str = None) -> str:
+        """Prompt for generate_emergency_instructions (transcript already assembled)"""
+        callsign_context = f"YOUR AIRCRAFT: {aircraft_callsign}\n" if aircraft_callsign else "YOUR AIRCRAFT: Not specified (address all pilots)\n"
         
-        if not transcript or len(transcript.strip()) < 10:
-            return {"error": "Transcript too short", "success": False}
-        
-        try:
-            print(f"🚨 [Emergency Generator] Generating instructions for: '{transcript[:100]}...'")
-            
-            callsign_context = f"YOUR AIRCRAFT: {aircraft_callsign}\n" if aircraft_callsign else "YOUR AIRCRAFT: Not specified (address all pilots)\n"
-            
-            prompt = f"""You are an expert aviation safety assistant analyzing cockpit communications.
+        return f"""You are an expert aviation safety assistant analyzing cockpit communications.
 
 {callsign_context}
 Based on the conversation below, generate emergency response instructions for a voice agent.
@@ -239,87 +451,381 @@ TONE: Professional, urgent but not alarming. Focus on facts and actions relevant
 
 Respond ONLY with JSON format (no markdown, no code blocks):
 {{
-  "summary": "...",
-  "agent_message": "..."
+  "agent_message": "...",
+  "summary": "..."
 }}
 
 Cockpit conversation: {transcript}"""
+    
+    async def generate_emergency_instructions(
+        self,
+        transcript: str,
+        aircraft_callsign: str = None,
+        on_agent_message: Callable[[str], Awaitable[None]] = None
+    ) -> dict:
+        """
+        Generate emergency response instructions for voice agent
+        Called when intervention is needed - creates summary and agent message
+        
+        With `on_agent_message`, the response is streamed and the callback
+        receives agent_message text as Gemini generates it, so the voice agent
+        can start speaking before the JSON is complete. If the stream fails,
+        the buffered call is used and its result is authoritative.
+        
+        Args:
+            transcript: Cockpit conversation that triggered emergency
+            aircraft_callsign: Monitored aircraft callsign
+            on_agent_message: Async callback for streamed agent_message text
             
-            response = self.gemini_model.generate_content(prompt)
-            response_text = response.text.strip()
+        Returns:
+            dict: {
+                "summary": "Context for agent",
+                "agent_message": "First message agent should say to pilots",
+                "success": bool,
+                "error": None
+            }
+        """
+        if not gemini_client.configured():
+            return {"error": "GEMINI_API_KEY not configured", "success": False}
+        
+        if not transcript or len(transcript.strip()) < 10:
+            return {"error": "Transcript too short", "success": False}
+        
+        if not self.gemini_upstream.available:
+            return self._degraded_instructions(transcript, aircraft_callsign)
+        
+        try:
+            print(f"🚨 [Emergency Generator] Generating instructions for: '{transcript[:100]}...'")
             
-            # Remove markdown code blocks if present
-            if response_text.startswith("```"):
-                lines = response_text.split('\n')
-                response_text = '\n'.join(lines[1:-1]) if len(lines) > 2 else response_text
-                response_text = response_text.replace("```json", "").replace("```", "").strip()
+            with span("prompt_build"):
+                transcript = self.prompt_assembler.assemble(transcript)
+                prompt = self._emergency_prompt(transcript, aircraft_callsign)
             
-            print(f"🚨 [Emergency Generator] Raw response: {response_text[:200]}...")
+            model = await self._gemini()
             
-            # Parse JSON response
-            import json
-            try:
-                result = json.loads(response_text)
-                summary = result.get("summary", "")
-                agent_message = result.get("agent_message", "")
-                
-                if not summary or not agent_message:
-                    return {
-                        "error": "Generated instructions incomplete",
-                        "success": False
-                    }
-                
-                print(f"✅ [Emergency Generator] Success!")
-                print(f"   Summary: {summary[:100]}...")
-                print(f"   Agent Message: {agent_message[:100]}...")
-                
-                return {
-                    "summary": summary,
-                    "agent_message": agent_message,
-                    "success": True,
-                    "error": None
-                }
-                
-            except json.JSONDecodeError as je:
-                error_msg = f"Failed to parse JSON: {str(je)}"
-                print(f"❌ {error_msg}")
-                return {"error": error_msg, "success": False}
+            # An intervention is already decided - its instructions go first
+            result = None
+            with self.scheduler.lane(LANE_HIGH):
+                if on_agent_message is not None:
+                    try:
+                        result = await self.responses.stream_field(
+                            self.scheduler, model, prompt, EmergencyInstructions,
+                            "agent_message", on_agent_message
+                        )
+                    except (AnalysisShedError, CircuitOpenError, asyncio.CancelledError):
+                        raise
+                    except Exception as e:
+                        self.analysis_stats["stream_fallbacks"] += 1
+                        print(f"⚠️ [Emergency Generator] Stream failed, retrying buffered: {e}")
+                if result is None:
+                    try:
+                        result = await self.responses.generate(
+                            self.scheduler, model, prompt, EmergencyInstructions
+                        )
+                    except ResponseParseError as e:
+                        print(f"❌ {e}")
+                        return {"error": str(e), "success": False}
+            
+            print(f"✅ [Emergency Generator] Success!")
+            print(f"   Summary: {result.summary[:100]}...")
+            print(f"   Agent Message: {result.agent_message[:100]}...")
+            
+            return {
+                "summary": result.summary,
+                "agent_message": result.agent_message,
+                "success": True,
+                "error": None
+            }
+        
+        except CircuitOpenError:
+            return self._degraded_instructions(transcript, aircraft_callsign)
                 
         except Exception as e:
             error_msg = f"Emergency instruction generation error: {str(e)}"
             print(f"❌ {error_msg}")
             return {"error": error_msg, "success": False}
     
-    async def analyze_cockpit_conversation(self, transcript: str, aircraft_callsign: str = None) -> dict:
+    async def stream_emergency_instructions(self, transcript: str, aircraft_callsign: str = None) -> AsyncIterator[dict]:
+        """
+        generate_emergency_instructions as a stream of events
+        
+        Yields:
+            {"type": "delta", "text": "..."} for each piece of agent_message,
+            then {"type": "done", **result} with the complete instructions
+        """
+        deltas: asyncio.Queue = asyncio.Queue()
+        
+        async def on_agent_message(text: str):
+            await deltas.put({"type": "delta", "text": text})
+        
+        async def run():
+            result = await self.generate_emergency_instructions(transcript, aircraft_callsign, on_agent_message)
+            await deltas.put({"type": "done", **result})
+        
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event = await deltas.get()
+                done = event["type"] == "done"
+                yield event
+                if done:
+                    return
+        finally:
+            # Client disconnected - stop the model call
+            task.cancel()
+    
+    async def analyze_cockpit_conversation(
+        self,
+        transcript: str,
+        aircraft_callsign: str = None,
+        client_key: str = None,
+        history_facts: List[str] = None,
+        lane: str = None,
+        messages: List[dict] = None,
+        on_agent_message: Callable[[str], Awaitable[None]] = None
+    ) -> dict:
         """
         Analyze cockpit conversation to determine if pilots need intervention
         If intervention needed, automatically generates emergency instructions
         Uses expert pilots advisor system prompt
         
+        Stages: rule-based conflict engine -> local safety screen (skips chatter)
+        -> verdict cache -> single-flight -> Gemini.
+        Verdicts are cached on the normalized transcript + callsign, so
+        near-identical transcripts don't trigger another Gemini call.
+        Model calls are single-flight: identical concurrent requests share
+        one call, and for a client with a `client_key` a newer transcript
+        cancels its older in-flight call. Anonymous callers only share -
+        several clients may monitor the same callsign, so it can't key them.
+        The prompt gets a bounded transcript section: recent text verbatim,
+        older history as clearance facts (see PromptAssembler).
+        
         Args:
             transcript: Cockpit conversation to analyze
+            aircraft_callsign: Monitored aircraft callsign
+            client_key: Client identity for single-flight (e.g. "session:<id>")
+            history_facts: Facts about history not included in `transcript`
+            lane: Scheduler lane (default: chosen from the transcript content)
+            messages: parse_transcript output for `transcript`, if already parsed
+            on_agent_message: Async callback for agent_message text streamed
+                before the result (sequential mode only; see
+                generate_emergency_instructions)
             
         Returns:
             If intervention needed:
                 {"needs_intervention": True, "summary": "...", "agent_message": "...", "success": True}
             If no intervention:
                 {"needs_intervention": False, "success": True}
+            If a newer request from the same client took over:
+                {"needs_intervention": False, "superseded": True, "success": False}
         """
-        if not self.gemini_model:
+        # Deterministic runway/clearance conflicts need no model round-trip
+        if transcript and len(transcript.strip()) >= 10:
+            with span("conflict_engine"):
+                if messages is None:
+                    messages = transcript_parser.parse_transcript(transcript)
+                tracker = ClearanceTracker()
+                tracker.consume(messages)
+                # Only what is still in force - a later go-around/vacate resolves a conflict
+                conflicts = tracker.active_conflicts()
+            if conflicts:
+                return self._conflict_result(conflicts, aircraft_callsign)
+        
+        if not gemini_client.configured():
             return {"error": "GEMINI_API_KEY not configured", "success": False}
         
         if not transcript or len(transcript.strip()) < 10:
             return {"needs_intervention": False, "success": True, "error": None}
         
+        # Casual chatter with nothing safety-relevant never reaches Gemini
+        with span("safety_screen"):
+            escalate = self.safety_screen.should_escalate(transcript)
+        if not escalate:
+            print(f"🔎 [Pilots Advisor] Screened out (no safety-relevant content)")
+            return {"needs_intervention": False, "success": True, "error": None}
+        
+        with span("prompt_assembly"):
+            context = self.prompt_assembler.assemble(transcript, history_facts)
+        
+        with span("cache_lookup"):
+            cache_key = self.verdict_cache.key(context, aircraft_callsign)
+            cached = self.verdict_cache.get(cache_key)
+        if cached is not None:
+            print(f"♻️ [Pilots Advisor] Cached verdict: needs_intervention={cached.get('needs_intervention')}")
+            return cached
+        
+        # Gemini is failing - answer locally instead of queueing more calls
+        if not self.gemini_upstream.available:
+            return self._degraded_result(transcript, aircraft_callsign)
+        
+        if not client_key:
+            # Anonymous callers only share identical in-flight requests
+            client_key = f"transcript:{cache_key}"
+        with self.scheduler.lane(lane or analysis_lane(transcript)):
+            result = await self.single_flight.run(
+                client_key,
+                cache_key,
+                lambda: self._analyze_cockpit_with_model(context, aircraft_callsign, on_agent_message)
+            )
+        
+        # Only cache clean results - errors, fallback instructions and local-only verdicts are retried
+        if result.get("success") and not result.get("error") and not result.get("degraded"):
+            self.verdict_cache.set(cache_key, result)
+        
+        return result
+    
+    def _intervention_result(self, instructions: dict) -> dict:
+        """Intervention result from generate_emergency_instructions output"""
+        if instructions.get("success"):
+            result = {
+                "needs_intervention": True,
+                "summary": instructions["summary"],
+                "agent_message": instructions["agent_message"],
+                "success": True,
+                "error": None
+            }
+            if instructions.get("degraded"):
+                result["degraded"] = True
+            return result
+        
+        # Even if instruction generation fails, still report intervention needed
+        return {
+            "needs_intervention": True,
+            "summary": "Emergency detected but failed to generate detailed instructions",
+            "agent_message": "Attention: Potential safety issue detected in cockpit conversation. Please review current situation.",
+            "success": True,
+            "error": instructions.get("error")
+        }
+    
+    async def _analyze_cockpit_fused(
+        self,
+        model,
+        instructions: str,
+        system_tokens: int,
+        transcript: str,
+        aircraft_callsign: str = None
+    ) -> dict:
+        """
+        Verdict and emergency instructions in a single structured Gemini call
+        Falls back to a separate instruction call if the JSON can't be parsed
+        """
+        self.analysis_stats["fused_calls"] += 1
+        
+        prompt = f"""{instructions}If the pilots need to be advised, also provide:
+1. SUMMARY: what safety issue was detected, what the pilots may have missed and why it is dangerous (2-3 sentences max, for the voice agent's internal context)
+2. AGENT_MESSAGE: what the voice agent should say to the pilots of {aircraft_callsign or "your aircraft"}
+   - Start with "Alert:" or "Attention:" or "Caution:"
+   - Only instructions relevant to {aircraft_callsign or "your aircraft"}, not to other aircraft
+   - Be specific with runway numbers, altitudes if mentioned
+   - Concise but urgent (2-3 sentences max)
+
+Respond ONLY with JSON format (no markdown, no code blocks):
+{{
+  "needs_intervention": true or false,
+  "summary": "..." or "",
+  "agent_message": "..." or ""
+}}
+
+Transcript: {transcript}"""
+        
         try:
-            print(f"✈️ [Pilots Advisor] Analyzing cockpit conversation: '{transcript[:100]}...'")
-            if aircraft_callsign:
-                print(f"✈️ [Pilots Advisor] Monitoring aircraft: {aircraft_callsign}")
-            
-            # Enhanced system prompt for safety-critical aviation monitoring
-            callsign_context = f"\nMONITORING AIRCRAFT: {aircraft_callsign}\nFocus on safety issues that affect THIS aircraft.\n" if aircraft_callsign else ""
-            
-            system_prompt = f"""You are an expert aviation safety advisor monitoring cockpit communications and ATC interactions.
+            result = await self.responses.generate(
+                self.scheduler, model, prompt, CockpitVerdict, system_tokens=system_tokens
+            )
+        except ResponseParseError as e:
+            self.analysis_stats["fused_parse_failures"] += 1
+            response_text = e.text.lower()
+            if "yes" not in response_text and "true" not in response_text:
+                return {"needs_intervention": False, "success": True, "error": None}
+            instructions = await self.generate_emergency_instructions(transcript, aircraft_callsign)
+            return self._intervention_result(instructions)
+        
+        print(f"✈️ [Pilots Advisor] Fused verdict: needs_intervention={result.needs_intervention}")
+        
+        if not result.needs_intervention:
+            return {"needs_intervention": False, "success": True, "error": None}
+        
+        if not result.summary or not result.agent_message:
+            instructions = await self.generate_emergency_instructions(transcript, aircraft_callsign)
+            return self._intervention_result(instructions)
+        
+        return self._intervention_result({
+            "summary": result.summary,
+            "agent_message": result.agent_message,
+            "success": True
+        })
+    
+    def _degraded_instructions(self, transcript: str, aircraft_callsign: str = None) -> dict:
+        """Template instructions from the local emergency keywords (Gemini unavailable)"""
+        reasons = critical_reasons(transcript)
+        subject = " and ".join(CRITICAL_DESCRIPTIONS[reason] for reason in reasons) or "safety issue"
+        addressee = f", {aircraft_callsign}" if aircraft_callsign else ""
+        return {
+            "summary": f"AI analysis unavailable - local keyword check of the cockpit conversation found: {subject}.",
+            "agent_message": (
+                f"Attention{addressee}: Possible {subject} detected in cockpit communications. "
+                f"Verify the situation and follow the applicable checklist."
+            ),
+            "degraded": True,
+            "success": True,
+            "error": None
+        }
+    
+    def _degraded_result(self, transcript: str, aircraft_callsign: str = None) -> dict:
+        """
+        Local-only verdict while Gemini's circuit is open
+        
+        Only unambiguous emergencies (mayday, fire, terrain, ...) raise an
+        intervention; anything subtler waits for the model to come back.
+        """
+        self.analysis_stats["degraded"] += 1
+        if not critical_reasons(transcript):
+            return {
+                "needs_intervention": False,
+                "degraded": True,
+                "retry_after": round(self.gemini_upstream.retry_after(), 1),
+                "success": True,
+                "error": None
+            }
+        
+        instructions = self._degraded_instructions(transcript, aircraft_callsign)
+        print(f"🛑 [Pilots Advisor] Local-only mode: {instructions['summary']}")
+        return {
+            "needs_intervention": True,
+            "summary": instructions["summary"],
+            "agent_message": instructions["agent_message"],
+            "detected_by": "local_fallback",
+            "degraded": True,
+            "retry_after": round(self.gemini_upstream.retry_after(), 1),
+            "success": True,
+            "error": None
+        }
+    
+    def _conflict_result(self, conflicts: List[dict], aircraft_callsign: str = None) -> dict:
+        """Intervention result for conflicts raised by the rule-based engine"""
+        instructions = describe_conflicts(conflicts, aircraft_callsign)
+        print(f"🛑 [Conflict Engine] {conflicts[0]['description']}")
+        return {
+            "needs_intervention": True,
+            "summary": instructions["summary"],
+            "agent_message": instructions["agent_message"],
+            "conflicts": conflicts,
+            "detected_by": "conflict_engine",
+            "success": True,
+            "error": None
+        }
+    
+    def _track_session_clearances(self, session: AnalysisSession) -> List[dict]:
+        """Feed new committed segments to the session's clearance table"""
+        with span("conflict_engine"):
+            return session.track_clearances()
+    
+    def _advisor_system_prompt(self, aircraft_callsign: str = None) -> str:
+        """Static pilots advisor instructions (only the callsign line varies)"""
+        # Enhanced system prompt for safety-critical aviation monitoring
+        callsign_context = f"\nMONITORING AIRCRAFT: {aircraft_callsign}\nFocus on safety issues that affect THIS aircraft.\n" if aircraft_callsign else ""
+        
+        return f"""You are an expert aviation safety advisor monitoring cockpit communications and ATC interactions.
 {callsign_context}
 Your role is to detect safety-critical situations that pilots may have missed or not fully appreciated.
 
@@ -375,17 +881,83 @@ ANALYZE THE TRANSCRIPT:
 Look for any of the above situations. If pilots are unaware of a safety risk, missed critical information, 
 or are making potentially dangerous assumptions, answer 'yes'.
 
-If everything appears normal and safe, answer 'no'.
-
-Answer ONLY 'yes' or 'no'."""
+If everything appears normal and safe, answer 'no'."""
+    
+    def _advisor_model(self, aircraft_callsign: str = None):
+        """
+        Model for pilots advisor calls and the instructions to inline in the prompt
+        
+        With system_instruction support the static instructions live in a
+        per-callsign model instance (LRU), so each call only carries the
+        transcript and Gemini can reuse the processed prefix. Older SDKs
+        get the instructions inlined into every prompt.
+        
+        Returns:
+            (model, inline_instructions, system_instruction_tokens)
+        """
+        if not gemini_client.supports("GenerativeModel", "system_instruction"):
+            return self.gemini_model, f"{self._advisor_system_prompt(aircraft_callsign)}\n\n", 0
+        
+        key = aircraft_callsign or ""
+        cached = self._advisor_models.get(key)
+        if cached is not None:
+            self._advisor_models.move_to_end(key)
+            self.analysis_stats["advisor_model_hits"] += 1
+            return cached[0], "", cached[1]
+        
+        self.analysis_stats["advisor_model_misses"] += 1
+        system_prompt = self._advisor_system_prompt(aircraft_callsign)
+        model = gemini_client.generative_model(system_instruction=system_prompt)
+        # Still billed per call - the scheduler budgets it
+        system_tokens = estimate_tokens(system_prompt) - GEMINI_OUTPUT_TOKEN_ESTIMATE
+        self._advisor_models[key] = (model, system_tokens)
+        while len(self._advisor_models) > ADVISOR_MODEL_CACHE_SIZE:
+            self._advisor_models.popitem(last=False)
+        return model, "", system_tokens
+    
+    async def _analyze_cockpit_with_model(
+        self,
+        transcript: str,
+        aircraft_callsign: str = None,
+        on_agent_message: Callable[[str], Awaitable[None]] = None
+    ) -> dict:
+        """
+        Ask Gemini whether the pilots need advising, then generate emergency
+        instructions if they do (streamed to `on_agent_message` when given)
+        """
+        try:
+            print(f"✈️ [Pilots Advisor] Analyzing cockpit conversation: '{transcript[:100]}...'")
+            if aircraft_callsign:
+                print(f"✈️ [Pilots Advisor] Monitoring aircraft: {aircraft_callsign}")
+            
+            # The advisor models need the SDK - load it off the loop first
+            await self._gemini()
+            with span("prompt_build"):
+                model, instructions, system_tokens = self._advisor_model(aircraft_callsign)
             
-            prompt = f"""{system_prompt}
+            if self.analysis_mode == "fused":
+                return await self._analyze_cockpit_fused(model, instructions, system_tokens, transcript, aircraft_callsign)
+            
+            prompt = f"""{instructions}Answer ONLY 'yes' or 'no'.
 
 Transcript: {transcript}
 
 Is there a need to advise the pilots? Answer only 'yes' or 'no'."""
             
-            response = self.gemini_model.generate_content(prompt)
+            # Speculative mode: start generating instructions before the verdict is known
+            instructions_task = None
+            if self.analysis_mode == "speculative":
+                instructions_task = asyncio.create_task(
+                    self.generate_emergency_instructions(transcript, aircraft_callsign)
+                )
+                self.analysis_stats["speculative_started"] += 1
+            
+            try:
+                response = await self.scheduler.generate(model, prompt, system_tokens=system_tokens)
+            except BaseException:
+                if instructions_task is not None:
+                    instructions_task.cancel()
+                raise
             response_text = response.text.strip().lower()
             
             print(f"✈️ [Pilots Advisor] Gemini response: '{response_text}'")
@@ -393,41 +965,149 @@ Is there a need to advise the pilots? Answer only 'yes' or 'no'."""
             # Parse yes/no response
             needs_intervention = "yes" in response_text
             
-            # If intervention needed, generate emergency instructions
-            if needs_intervention:
-                print(f"🚨 [Pilots Advisor] INTERVENTION NEEDED - generating instructions...")
-                instructions = await self.generate_emergency_instructions(transcript, aircraft_callsign)
-                
-                if instructions.get("success"):
-                    return {
-                        "needs_intervention": True,
-                        "summary": instructions["summary"],
-                        "agent_message": instructions["agent_message"],
-                        "success": True,
-                        "error": None
-                    }
-                else:
-                    # Even if instruction generation fails, still report intervention needed
-                    return {
-                        "needs_intervention": True,
-                        "summary": "Emergency detected but failed to generate detailed instructions",
-                        "agent_message": "Attention: Potential safety issue detected in cockpit conversation. Please review current situation.",
-                        "success": True,
-                        "error": instructions.get("error")
-                    }
-            else:
+            if not needs_intervention:
+                if instructions_task is not None:
+                    instructions_task.cancel()
+                    self.analysis_stats["speculative_cancelled"] += 1
                 # No intervention needed
                 return {
                     "needs_intervention": False,
                     "success": True,
                     "error": None
                 }
+            
+            # Intervention needed - use (or generate) emergency instructions
+            if instructions_task is not None:
+                print(f"🚨 [Pilots Advisor] INTERVENTION NEEDED - awaiting speculative instructions...")
+                instructions = await instructions_task
+                self.analysis_stats["speculative_used"] += 1
+            else:
+                print(f"🚨 [Pilots Advisor] INTERVENTION NEEDED - generating instructions...")
+                instructions = await self.generate_emergency_instructions(
+                    transcript, aircraft_callsign, on_agent_message
+                )
+            
+            return self._intervention_result(instructions)
+        
+        except CircuitOpenError as e:
+            print(f"🔌 [Pilots Advisor] {e} - local-only analysis")
+            return self._degraded_result(transcript, aircraft_callsign)
+        
+        except AnalysisShedError as e:
+            print(f"⏳ [Pilots Advisor] {e}")
+            return {"error": str(e), "shed": True, "success": False, "needs_intervention": False}
                 
         except Exception as e:
             error_msg = f"Cockpit analysis error: {str(e)}"
             print(f"❌ {error_msg}")
             return {"error": error_msg, "success": False, "needs_intervention": False}
 
+    async def analyze_session_update(
+        self,
+        session_id: str,
+        base_index: int,
+        committed: List[str],
+        partial: str = "",
+        aircraft_callsign: str = None
+    ) -> dict:
+        """
+        Append new transcript segments to an analysis session and evaluate
+        only the delta plus a bounded window of earlier context
+        
+        Args:
+            session_id: Client-generated session identifier
+            base_index: Index of the first segment in `committed`
+            committed: New committed segments since `base_index`
+            partial: Current partial (not yet committed) text
+            aircraft_callsign: Monitored aircraft callsign
+            
+        Returns:
+            Same shape as analyze_cockpit_conversation plus "committed_count".
+            If segments are missing: {"resync": True, "committed_count": n, "success": False}
+        """
+        session = self.sessions.get_or_create(session_id, aircraft_callsign)
+        
+        if not session.append(base_index, committed, partial):
+            print(f"🔁 [Session {session_id[:8]}] Resync needed (have {session.committed_count}, got base {base_index})")
+            return {
+                "resync": True,
+                "committed_count": session.committed_count,
+                "success": False,
+                "error": None
+            }
+        
+        result = await self.evaluate_session(session)
+        result["committed_count"] = session.committed_count
+        return result
+    
+    def analysis_delay(self, session: AnalysisSession, window: str = None) -> float:
+        """
+        Seconds until `session` may be analyzed again
+        
+        The interval depends on the session's lane (recent runway / clearance /
+        warning talk goes first) and stretches as the Gemini budget runs out.
+        """
+        if session.last_analyzed_at is None:
+            return 0.0
+        if window is None:
+            window = session.pending_window()
+            if window is None:
+                return 0.0
+        interval = self.scheduler.session_interval(analysis_lane(window))
+        return max(0.0, session.last_analyzed_at + interval - time.monotonic())
+    
+    async def evaluate_session(
+        self,
+        session: AnalysisSession,
+        on_agent_message: Callable[[str], Awaitable[None]] = None
+    ) -> dict:
+        """
+        Evaluate the pending window of an analysis session
+        
+        Args:
+            session: Session with appended segments
+            on_agent_message: Async callback for streamed agent_message text
+            
+        Returns:
+            Result of analyze_cockpit_conversation for the pending window,
+            or a copy of the last result if nothing changed
+        """
+        conflicts = self._track_session_clearances(session)
+        if conflicts:
+            return self._conflict_result(conflicts, session.aircraft_callsign)
+        
+        window = session.pending_window()
+        if window is None:
+            # Nothing new since last evaluation
+            return dict(session.last_result or {"needs_intervention": False, "success": True, "error": None})
+        
+        delay = self.analysis_delay(session, window)
+        if delay > 0:
+            # Too soon for this session's lane - the client retries later
+            return {
+                "needs_intervention": False,
+                "deferred": True,
+                "retry_after": round(delay, 2),
+                "success": False,
+                "error": "Analysis deferred"
+            }
+        
+        # Older context fell out of the window - carry it as clearance facts
+        history_facts = None
+        if session.trimmed or len(window) < len(session.transcript):
+            history_facts = tracker_facts(session.tracker)
+        
+        result = await self.analyze_cockpit_conversation(
+            window,
+            session.aircraft_callsign,
+            client_key=f"session:{session.session_id}",
+            history_facts=history_facts,
+            on_agent_message=on_agent_message
+        )
+        if result.get("success"):
+            session.mark_analyzed(window, result)
+        return result
+
 
 # Singleton instance
 voice_service = VoiceService()
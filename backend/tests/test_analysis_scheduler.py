@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from services import analysis_scheduler
+from services.analysis_scheduler import (
+    LANE_BULK, LANE_HIGH, LANE_LOW, LANE_NORMAL, AnalysisScheduler, AnalysisShedError, analysis_lane,
+)
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate(self, model, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return prompt
+
+
+def _scheduler(**kwargs):
+    executor = RecordingExecutor()
+    return AnalysisScheduler(executor, **kwargs), executor
+
+
+async def _call(scheduler, lane, prompt):
+    with scheduler.lane(lane):
+        return await scheduler.generate(None, prompt)
+
+
+def test_lanes():
+    assert analysis_lane("Speedbird 12, cleared to land runway 29") == LANE_HIGH
+    assert analysis_lane("how was the weekend, nice weather today") == LANE_LOW
+
+
+def test_queued_calls_are_released_in_lane_order():
+    async def scenario():
+        # 100 requests per second once the bucket is empty
+        scheduler, executor = _scheduler(rpm_limit=6000, tpm_limit=0)
+        scheduler.requests.take(6000)
+        calls = [
+            asyncio.create_task(_call(scheduler, lane, lane))
+            for lane in (LANE_BULK, LANE_LOW, LANE_NORMAL, LANE_HIGH)
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queue_depth"] == 4
+        await asyncio.gather(*calls)
+        return scheduler, executor
+
+    scheduler, executor = asyncio.run(scenario())
+    assert executor.prompts == [LANE_HIGH, LANE_NORMAL, LANE_LOW, LANE_BULK]
+    assert scheduler.stats()["queue_depth"] == 0
+    assert scheduler.lane_stats[LANE_HIGH]["dispatched"] == 1
+
+
+def test_call_waiting_past_its_lane_limit_is_shed(monkeypatch):
+    monkeypatch.setitem(analysis_scheduler.LANE_MAX_WAIT_SECONDS, LANE_LOW, 0.05)
+
+    async def scenario():
+        # Next request in a second
+        scheduler, executor = _scheduler(rpm_limit=60, tpm_limit=0)
+        scheduler.requests.take(60)
+        with pytest.raises(AnalysisShedError):
+            await _call(scheduler, LANE_LOW, "chatter")
+        return scheduler, executor
+
+    scheduler, executor = asyncio.run(scenario())
+    assert executor.prompts == []
+    assert scheduler.lane_stats[LANE_LOW]["shed"] == 1
+    # The shed ticket doesn't hold a place in the queue
+    assert scheduler._waiting == 0
+    assert scheduler.stats()["queue_depth"] == 0
+
+
+def test_full_queue_sheds_all_but_high_priority(monkeypatch):
+    monkeypatch.setitem(analysis_scheduler.LANE_MAX_WAIT_SECONDS, LANE_NORMAL, 0.05)
+    monkeypatch.setitem(analysis_scheduler.LANE_MAX_WAIT_SECONDS, LANE_HIGH, 0.05)
+
+    async def scenario():
+        scheduler, _ = _scheduler(rpm_limit=60, tpm_limit=0, max_queue=1)
+        scheduler.requests.take(60)
+        waiting = asyncio.create_task(_call(scheduler, LANE_NORMAL, "first"))
+        await asyncio.sleep(0)
+        with pytest.raises(AnalysisShedError, match="queue full"):
+            await _call(scheduler, LANE_LOW, "second")
+        # High priority still queues (and is then shed on its own wait limit)
+        with pytest.raises(AnalysisShedError, match="budget exhausted"):
+            await _call(scheduler, LANE_HIGH, "third")
+        with pytest.raises(AnalysisShedError):
+            await waiting
+
+    asyncio.run(scenario())
+
+
+def test_request_budget_is_refunded_when_tokens_run_short(monkeypatch):
+    monkeypatch.setitem(analysis_scheduler.LANE_MAX_WAIT_SECONDS, LANE_LOW, 0.05)
+
+    async def scenario():
+        scheduler, _ = _scheduler(rpm_limit=600, tpm_limit=600)
+        scheduler.tokens.take(600)
+        with pytest.raises(AnalysisShedError):
+            await _call(scheduler, LANE_LOW, "chatter")
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    # Every dispatch attempt took a request, saw too few tokens and gave it back
+    assert scheduler.requests._level() > 599.5
+
+
+def test_tokens_are_charged_by_prompt_size():
+    async def scenario():
+        scheduler, _ = _scheduler(rpm_limit=0, tpm_limit=10000)
+        await scheduler.generate(None, "x" * 400, system_tokens=50)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    expected = 400 // 4 + analysis_scheduler.GEMINI_OUTPUT_TOKEN_ESTIMATE + 50
+    assert 10000 - expected - 1 < scheduler.tokens._level() < 10000 - expected + 1
+
+
+def test_session_interval_stretches_with_pressure():
+    scheduler, _ = _scheduler(rpm_limit=6000, tpm_limit=0, base_interval=1.0)
+    idle = {lane: scheduler.session_interval(lane) for lane in (LANE_HIGH, LANE_NORMAL, LANE_LOW)}
+    assert idle == {LANE_HIGH: 0.5, LANE_NORMAL: 1.0, LANE_LOW: 2.0}
+
+    scheduler.requests.take(3000)
+    assert scheduler.pressure() == pytest.approx(0.5, abs=0.01)
+    # High priority never stretches; lower lanes back off harder
+    assert scheduler.session_interval(LANE_HIGH) == 0.5
+    assert scheduler.session_interval(LANE_NORMAL) == pytest.approx(2.5, abs=0.05)
+    assert scheduler.session_interval(LANE_LOW) == pytest.approx(10.0, abs=0.2)
+
+
+def test_unlimited_budget_never_queues():
+    async def scenario():
+        scheduler, executor = _scheduler(rpm_limit=0, tpm_limit=0)
+        await asyncio.gather(*(_call(scheduler, LANE_LOW, str(i)) for i in range(5)))
+        return scheduler, executor
+
+    scheduler, executor = asyncio.run(scenario())
+    assert len(executor.prompts) == 5
+    assert scheduler.pressure() == 0.0
+    assert scheduler.lane_stats[LANE_LOW]["dispatched"] == 5
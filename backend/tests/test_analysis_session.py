@@ -0,0 +1,112 @@
+from services.analysis_session import AnalysisSession, AnalysisSessionManager
+from services.segment_log import SegmentLog
+from services.state_backend import SQLiteStateBackend
+
+SEGMENTS = [
+    "Speedbird 12, line up and wait runway 29.",
+    "Line up and wait runway 29, Speedbird 12.",
+    "Ryanair 45, cleared to land runway 29.",
+]
+
+
+def _result(summary):
+    return {"needs_intervention": False, "summary": summary, "agent_message": ""}
+
+
+def test_restore_rebuilds_segments_clearances_and_verdict(tmp_path):
+    log = SegmentLog(str(tmp_path))
+    original = AnalysisSession("s1", "Speedbird 12", log=log)
+    original.append(0, SEGMENTS[:2])
+    original.mark_analyzed(original.pending_window(), _result("lined up"))
+    original.append(2, SEGMENTS[2:])
+    original.track_clearances()
+
+    restored = AnalysisSession("s1", log=log)
+    restored.restore(log.replay("s1"))
+
+    assert [record.text for record in restored.segments] == SEGMENTS
+    assert restored.committed_text == original.committed_text
+    assert restored.tracker.active_conflicts() == original.tracker.active_conflicts()
+    assert restored.tracker.active_conflicts()
+    assert restored.verdicts[-1].summary == "lined up"
+    assert restored.verdicts[-1].segment_count == 2
+
+
+def test_restore_applies_resends():
+    session = AnalysisSession("s1")
+    session.restore([
+        {"event": "start", "aircraft_callsign": "Speedbird 12"},
+        {"event": "segment", "index": 0, "text": "first"},
+        {"event": "segment", "index": 1, "text": "second"},
+        {"event": "truncate", "index": 1},
+        {"event": "segment", "index": 1, "text": "second, corrected"},
+    ])
+    assert session.aircraft_callsign == "Speedbird 12"
+    assert [record.text for record in session.segments] == ["first", "second, corrected"]
+
+
+def test_restore_skips_events_already_applied():
+    session = AnalysisSession("s1")
+    session.append(0, ["first", "second"])
+    session.mark_analyzed(session.pending_window(), _result("ok"))
+
+    session.restore([
+        {"event": "segment", "index": 0, "text": "first"},
+        {"event": "segment", "index": 1, "text": "second"},
+        {"event": "verdict", "segment_count": 2, "summary": "ok"},
+        {"event": "segment", "index": 2, "text": "third"},
+    ])
+
+    assert [record.text for record in session.segments] == ["first", "second", "third"]
+    assert len(session.verdicts) == 1
+
+
+def test_worker_catches_up_from_its_log_offset(tmp_path):
+    state = SQLiteStateBackend(str(tmp_path / "state.sqlite3"))
+    log = SegmentLog(str(tmp_path / "log"))
+    worker_a = AnalysisSessionManager(log=log, state=state)
+    worker_b = AnalysisSessionManager(log=log, state=state)
+
+    session_a = worker_a.get_or_create("s1", "Speedbird 12")
+    session_a.append(0, SEGMENTS[:1])
+    session_b = worker_b.get_or_create("s1")
+    assert worker_b.restored == 1
+    session_b.append(1, SEGMENTS[1:2])
+
+    reads = []
+    read = log.read
+    log.read = lambda session_id, offset=0: reads.append(offset) or read(session_id, offset)
+
+    assert worker_a.get_or_create("s1") is session_a
+    assert reads and reads[0] > 0
+    assert worker_a.stale == 1
+    assert [record.text for record in session_a.segments] == SEGMENTS[:2]
+
+    # Both copies are current again - no further reads
+    reads.clear()
+    worker_a.get_or_create("s1")
+    worker_b.get_or_create("s1")
+    assert reads == []
+
+
+def test_interleaved_appends_converge(tmp_path):
+    state = SQLiteStateBackend(str(tmp_path / "state.sqlite3"))
+    log = SegmentLog(str(tmp_path / "log"))
+    worker_a = AnalysisSessionManager(log=log, state=state)
+    worker_b = AnalysisSessionManager(log=log, state=state)
+    session_a = worker_a.get_or_create("s1")
+    session_b = worker_b.get_or_create("s1")
+
+    # Both think they are appending segment 0; B's write lands last
+    session_a.append(0, ["from a"])
+    session_b.append(0, ["from b"])
+    assert session_b.log_stale
+
+    session_a = worker_a.get_or_create("s1")
+    session_b = worker_b.get_or_create("s1")
+    fresh = AnalysisSession("s1")
+    fresh.restore(log.replay("s1"))
+    expected = [record.text for record in fresh.segments]
+    assert expected == ["from b"]
+    assert [record.text for record in session_a.segments] == expected
+    assert [record.text for record in session_b.segments] == expected
@@ -0,0 +1,104 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from main import app
+from services.voice_service import voice_service
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr("routes.voice_routes.WS_COALESCE_SECONDS", 0)
+    monkeypatch.setattr(voice_service, "analysis_delay", lambda session, window=None: 0)
+    # No lifespan: the warm-up isn't needed here
+    return TestClient(app)
+
+
+def test_invalid_json_is_reported_not_fatal(client):
+    with client.websocket_connect("/api/voice/ws") as websocket:
+        websocket.send_text("{not json")
+        assert websocket.receive_json() == {"type": "error", "error": "Invalid JSON"}
+        websocket.send_json(["start"])
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_json({"type": "start", "session_id": "ws-json"})
+        assert websocket.receive_json() == {"type": "ready", "session_id": "ws-json"}
+
+
+def test_restart_closes_previous_session(client):
+    with client.websocket_connect("/api/voice/ws") as websocket:
+        websocket.send_json({"type": "start", "session_id": "ws-old"})
+        websocket.receive_json()
+        websocket.send_json({"type": "start", "session_id": "ws-new"})
+        websocket.receive_json()
+        assert voice_service.sessions.get("ws-old") is None
+        assert voice_service.sessions.get("ws-new") is not None
+    assert voice_service.sessions.get("ws-new") is None
+
+
+def test_failed_evaluation_sends_error_and_keeps_going(client, monkeypatch):
+    calls = []
+
+    async def evaluate_session(session, on_agent_message=None):
+        calls.append(session.session_id)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return {"needs_intervention": False, "success": True, "summary": "", "agent_message": ""}
+
+    monkeypatch.setattr(voice_service, "evaluate_session", evaluate_session)
+    with client.websocket_connect("/api/voice/ws") as websocket:
+        websocket.send_json({"type": "start", "session_id": "ws-eval"})
+        websocket.receive_json()
+        websocket.send_json({"type": "committed", "text": "Tower, LOT123, ready for departure runway 29"})
+        assert websocket.receive_json() == {"type": "error", "error": "Analysis failed: boom"}
+        websocket.send_json({"type": "partial", "text": "LOT123 line up and wait"})
+        message = websocket.receive_json()
+        assert message["type"] == "analysis"
+        assert message["needs_intervention"] is False
+
+
+def test_broken_evaluator_closes_with_1011(client, monkeypatch):
+    def analysis_delay(session, window=None):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(voice_service, "analysis_delay", analysis_delay)
+    with client.websocket_connect("/api/voice/ws") as websocket:
+        websocket.send_json({"type": "start", "session_id": "ws-broken"})
+        websocket.receive_json()
+        websocket.send_json({"type": "partial", "text": "LOT123 line up and wait"})
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+        assert closed.value.code == 1011
+
+
+@pytest.mark.parametrize("event", [
+    {"type": "committed", "text": 123},
+    {"type": "committed", "text": ["ok", None]},
+    {"type": "committed", "text": {"text": "nested"}},
+    {"type": "partial", "text": ["not", "a", "string"]},
+])
+def test_non_string_text_is_reported_not_fatal(client, event):
+    with client.websocket_connect("/api/voice/ws") as websocket:
+        websocket.send_json({"type": "start", "session_id": "ws-types"})
+        websocket.receive_json()
+        websocket.send_json(event)
+        assert websocket.receive_json()["type"] == "error"
+        assert voice_service.sessions.get("ws-types").committed_count == 0
+        websocket.send_json({"type": "start", "session_id": 42})
+        assert websocket.receive_json()["type"] == "error"
+        # Still serving the same session
+        websocket.send_json({"type": "start", "session_id": "ws-types"})
+        assert websocket.receive_json() == {"type": "ready", "session_id": "ws-types"}
+
+
+def test_committed_accepts_a_batch_of_segments(client, monkeypatch):
+    monkeypatch.setattr(voice_service, "evaluate_session", _quiet_evaluation)
+    with client.websocket_connect("/api/voice/ws") as websocket:
+        websocket.send_json({"type": "start", "session_id": "ws-batch"})
+        websocket.receive_json()
+        websocket.send_json({"type": "committed", "text": ["Tower, LOT123, ready.", "LOT123, line up and wait."]})
+        assert websocket.receive_json()["type"] == "analysis"
+        assert voice_service.sessions.get("ws-batch").committed_count == 2
+
+
+async def _quiet_evaluation(session, on_agent_message=None):
+    return {"needs_intervention": False, "success": True, "summary": "", "agent_message": ""}
@@ -0,0 +1,93 @@
+import asyncio
+
+from services import transcript_parser
+from services.conflict_engine import ClearanceTracker
+from services.voice_service import voice_service
+
+TAKEOFF = "Speedbird 12, runway 29, cleared for takeoff. Cleared for takeoff runway 29, Speedbird 12."
+LANDING = "Ryanair 45, runway 29, cleared to land. Cleared to land runway 29, Ryanair 45."
+GO_AROUND = "Ryanair 45, go around. Going around, Ryanair 45."
+AIRBORNE = "Speedbird 12, positive rate, contact departure. Contact departure, Speedbird 12."
+
+
+def messages(*parts):
+    return transcript_parser.parse_transcript(" ".join(parts))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_same_runway_takeoff_and_landing_conflict():
+    tracker = ClearanceTracker()
+    raised = tracker.consume(messages(TAKEOFF, LANDING))
+    assert [conflict["type"] for conflict in raised] == ["runway_conflict"]
+    assert raised[0]["runway"] == "29"
+    assert tracker.active_conflicts() == raised
+
+
+def test_go_around_resolves_the_conflict():
+    tracker = ClearanceTracker()
+    raised = tracker.consume(messages(TAKEOFF, LANDING, GO_AROUND))
+    assert raised  # raised while reading...
+    assert tracker.active_conflicts() == []  # ...but no longer in force
+
+
+def test_airborne_releases_the_runway():
+    tracker = ClearanceTracker()
+    tracker.consume(messages(TAKEOFF, AIRBORNE, LANDING))
+    assert tracker.active_conflicts() == []
+
+
+def test_clearances_expire_by_time():
+    clock = FakeClock()
+    tracker = ClearanceTracker(ttl=300, clock=clock)
+    tracker.consume(messages(TAKEOFF))
+    clock.now += 600
+    assert tracker.consume(messages(LANDING)) == []
+    assert tracker.active_conflicts() == []
+
+
+def test_active_conflict_expires_without_new_messages():
+    clock = FakeClock()
+    tracker = ClearanceTracker(ttl=300, clock=clock)
+    tracker.consume(messages(TAKEOFF, LANDING))
+    assert tracker.active_conflicts()
+    clock.now += 301
+    assert tracker.active_conflicts() == []
+
+
+def test_clearances_expire_by_message_count():
+    filler = " ".join(f"Wizz {n}, contact ground. Contact ground, Wizz {n}." for n in range(10, 30))
+    tracker = ClearanceTracker(max_messages=30)
+    tracker.consume(messages(TAKEOFF, filler, LANDING))
+    assert tracker.active_conflicts() == []
+
+
+def test_readback_mismatch():
+    tracker = ClearanceTracker()
+    raised = tracker.consume(messages("Ryanair 45, runway 29, cleared to land. Cleared to land runway 11, Ryanair 45."))
+    assert [conflict["type"] for conflict in raised] == ["readback_mismatch"]
+
+
+def test_reset_keeps_configuration():
+    clock = FakeClock()
+    tracker = ClearanceTracker(ttl=5, max_messages=3, clock=clock)
+    tracker.consume(messages(TAKEOFF))
+    tracker.reset()
+    assert (tracker.ttl, tracker.max_messages, tracker.clock) == (5, 3, clock)
+    assert tracker.clearances == {}
+
+
+def test_analysis_ignores_resolved_conflicts():
+    transcript = " ".join((TAKEOFF, LANDING, GO_AROUND))
+    result = asyncio.run(voice_service.analyze_cockpit_conversation(transcript))
+    assert result.get("detected_by") != "conflict_engine"
+
+    result = asyncio.run(voice_service.analyze_cockpit_conversation(" ".join((TAKEOFF, LANDING))))
+    assert result["needs_intervention"] is True
+    assert result["detected_by"] == "conflict_engine"
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from services.language_detector import LanguageDetector
+
+
+@pytest.fixture(scope="module")
+def detector(tmp_path_factory):
+    # Built from the corpora on first use, like a fresh checkout
+    detector = LanguageDetector(str(tmp_path_factory.mktemp("profiles") / "profiles.bin"))
+    assert detector.available
+    return detector
+
+
+@pytest.mark.parametrize("text, language", [
+    ("Dobrý den, věž, tady Speedbird 12, žádáme povolení k přistání na dráze dvacet devět, děkuji.", "Czech"),
+    ("Rozumím, přistání povoleno, vítr dvě stě sedmdesát stupňů, osm uzlů, ohlaste se na odbočce.", "Czech"),
+    ("Dobrý deň, veža, tu je Speedbird 12, žiadame povolenie na pristátie na dráhe dvadsaťdeväť, ďakujem.", "Slovak"),
+    ("Rozumiem, pristátie povolené, vietor dvesto sedemdesiat stupňov, osem uzlov, hláste sa na odbočke.", "Slovak"),
+])
+def test_czech_and_slovak_transmissions_are_told_apart(detector, text, language):
+    result = detector.detect(text)
+    assert result["language"] == language
+    assert result["confidence"] in ("medium", "high")
+
+
+@pytest.mark.parametrize("text, language", [
+    ("Letadlo má problém s motorem, potřebujeme okamžitě přistát.", "Czech"),
+    ("Lietadlo má problém s motorom, potrebujeme okamžite pristáť.", "Slovak"),
+])
+def test_near_identical_czech_and_slovak_sentences(detector, text, language):
+    # A few letters apart - right language, but not a high-confidence call
+    result = detector.detect(text)
+    assert result["language"] == language
+    assert result["confidence"] != "high"
+
+
+@pytest.mark.parametrize("text, language", [
+    ("Wieża, LOT 123, proszę o zgodę na lądowanie na drodze startowej dwa dziewięć.", "Polish"),
+    ("Tower, Speedbird 12, request clearance to land runway two nine, we are established.", "English"),
+])
+def test_neighbouring_languages_stay_high_confidence(detector, text, language):
+    assert detector.detect(text) == {"language": language, "confidence": "high"}
+
+
+def test_profiles_rebuilt_when_a_corpus_changes(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "en.txt").write_text("the tower cleared the aircraft to land", encoding="utf-8")
+    (corpus / "pl.txt").write_text("wieża zezwala samolotowi na lądowanie", encoding="utf-8")
+    path = str(tmp_path / "profiles.bin")
+
+    assert LanguageDetector(path, str(corpus)).available
+    (corpus / "de.txt").write_text("der Turm erteilt die Landefreigabe", encoding="utf-8")
+    os.utime(corpus / "de.txt", (os.path.getmtime(path) + 10,) * 2)
+
+    detector = LanguageDetector(path, str(corpus))
+    assert detector.available
+    assert detector.stats()["languages"] == 3
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.llm_executor import LLMExecutor, LLMTimeoutError
+
+
+class SlowModel:
+    """Blocking stand-in for GenerativeModel (thread-pool path)"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        return prompt
+
+
+def test_timed_out_thread_keeps_its_slot():
+    executor = LLMExecutor(max_concurrency=1, timeout=0.05, use_async_api=False)
+    model = SlowModel(0.3)
+
+    async def scenario():
+        with pytest.raises(LLMTimeoutError):
+            await executor.generate(model, "first")
+        assert executor.threads_busy == 1
+        # The timed-out call is still running - the next one waits for it
+        started_at = time.perf_counter()
+        result = await executor.generate(model, "second", timeout=1)
+        return result, time.perf_counter() - started_at
+
+    try:
+        result, waited = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert result == "second"
+    assert waited >= 0.2
+    assert model.max_running == 1
+    assert executor.threads_busy == 0
+
+
+def test_slots_return_once_threads_finish():
+    executor = LLMExecutor(max_concurrency=2, timeout=0.02, use_async_api=False)
+    model = SlowModel(0.1)
+
+    async def call():
+        try:
+            await executor.generate(model, "prompt")
+        except LLMTimeoutError:
+            pass
+
+    async def scenario():
+        await asyncio.wait_for(asyncio.gather(*(call() for _ in range(8))), 5)
+        # Let the abandoned threads finish and hand their slots back
+        await asyncio.sleep(0.3)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert executor.timeouts == 8
+    assert model.max_running <= 2
+    assert executor.threads_busy == 0
+    assert executor._semaphore._value == 2
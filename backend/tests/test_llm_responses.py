@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from services.llm_responses import FieldStreamExtractor
+
+MESSAGES = [
+    "Alert: go around, runway 29 is occupied.",
+    'Say "unable" if you can\'t comply\nthen climb\tto 3000 ft \\ heading 270',
+    "Uwaga: odejdź na drugi krąg, pas zajęty ✈️ 🚨",
+]
+
+
+def _document(message, ensure_ascii):
+    return json.dumps(
+        {"needs_intervention": True, "summary": 'Quoted "agent_message": "decoy"', "agent_message": message, "x": 1},
+        ensure_ascii=ensure_ascii,
+    )
+
+
+def _extract(chunks):
+    extractor = FieldStreamExtractor("agent_message")
+    pieces = [extractor.feed(chunk) for chunk in chunks]
+    return extractor, "".join(pieces)
+
+
+@pytest.mark.parametrize("message", MESSAGES)
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_every_two_chunk_split_decodes_the_field(message, ensure_ascii):
+    document = _document(message, ensure_ascii)
+    for split in range(len(document) + 1):
+        extractor, streamed = _extract([document[:split], document[split:]])
+        assert streamed == message, split
+        assert extractor.value == message
+        assert extractor.done
+
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_one_character_chunks(message):
+    # Splits every escape, including both halves of a surrogate pair
+    extractor, streamed = _extract(list(_document(message, ensure_ascii=True)))
+    assert streamed == message
+    assert extractor.done
+
+
+def test_text_is_released_as_it_arrives():
+    extractor = FieldStreamExtractor("agent_message")
+    assert extractor.feed('{"needs_intervention": true, "agent_mes') == ""
+    assert extractor.feed('sage": "Alert: climb') == "Alert: climb"
+    # An escape cut in half is held back until complete
+    assert extractor.feed(" now\\") == " now"
+    assert extractor.feed('n\\u00') == "\n"
+    assert extractor.feed('e9"') == "é"
+    assert extractor.done
+    assert extractor.feed(', "summary": "ignored"}') == ""
+    assert extractor.value == "Alert: climb now\né"
+
+
+def test_missing_field_yields_nothing():
+    extractor, streamed = _extract(['{"needs_intervention": false, ', '"summary": ""}'])
+    assert streamed == ""
+    assert not extractor.done
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from services import resilience
+from services.analysis_scheduler import AnalysisScheduler
+from services.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, UpstreamGuard
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def _breaker():
+    return CircuitBreaker("test", window=4, min_calls=4, failure_ratio=0.5, open_seconds=10, max_open_seconds=30)
+
+
+def test_opens_once_the_failure_ratio_is_reached(clock):
+    breaker = _breaker()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED  # fewer than min_calls outcomes
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 10
+
+
+def test_successes_keep_it_closed(clock):
+    breaker = _breaker()
+    for outcome in (True, True, False, True, True, True, False):
+        breaker.record_success() if outcome else breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_admits_a_single_probe_that_closes_it(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 10
+    assert breaker.available
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_doubles_the_cool_down_up_to_the_cap(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    for expected in (20, 30, 30):
+        clock.now += breaker.retry_after()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.retry_after() == expected
+
+
+def test_abandoned_probe_lets_the_next_call_probe(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_abandoned()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_guard_rejects_while_open(clock):
+    guard = UpstreamGuard("test", breaker=_breaker())
+    for _ in range(4):
+        guard.breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        with guard.guarded():
+            pass
+
+
+class SlowFirstExecutor:
+    """First call is slow, so it gets hedged; later calls answer at once"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, model, prompt, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            await asyncio.sleep(0.2)
+        return f"response {self.calls}"
+
+
+def _hedging_scheduler(monkeypatch, rpm_limit):
+    monkeypatch.setattr(resilience, "HEDGE_MIN_DELAY_SECONDS", 0.01)
+    upstream = UpstreamGuard("gemini", hedge=True, max_hedge_ratio=1.0)
+    upstream._latencies.extend([0.01] * resilience.HEDGE_MIN_SAMPLES)
+    executor = SlowFirstExecutor()
+    return AnalysisScheduler(executor, rpm_limit=rpm_limit, tpm_limit=0, upstream=upstream), executor
+
+
+def test_hedge_takes_scheduler_budget(monkeypatch):
+    scheduler, executor = _hedging_scheduler(monkeypatch, rpm_limit=60)
+    assert asyncio.run(scheduler.generate(None, "prompt")) == "response 2"
+    assert executor.calls == 2
+    assert scheduler.upstream.hedges == 1
+    assert 57.9 < scheduler.requests._level() < 58.1
+
+
+def test_hedge_is_skipped_without_budget(monkeypatch):
+    scheduler, executor = _hedging_scheduler(monkeypatch, rpm_limit=1)
+    assert asyncio.run(scheduler.generate(None, "prompt")) == "response 1"
+    assert executor.calls == 1
+    assert scheduler.upstream.hedges_skipped == 1
+
+
+def test_unhedged_call_runs_once(monkeypatch):
+    monkeypatch.setattr(resilience, "HEDGE_MIN_DELAY_SECONDS", 0.01)
+    guard = UpstreamGuard("test", hedge=True, max_hedge_ratio=1.0)
+    guard._latencies.extend([0.01] * resilience.HEDGE_MIN_SAMPLES)
+    calls = []
+
+    async def mint():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "token"
+
+    assert asyncio.run(guard.call(mint, hedge=False)) == "token"
+    assert len(calls) == 1
@@ -0,0 +1,129 @@
+import asyncio
+
+from services import gemini_client
+from services.single_flight import SUPERSEDED_RESULT, SingleFlight
+from services.voice_service import voice_service
+
+
+class Call:
+    """Model call stand-in that finishes when released"""
+
+    def __init__(self, result):
+        self.result = result
+        self.started = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.started += 1
+        await self.release.wait()
+        return dict(self.result)
+
+
+def test_same_input_joins_the_running_call():
+    async def scenario():
+        flights = SingleFlight()
+        call = Call({"verdict": "no"})
+        first = asyncio.create_task(flights.run("session:a", "fp1", call))
+        second = asyncio.create_task(flights.run("session:a", "fp1", call))
+        await asyncio.sleep(0)
+        call.release.set()
+        return flights, call, await first, await second
+
+    flights, call, first, second = asyncio.run(scenario())
+    assert call.started == 1
+    assert first == second == {"verdict": "no"}
+    assert first is not second
+    assert (flights.started, flights.joined, flights.superseded) == (1, 1, 0)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_newer_input_supersedes_the_running_call():
+    async def scenario():
+        flights = SingleFlight()
+        old, new = Call({"verdict": "old"}), Call({"verdict": "new"})
+        first = asyncio.create_task(flights.run("session:a", "fp1", old))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.run("session:a", "fp2", new))
+        await asyncio.sleep(0)
+        new.release.set()
+        return flights, await first, await second
+
+    flights, first, second = asyncio.run(scenario())
+    assert first == SUPERSEDED_RESULT
+    assert second == {"verdict": "new"}
+    assert flights.superseded == 1
+
+
+def test_different_keys_run_independently():
+    async def scenario():
+        flights = SingleFlight()
+        a, b = Call({"verdict": "a"}), Call({"verdict": "b"})
+        first = asyncio.create_task(flights.run("session:a", "fp1", a))
+        second = asyncio.create_task(flights.run("session:b", "fp2", b))
+        await asyncio.sleep(0)
+        a.release.set()
+        b.release.set()
+        return await first, await second
+
+    assert asyncio.run(scenario()) == ({"verdict": "a"}, {"verdict": "b"})
+
+
+def test_leaving_waiter_keeps_the_call_for_the_others():
+    async def scenario():
+        flights = SingleFlight()
+        call = Call({"verdict": "no"})
+        leaving = asyncio.create_task(flights.run("session:a", "fp1", call))
+        staying = asyncio.create_task(flights.run("session:a", "fp1", call))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        call.release.set()
+        return await staying
+
+    assert asyncio.run(scenario()) == {"verdict": "no"}
+
+
+def test_last_waiter_leaving_cancels_the_call():
+    async def scenario():
+        flights = SingleFlight()
+        call = Call({"verdict": "no"})
+        waiter = asyncio.create_task(flights.run("session:a", "fp1", call))
+        await asyncio.sleep(0)
+        flight = flights._flights["session:a"]
+        waiter.cancel()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return flight.task.cancelled()
+
+    assert asyncio.run(scenario())
+
+
+def test_anonymous_callers_on_one_callsign_dont_supersede_each_other(monkeypatch):
+    async def scenario():
+        gate = asyncio.Event()
+        calls = []
+
+        async def analyze(transcript, aircraft_callsign=None, on_agent_message=None):
+            calls.append(transcript)
+            await gate.wait()
+            return {"needs_intervention": True, "summary": transcript, "agent_message": "", "success": True, "error": None}
+
+        monkeypatch.setattr(gemini_client, "configured", lambda: True)
+        monkeypatch.setattr(voice_service, "_analyze_cockpit_with_model", analyze)
+        monkeypatch.setattr(voice_service.verdict_cache, "get", lambda key: None)
+        monkeypatch.setattr(voice_service.verdict_cache, "set", lambda key, value: None)
+        # Two trainees, same scenario callsign, different transcripts
+        first = asyncio.create_task(voice_service.analyze_cockpit_conversation(
+            "Coastal 115, mayday mayday, engine fire, request immediate return", "Coastal 115"))
+        second = asyncio.create_task(voice_service.analyze_cockpit_conversation(
+            "Coastal 115, mayday, smoke in the cockpit, request vectors to land", "Coastal 115"))
+        for _ in range(100):
+            if len(calls) == 2:
+                break
+            await asyncio.sleep(0.01)
+        gate.set()
+        return await first, await second
+
+    first, second = asyncio.run(scenario())
+    assert not first.get("superseded") and not second.get("superseded")
+    assert first["summary"] != second["summary"]
@@ -0,0 +1,33 @@
+import pytest
+
+from services.state_backend import MemoryTable
+from services.verdict_cache import VerdictCache, normalize_transcript
+
+key = VerdictCache.key
+
+
+def test_normalization_ignores_case_punctuation_and_whitespace():
+    assert normalize_transcript("  Tower,  LOT123:\nCleared to LAND!  ") == "tower lot123 cleared to land"
+    assert key("Tower, LOT123 cleared to land.", "LOT123") == key("tower lot123   cleared to land", " lot123 ")
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Captain, we have an engine fire", "Captain, we have an engine fine"),
+    ("LOT123 cleared to land runway 28", "LOT123 cleared to land runway 10"),
+    ("LOT123 cleared to land runway 28", "LOT123 cleared to land runway"),
+    ("climb and maintain 5000", "climb and maintain 500"),
+])
+def test_different_last_word_is_a_different_key(first, second):
+    assert key(first, "X") != key(second, "X")
+
+
+def test_callsign_is_part_of_the_key():
+    assert key("cleared to land runway 28", "LOT123") != key("cleared to land runway 28", "LOT124")
+
+
+def test_cache_serves_only_the_same_transcript():
+    cache = VerdictCache(MemoryTable(16), ttl=60, enabled=True)
+    cache.set(key("engine fire", "X"), {"needs_intervention": True})
+    assert cache.get(key("Engine fire!", "X")) == {"needs_intervention": True}
+    assert cache.get(key("engine fine", "X")) is None
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+from services import gemini_client
+from services.voice_service import voice_service
+
+
+def test_first_gemini_use_loads_the_model_off_the_event_loop(monkeypatch):
+    def slow_model(**kwargs):
+        time.sleep(0.3)  # stands in for the SDK import
+        return "model"
+
+    monkeypatch.setattr(voice_service, "_gemini_model", None)
+    monkeypatch.setattr(gemini_client, "configured", lambda: True)
+    monkeypatch.setattr(gemini_client, "generative_model", slow_model)
+    monkeypatch.setattr(voice_service.responses, "generation_config", lambda schema: {})
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        model = await voice_service._gemini()
+        task.cancel()
+        return model, ticks
+
+    model, ticks = asyncio.run(scenario())
+    assert model == "model"
+    # The loop kept running while the model loaded
+    assert ticks >= 10
@@ -15,6 +15,8 @@ function App() {
   
   // Debounce timer for parse-transcript to avoid spam
   const parseTimerRef = useRef(null)
+  // Incremental parse state - only text after `offset` is sent to the backend
+  const parseStateRef = useRef({ prefix: '', offset: 0, stableMessages: [] })
 
   const handleTranscriptUpdate = (newTranscript) => {
     setTranscript(newTranscript)
@@ -32,15 +34,27 @@ function App() {
   }
 
   const parseTranscript = async (text) => {
+    // Transcript rewritten (not just appended) - start over
+    let state = parseStateRef.current
+    if (!text.startsWith(state.prefix)) {
+      state = { prefix: '', offset: 0, stableMessages: [] }
+    }
+    
     try {
       const response = await fetch('http://localhost:8000/api/voice/parse-transcript', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ transcript: text })
+        body: JSON.stringify({ transcript: text.slice(state.offset), offset: state.offset })
       })
       const data = await response.json()
       if (data.success && data.messages) {
-        setParsedMessages(data.messages)
+        const stableMessages = state.stableMessages.concat(data.messages.slice(0, data.stable_count))
+        parseStateRef.current = {
+          prefix: text.slice(0, data.next_offset),
+          offset: data.next_offset,
+          stableMessages
+        }
+        setParsedMessages(stableMessages.concat(data.messages.slice(data.stable_count)))
       }
     } catch (err) {
       console.error('Failed to parse transcript:', err)
@@ -62,12 +76,17 @@ function App() {
       setEmergencyData({
         summary: analysis.summary,
         agentMessage: analysis.agentMessage,
+        // true dopóki agent_message jest jeszcze streamowany
+        streaming: Boolean(analysis.streaming),
         timestamp: analysis.timestamp
       })
     }
   }
 
   const handlePanicButtonClick = () => {
+    // Agent startuje dopiero z pełnym agent_message, nie z połową streamu
+    if (emergencyData?.streaming) return
+    
     console.log('🚨 [App] Panic button clicked - opening agent modal');
     console.log('📝 [App] Current transcript:', transcript);
     console.log('📋 [App] Emergency data:', emergencyData);
@@ -176,7 +195,7 @@ function App() {
       <VoiceAgentModal
         visible={showAgentModal}
         transcriptAnalysis={transcriptAnalysis}
-        firstPrompt={emergencyData?.agentMessage || ''}
+        firstPrompt={emergencyData && !emergencyData.streaming ? emergencyData.agentMessage || '' : ''}
         onClose={handleAgentModalClose}
       />
     </div>
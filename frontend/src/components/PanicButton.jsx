@@ -47,9 +47,13 @@ export function PanicButton({ visible, onClick, emergencyData }) {
           </div>
         )}
         
-        {/* Action Button */}
-        <button className="panic-button-dismiss" onClick={onClick}>
-          🎙️ Talk to Safety Officer
+        {/* Action Button - agent startuje dopiero z pełnym komunikatem */}
+        <button
+          className="panic-button-dismiss"
+          onClick={onClick}
+          disabled={Boolean(emergencyData?.streaming)}
+        >
+          {emergencyData?.streaming ? '⏳ Preparing instructions...' : '🎙️ Talk to Safety Officer'}
         </button>
         
         {/* Fallback if no emergency data */}
@@ -5,7 +5,7 @@ const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
 /**
  * Hook do real-time voice input z ElevenLabs Scribe v2 Realtime
- * + Periodic AI analysis co 2 sekundy
+ * + AI analysis przez WebSocket (fallback: polling co 2 sekundy)
  * 
  * Obsługuje:
  * - Pobieranie tokena z backendu
@@ -13,7 +13,7 @@ const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
  * - Manualne przechwytywanie audio z mikrofonu (Firefox workaround)
  * - Resampling do 16kHz
  * - Real-time transkrypcję (partial i committed)
- * - Periodic Claude analysis (co 2s)
+ * - Push analysis przez WebSocket /api/voice/ws (fallback: polling co 2s)
  */
 export function useRealtimeVoice(onAnalysisUpdate, aircraftCallsign) {
   const [isManualMicActive, setIsManualMicActive] = useState(false);
@@ -30,6 +30,17 @@ export function useRealtimeVoice(onAnalysisUpdate, aircraftCallsign) {
   const analysisIntervalRef = useRef(null);
   const lastAnalyzedTextRef = useRef('');
   const fullTranscriptRef = useRef('');
+  
+  // Refs dla sesji analizy (backend trzyma rolling transcript)
+  const sessionIdRef = useRef(null);
+  const committedSegmentsRef = useRef([]);
+  const partialTextRef = useRef('');
+  const sentSegmentsCountRef = useRef(0);
+  
+  // Ref dla WebSocket analizy (push zamiast pollingu)
+  const analysisSocketRef = useRef(null);
+  // agent_message streamowany przez backend przed pełnym wynikiem analizy
+  const streamedAgentMessageRef = useRef('');
 
   /**
    * Stop periodic analysis
@@ -42,8 +53,58 @@ export function useRealtimeVoice(onAnalysisUpdate, aircraftCallsign) {
     }
   }, []);
 
+  /**
+   * Zamknij WebSocket analizy
+   */
+  const stopAnalysisSocket = useCallback(() => {
+    const socket = analysisSocketRef.current;
+    if (socket) {
+      analysisSocketRef.current = null;
+      socket.close();
+      console.log('🔌 [Analysis] Closed analysis socket');
+    }
+  }, []);
+
+  /**
+   * Obsłuż wynik analizy (z WebSocket albo z HTTP)
+   */
+  const handleAnalysisResult = useCallback((data) => {
+    streamedAgentMessageRef.current = '';
+    if (!data.success || !onAnalysisUpdate) return;
+    
+    if (data.degraded) {
+      // Gemini niedostępny - backend analizuje tylko lokalnie (słowa kluczowe, konflikty)
+      console.warn('⚠️ [Pilots Advisor] Degraded mode - local-only analysis');
+    }
+    
+    if (data.needs_intervention) {
+      console.log('🚨 [Pilots Advisor] INTERVENTION NEEDED - STOPPING ANALYSIS');
+      console.log('📋 Summary:', data.summary?.slice(0, 100) + '...');
+      console.log('📢 Agent Message:', data.agent_message?.slice(0, 100) + '...');
+      
+      // STOP analysis immediately
+      stopPeriodicAnalysis();
+      stopAnalysisSocket();
+      
+      // Pass emergency data to parent
+      onAnalysisUpdate({
+        needsIntervention: true,
+        summary: data.summary,
+        agentMessage: data.agent_message,
+        timestamp: Date.now()
+      });
+    } else {
+      console.log('✈️ [Pilots Advisor] Result: All good');
+      onAnalysisUpdate({
+        needsIntervention: false,
+        timestamp: Date.now()
+      });
+    }
+  }, [onAnalysisUpdate, stopPeriodicAnalysis, stopAnalysisSocket]);
+
   /**
    * Periodic analysis - wywołuje Pilots Advisor co 2 sekundy
+   * Wysyła tylko nowe committed segmenty + aktualny partial (sesja po stronie backendu)
    */
   const analyzeTranscript = useCallback(async (text) => {
     if (!text || text.length < 10) return;
@@ -51,51 +112,69 @@ export function useRealtimeVoice(onAnalysisUpdate, aircraftCallsign) {
     // Nie analizuj tego samego tekstu
     if (text === lastAnalyzedTextRef.current) return;
     
+    if (!sessionIdRef.current) {
+      sessionIdRef.current = crypto.randomUUID();
+    }
+    
     try {
       console.log('✈️ [Pilots Advisor] Analyzing:', text.slice(0, 50) + '...');
       console.log('✈️ [Pilots Advisor] Aircraft:', aircraftCallsign || 'Not specified');
       
-      const response = await fetch(`${API_URL}/api/voice/check-cockpit`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ 
-          transcript: text,
-          aircraft_callsign: aircraftCallsign || null
-        })
-      });
+      const sendSegments = async () => {
+        const baseIndex = sentSegmentsCountRef.current;
+        const segments = committedSegmentsRef.current;
+        const response = await fetch(`${API_URL}/api/voice/sessions/${sessionIdRef.current}/check`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ 
+            base_index: baseIndex,
+            committed: segments.slice(baseIndex),
+            partial: partialTextRef.current,
+            aircraft_callsign: aircraftCallsign || null
+          })
+        });
+        return response.json();
+      };
       
-      const data = await response.json();
+      let data = await sendSegments();
       
-      if (data.success && onAnalysisUpdate) {
-        if (data.needs_intervention) {
-          console.log('🚨 [Pilots Advisor] INTERVENTION NEEDED - STOPPING ANALYSIS');
-          console.log('📋 Summary:', data.summary?.slice(0, 100) + '...');
-          console.log('📢 Agent Message:', data.agent_message?.slice(0, 100) + '...');
-          
-          // STOP periodic analysis immediately
-          stopPeriodicAnalysis();
-          
-          // Pass emergency data to parent
-          onAnalysisUpdate({
-            needsIntervention: true,
-            summary: data.summary,
-            agentMessage: data.agent_message,
-            timestamp: Date.now()
-          });
-        } else {
-          console.log('✈️ [Pilots Advisor] Result: All good');
-          onAnalysisUpdate({
-            needsIntervention: false,
-            timestamp: Date.now()
-          });
-        }
+      // Backend nie ma wszystkich segmentów (np. restart workera) - doślij brakujące
+      if (data.resync) {
+        console.log('🔁 [Pilots Advisor] Resync from segment', data.committed_count);
+        sentSegmentsCountRef.current = Math.min(data.committed_count, committedSegmentsRef.current.length);
+        data = await sendSegments();
+      }
+      
+      if (typeof data.committed_count === 'number') {
+        sentSegmentsCountRef.current = data.committed_count;
+      }
+      
+      handleAnalysisResult(data);
+      if (data.success) {
         lastAnalyzedTextRef.current = text;
       }
       
     } catch (err) {
       console.error('❌ [Pilots Advisor] Error:', err);
     }
-  }, [onAnalysisUpdate, stopPeriodicAnalysis, aircraftCallsign]);
+  }, [handleAnalysisResult, aircraftCallsign]);
+
+  /**
+   * Zamknij sesję analizy po stronie backendu
+   */
+  const closeAnalysisSession = useCallback(() => {
+    const sessionId = sessionIdRef.current;
+    if (!sessionId) return;
+    
+    sessionIdRef.current = null;
+    committedSegmentsRef.current = [];
+    partialTextRef.current = '';
+    sentSegmentsCountRef.current = 0;
+    lastAnalyzedTextRef.current = '';
+    
+    fetch(`${API_URL}/api/voice/sessions/${sessionId}`, { method: 'DELETE' })
+      .catch(err => console.error('❌ [Analysis] Failed to close session:', err));
+  }, []);
 
   /**
    * Start periodic analysis (co 2 sekundy)
@@ -115,6 +194,77 @@ export function useRealtimeVoice(onAnalysisUpdate, aircraftCallsign) {
     }, 2000); // Co 2 sekundy
   }, [analyzeTranscript]);
 
+  /**
+   * Start WebSocket analizy - backend wypycha wynik zaraz po obliczeniu.
+   * Przy błędzie połączenia wracamy do pollingu co 2 sekundy.
+   */
+  const startAnalysisSocket = useCallback(() => {
+    stopAnalysisSocket();
+    
+    if (!sessionIdRef.current) {
+      sessionIdRef.current = crypto.randomUUID();
+    }
+    
+    const socket = new WebSocket(`${API_URL.replace(/^http/, 'ws')}/api/voice/ws`);
+    analysisSocketRef.current = socket;
+    
+    socket.onopen = () => {
+      console.log('⚡ [Analysis] Analysis socket connected');
+      socket.send(JSON.stringify({
+        type: 'start',
+        session_id: sessionIdRef.current,
+        aircraft_callsign: aircraftCallsign || null
+      }));
+      // Doślij to, co już mamy
+      committedSegmentsRef.current.forEach(text => {
+        socket.send(JSON.stringify({ type: 'committed', text }));
+      });
+      if (partialTextRef.current) {
+        socket.send(JSON.stringify({ type: 'partial', text: partialTextRef.current }));
+      }
+    };
+    
+    socket.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      if (data.type === 'analysis') {
+        handleAnalysisResult(data);
+      } else if (data.type === 'agent_message_delta') {
+        // Pokaż komunikat od pierwszych tokenów - socket zostaje otwarty do pełnego wyniku
+        streamedAgentMessageRef.current += data.text;
+        onAnalysisUpdate?.({
+          needsIntervention: true,
+          agentMessage: streamedAgentMessageRef.current,
+          streaming: true,
+          timestamp: Date.now()
+        });
+      } else if (data.type === 'error') {
+        console.error('❌ [Analysis] Socket error message:', data.error);
+        // Nieudana analiza - następny stream zaczyna od zera, nie dokleja się do urwanego
+        streamedAgentMessageRef.current = '';
+      }
+    };
+    
+    socket.onclose = () => {
+      // Zamknięte przez nas (stop / intervention) - nic nie rób
+      if (analysisSocketRef.current !== socket) return;
+      
+      console.log('⚠️ [Analysis] Analysis socket lost - falling back to polling');
+      analysisSocketRef.current = null;
+      sentSegmentsCountRef.current = 0;
+      startPeriodicAnalysis();
+    };
+  }, [aircraftCallsign, handleAnalysisResult, onAnalysisUpdate, startPeriodicAnalysis, stopAnalysisSocket]);
+
+  /**
+   * Wyślij zdarzenie transkrypcji przez WebSocket (jeśli połączony)
+   */
+  const sendAnalysisEvent = useCallback((type, text) => {
+    const socket = analysisSocketRef.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      socket.send(JSON.stringify({ type, text }));
+    }
+  }, []);
+
   /**
    * useScribe - hook z ElevenLabs SDK
    * Łączymy się BEZ wbudowanego mikrofonu (Firefox bug workaround)
@@ -126,15 +276,21 @@ export function useRealtimeVoice(onAnalysisUpdate, aircraftCallsign) {
     onPartialTranscript: (data) => {
       console.log('📝 [Scribe] Partial:', data.text);
       // Aktualizuj ref z partial
-      const committed = scribe.committedTranscripts?.map(s => s.text).join(' ') || '';
-      fullTranscriptRef.current = (committed + ' ' + (data.text || '')).trim();
+      partialTextRef.current = data.text || '';
+      const committed = committedSegmentsRef.current.join(' ');
+      fullTranscriptRef.current = (committed + ' ' + partialTextRef.current).trim();
+      sendAnalysisEvent('partial', partialTextRef.current);
     },
     
     onCommittedTranscript: (data) => {
       console.log('✅ [Scribe] Committed:', data.text);
       // Aktualizuj ref z committed
-      const committed = scribe.committedTranscripts?.map(s => s.text).join(' ') || '';
-      fullTranscriptRef.current = committed;
+      if (data.text) {
+        committedSegmentsRef.current.push(data.text);
+        sendAnalysisEvent('committed', data.text);
+      }
+      partialTextRef.current = '';
+      fullTranscriptRef.current = committedSegmentsRef.current.join(' ');
     },
     
     onError: (err) => {
@@ -145,12 +301,14 @@ export function useRealtimeVoice(onAnalysisUpdate, aircraftCallsign) {
     onConnect: () => {
       console.log('✅ [Scribe] Connected!');
       setError(null);
-      startPeriodicAnalysis();
+      startAnalysisSocket();
     },
     
     onDisconnect: () => {
       console.log('🔌 [Scribe] Disconnected');
+      stopAnalysisSocket();
       stopPeriodicAnalysis();
+      closeAnalysisSession();
       if (stopManualMicrophoneRef.current) {
         stopManualMicrophoneRef.current();
       }
@@ -368,9 +526,10 @@ export function useRealtimeVoice(onAnalysisUpdate, aircraftCallsign) {
   useEffect(() => {
     return () => {
       stopManualMicrophone();
+      stopAnalysisSocket();
       stopPeriodicAnalysis();
     };
-  }, [stopManualMicrophone, stopPeriodicAnalysis]);
+  }, [stopManualMicrophone, stopAnalysisSocket, stopPeriodicAnalysis]);
 
   return {
     isListening: scribe.isConnected && isManualMicActive,
@@ -15,7 +15,12 @@ fi
 
 # Test backend dependencies
 echo "📦 Testing backend dependencies..."
-python3 -c "import fastapi, uvicorn, elevenlabs" || {
+# find_spec only locates the packages - importing the SDKs here would double the container start time
+python3 -c "
+import importlib.util, sys
+missing = [m for m in ('fastapi', 'uvicorn', 'httpx', 'google.generativeai') if importlib.util.find_spec(m) is None]
+sys.exit('Missing: ' + ', '.join(missing) if missing else 0)
+" || {
     echo "❌ Backend dependencies missing!"
     exit 1
 }